@@ -0,0 +1,84 @@
+"""Compare board images with the custom emoji text they replace.
+
+Plays N random games (default 200) and, after each guess, times building
+the private /guess message both ways: the emoji text (board plus letter
+tracker, rendered from scratch) and the PNG from the sprite atlas, cold
+and from the cache. Reports time per message and payload bytes, by
+number of guesses, plus how long building the atlas takes.
+
+Usage: python benchmarks/boards.py [--games N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from boards import BoardRenderer  # noqa: E402
+from feedback import EMOJI_COLORS, LETTERS, EmojiTiles  # noqa: E402
+from game import MAX_ATTEMPTS, GameState  # noqa: E402
+from words import decode, word_index  # noqa: E402
+
+# Custom emoji strings the size Discord sends them
+TILES = EmojiTiles({
+    f"{color}_{letter}": f"<:{color}_{letter}:{1300000000000000000 + i}>"
+    for i, (color, letter) in enumerate((c, l) for c in EMOJI_COLORS + ('blue',) for l in LETTERS)
+})
+
+
+def text_message(game):
+    # What /guess sends without images
+    return (f"Attempt {game.attempts} of {MAX_ATTEMPTS}:\n{game.private_board(TILES)}"
+            f"\nLetter Tracker:\n{game.letter_tracker(TILES)}")
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+async def main(args):
+    random.seed(1)
+    renderer = BoardRenderer(enabled=True)
+    start = time.perf_counter()
+    await renderer.start()
+    print(f"atlas: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    guesses = [decode(code) for code in word_index.guesses]
+    # attempts -> lists of text time, text bytes, render time, PNG bytes, cached time
+    results = {attempts: ([], [], [], [], []) for attempts in range(1, MAX_ATTEMPTS + 1)}
+    for _ in range(args.games):
+        game = GameState.new(random.choice(word_index.answers))
+        while not game.finished:
+            game.add_guess(random.choice(guesses))
+            text_time, text_bytes, render_time, png_bytes, cached_time = results[game.attempts]
+            message, elapsed = timed(text_message, game)
+            text_time.append(elapsed)
+            text_bytes.append(len(message.encode()))
+            png, elapsed = timed(renderer.render, game.letters, list(game.moves()))
+            render_time.append(elapsed)
+            png_bytes.append(len(png) + len(f"Attempt {game.attempts} of {MAX_ATTEMPTS}:"))
+            await renderer.board(game)
+            start = time.perf_counter()
+            await renderer.board(game)
+            cached_time.append(time.perf_counter() - start)
+    renderer.close()
+
+    print(f"{'guesses':>7} {'text us':>9} {'text bytes':>11} {'image ms':>9} {'cached us':>10} {'image bytes':>12}")
+    for attempts, (text_time, text_bytes, render_time, png_bytes, cached_time) in results.items():
+        if not text_time:
+            continue
+        print(f"{attempts:>7} {statistics.median(text_time) * 1e6:>9.1f} {statistics.median(text_bytes):>11,.0f} "
+              f"{statistics.median(render_time) * 1000:>9.2f} {statistics.median(cached_time) * 1e6:>10.1f} "
+              f"{statistics.median(png_bytes):>12,.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""Time emoji setup at startup for many guilds against a simulated API.
+
+Fake guilds answer create_custom_emoji after a fixed latency, one request
+at a time per guild (like Discord's per-guild rate limit bucket). Most
+guilds already have the emojis; a few are new. Compares EmojiRegistry
+uploading one emoji at a time (like the old load_emojis loop) with its
+default concurrency, cold (no saved map) and warm (saved map from the
+previous run).
+
+Usage: python benchmarks/emoji_startup.py [--guilds N] [--new N] [--latency SECONDS]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emojis import EMOJI_NAMES, EmojiRegistry  # noqa: E402
+
+_ids = iter(range(10 ** 18, 2 * 10 ** 18))
+
+
+class FakeEmoji:
+    def __init__(self, name):
+        self.name = name
+        self.id = next(_ids)
+        self.animated = False
+
+    def __str__(self):
+        return f"<:{self.name}:{self.id}>"
+
+
+class FakeGuild:
+    def __init__(self, guild_id, latency, has_emojis):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+        self.emoji_limit = 250
+        self.emojis = [FakeEmoji(name) for name in EMOJI_NAMES] if has_emojis else []
+        self.me = types.SimpleNamespace(guild_permissions=types.SimpleNamespace(manage_emojis=True))
+        self.latency = latency
+        self.calls = 0
+        self._bucket = asyncio.Lock()
+
+    async def create_custom_emoji(self, name, image):
+        async with self._bucket:
+            self.calls += 1
+            await asyncio.sleep(self.latency)
+        emoji = FakeEmoji(name)
+        self.emojis.append(emoji)
+        return emoji
+
+
+def make_guilds(args):
+    return [FakeGuild(i, args.latency, has_emojis=i >= args.new) for i in range(args.guilds)]
+
+
+async def main(args):
+    runs = (
+        ("one upload at a time, no saved map", 1, False),
+        ("concurrent, no saved map", None, False),
+        ("concurrent, saved map", None, True),
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'emoji_map.json')
+        for label, concurrency, warm in runs:
+            if not warm:
+                guilds = make_guilds(args)
+                if os.path.exists(path):
+                    os.remove(path)
+            registry = EmojiRegistry({}, path=path, upload_concurrency=concurrency)
+            start = time.perf_counter()
+            await registry.load()
+            await registry.provision_all(guilds)
+            elapsed = time.perf_counter() - start
+            calls = sum(guild.calls for guild in guilds)
+            for guild in guilds:
+                guild.calls = 0
+            print(f"{label}: {elapsed:.2f}s for {args.guilds} guilds ({args.new} new), {calls} upload(s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--guilds', type=int, default=300)
+    parser.add_argument('--new', type=int, default=10, help="guilds without the emojis yet")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per emoji upload")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,130 @@
+"""Measure memory and command cost of 100k concurrent games.
+
+Builds N games (default 100k) with 0-5 guesses each, both as the dicts the
+bot used to keep and as GameState objects, and reports bytes per game
+(from tracemalloc) and the time per /guess (score, then render the board
+and letter tracker) with custom emoji tiles. GameState also narrows the
+answers still possible, which the dicts never did, so it is timed with
+and without that.
+
+Usage: python benchmarks/game_state.py [--games N]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feedback import EMOJI_COLORS, LETTERS, EmojiTiles, score, update_letter_states  # noqa: E402
+from game import GameState  # noqa: E402
+from words import decode, word_index  # noqa: E402
+import wordlists  # noqa: E402
+
+# Custom emoji strings the size Discord sends them
+TILES = EmojiTiles({
+    f"{color}_{letter}": f"<:{color}_{letter}:{1300000000000000000 + i}>"
+    for i, (color, letter) in enumerate((c, l) for c in EMOJI_COLORS + ('blue',) for l in LETTERS)
+})
+
+
+def dict_game(word):
+    return {"word": word, "attempts": 0, "guesses": [], "patterns": [], "rows": [],
+            "letters": bytearray(26), "tracker": None, "tiles": TILES}
+
+
+def dict_guess(game, guess):
+    pattern = score(guess, game["word"])
+    game["attempts"] += 1
+    game["guesses"].append(guess)
+    game["patterns"].append(pattern)
+    game["rows"].append(game["tiles"].row(pattern, guess))
+    if update_letter_states(game["letters"], guess, game["word"]):
+        game["tracker"] = None
+    board = "".join(f"{row}\n" for row in game["rows"])
+    if game["tracker"] is None:
+        game["tracker"] = TILES.tracker(game["letters"])
+    return board, game["tracker"]
+
+
+def unnarrowed_lists():
+    """The current word lists, with narrowing the possible answers left out."""
+    lists = wordlists.current()
+    candidates = types.SimpleNamespace(all=lists.candidates.all, narrow=lambda bits, guess, pattern: bits)
+    return types.SimpleNamespace(words=lists.words, candidates=candidates)
+
+
+UNNARROWED = unnarrowed_lists()
+
+
+def unnarrowed_game(word):
+    return GameState.new(word, UNNARROWED)
+
+
+def state_guess(game, guess):
+    game.add_guess(guess)
+    return game.private_board(TILES), game.letter_tracker(TILES)
+
+
+def plan(games):
+    guesses = [decode(code) for code in word_index.guesses]
+    return [
+        (random.choice(word_index.answers), [random.choice(guesses) for _ in range(random.randint(0, 5))])
+        for _ in range(games)
+    ]
+
+
+def build(games, new, guess):
+    table = {}
+    for user_id, (word, guesses) in enumerate(games):
+        game = table[user_id] = new(word)
+        for g in guesses:
+            guess(game, g)
+    return table
+
+
+def main(args):
+    random.seed(1)
+    games = plan(args.games)
+    calls = sum(len(guesses) for _, guesses in games)
+    # Fill the shared score cache first so it isn't counted against the games
+    build(games, GameState.new, GameState.add_guess)
+    variants = (
+        ("dict", dict_game, dict_guess),
+        ("GameState", GameState.new, state_guess),
+        # The dicts never narrowed the possible answers; with random guesses
+        # most (guess, pattern) masks miss the cache
+        ("GameState, answers not narrowed", unnarrowed_game, state_guess),
+    )
+    for label, new, guess in variants:
+        gc.collect()
+        tracemalloc.start()
+        table = build(games, new, guess)
+        gc.collect()
+        traced = tracemalloc.get_traced_memory()[0]
+        # What is freed with the games, so entries the score and mask caches
+        # take in meanwhile don't count against them
+        del table
+        gc.collect()
+        size = traced - tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        # Timed separately, without tracemalloc slowing every allocation down
+        gc.collect()
+        start = time.perf_counter()
+        table = build(games, new, guess)
+        elapsed = time.perf_counter() - start
+        del table
+        print(f"{label}: {size / len(games):.0f} bytes per game "
+              f"({size / 1e6:.1f} MB for {len(games)} games), "
+              f"{elapsed / calls * 1e6:.2f} us per guess ({calls / elapsed:,.0f} per second)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=100000)
+    main(parser.parse_args())
@@ -0,0 +1,241 @@
+"""Micro-benchmarks of the functions that run on every guess.
+
+Times what /guessle and /guess run in bot.py, over two workloads:
+
+- cross: score() of every answer against every 8th accepted guess
+  (``--stride 1`` for all 4.3M pairs, which takes several minutes)
+- games: 50k 6-guess games. Each GameState.add_guess() call, then the
+  private board and letter tracker rendered after each guess, plus
+  is_valid_word() and answer_rotation.draw() as /guess and /guessle call them
+
+Reports ns/op (best of ``--repeat`` runs) and peak bytes allocated per op
+(from tracemalloc, on a sample of the ops). The score cache is cleared
+before each run, so runs don't speed each other up.
+
+Results are compared against benchmarks/hotpaths_baseline.json and the
+script exits non-zero when a case got slower, or allocates more, than
+``--threshold`` allows. Timings depend on the machine, so regenerate the
+baseline with ``--save`` on the machine that runs the check.
+
+Usage: python benchmarks/hotpaths.py [--stride N] [--repeat N] [--threshold FRACTION]
+           [--save] [--json]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configure the bot for an offline run before importing it
+os.environ.setdefault('SESSION_STORE', 'memory')
+
+import bot  # noqa: E402
+from feedback import score  # noqa: E402
+from game import GameState  # noqa: E402
+from words import decode, word_index  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hotpaths_baseline.json')
+
+# Games in the games workload, 6 guesses each
+GAMES = 50000
+
+# Ops per case that tracemalloc samples for bytes/op
+ALLOCATION_SAMPLE = 2000
+
+# Players the rotation deals to, a few games each
+PLAYERS = 20000
+
+
+def run_sync(coro):
+    """Run a coroutine that never awaits anything to completion."""
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("coroutine awaited something")
+
+
+def valid_word(word):
+    return run_sync(bot.is_valid_word(word))
+
+
+def add_guess(game, data, remaining, guess):
+    # Put the game back as it was before this guess, so every run scores the same guesses
+    game.data, game.remaining = data, remaining
+    return game.add_guess(guess)
+
+
+def private_board(game, data, tiles):
+    game.data = data
+    return game.private_board(tiles)
+
+
+def letter_tracker(game, data, tiles):
+    game.data = data
+    return game.letter_tracker(tiles)
+
+
+def cross_pairs(guesses, stride):
+    return [(guess, answer) for answer in word_index.answers for guess in guesses[::stride]]
+
+
+def game_calls(guesses, count):
+    """Argument lists for add_guess and the renders over ``count`` games."""
+    tiles = bot.emoji_registry.default
+    guessed, rendered = [], []
+    for _ in range(count):
+        answer = random.choice(word_index.answers)
+        game = GameState.new(answer)
+        for guess in random.sample(guesses, 5) + [answer]:
+            guessed.append((game, game.data, game.remaining, guess))
+            game.add_guess(guess)
+            rendered.append((game, game.data, tiles))
+    return guessed, rendered
+
+
+def cases(stride):
+    """Case name -> (function, argument tuples)."""
+    guesses = [decode(code) for code in word_index.guesses]
+    pairs = cross_pairs(guesses, stride)
+    guessed, rendered = game_calls(guesses, GAMES)
+    # Half accepted guesses, half reversed ones, most of which aren't words;
+    # repeated so the run is long enough to time reliably
+    words = ([(word,) for word in guesses] + [(word[::-1],) for word in guesses]) * 6
+    return {
+        'score/cross': (score, pairs),
+        'add_guess/games': (add_guess, guessed),
+        'private_board/games': (private_board, rendered),
+        'letter_tracker/games': (letter_tracker, rendered),
+        'is_valid_word': (valid_word, words),
+        'draw_answer': (bot.answer_rotation.draw, [(user_id % PLAYERS,) for user_id in range(len(words))]),
+    }
+
+
+def time_case(function, calls, repeat):
+    """Best ns/op over ``repeat`` runs."""
+    best = None
+    for _ in range(repeat):
+        score.cache_clear()
+        gc.collect()
+        start = time.perf_counter_ns()
+        for args in calls:
+            function(*args)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(calls)
+
+
+def allocations(function, calls):
+    """Mean peak bytes allocated while one call runs."""
+    sample = calls[::max(1, len(calls) // ALLOCATION_SAMPLE)]
+    score.cache_clear()
+    gc.collect()
+    total = 0
+    tracemalloc.start()
+    try:
+        for args in sample:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            function(*args)
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / len(sample)
+
+
+def read_baseline(path=BASELINE_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_baseline(report, path=BASELINE_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def regressions(report, baseline, threshold):
+    """Cases that are slower or allocate more than the baseline allows."""
+    found = []
+    for name, result in report['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            continue
+        for key, unit in (('ns_per_op', 'ns/op'), ('bytes_per_op', 'bytes/op')):
+            # A few bytes either way is tracemalloc noise, not a regression
+            limit = base[key] * (1 + threshold) + (16 if key == 'bytes_per_op' else 0)
+            if result[key] > limit:
+                found.append(f"{name}: {result[key]:,.0f} {unit}, baseline {base[key]:,.0f}")
+    return found
+
+
+def print_report(report, baseline):
+    print(f"{'case':<22} {'ops':>9} {'ns/op':>9} {'bytes/op':>9} {'vs baseline':>12}")
+    for name, result in report['cases'].items():
+        base = baseline['cases'].get(name) if baseline else None
+        change = f"{result['ns_per_op'] / base['ns_per_op'] - 1:+.1%}" if base else "-"
+        print(f"{name:<22} {result['ops']:>9,} {result['ns_per_op']:>9,.0f} "
+              f"{result['bytes_per_op']:>9,.0f} {change:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stride', type=int, default=8,
+                        help="use every Nth accepted guess in the cross product")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case; the best is kept")
+    parser.add_argument('--threshold', type=float, default=0.3,
+                        help="allowed slowdown as a fraction of the baseline")
+    parser.add_argument('--only', help="run only the cases whose name starts with this")
+    parser.add_argument('--save', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    random.seed(1)
+    report = {
+        'python': platform.python_version(),
+        'stride': args.stride,
+        'cases': {},
+    }
+    for name, (function, calls) in cases(args.stride).items():
+        if args.only and not name.startswith(args.only):
+            continue
+        report['cases'][name] = {
+            'ops': len(calls),
+            'ns_per_op': round(time_case(function, calls, args.repeat), 1),
+            'bytes_per_op': round(allocations(function, calls), 1),
+        }
+
+    baseline = read_baseline()
+    if baseline and baseline.get('stride') != args.stride:
+        print(f"Baseline was taken with --stride {baseline.get('stride')}, not comparing")
+        baseline = None
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, baseline)
+
+    if args.save:
+        write_baseline(report)
+        print(f"Saved baseline to {BASELINE_PATH}")
+        return
+    if baseline:
+        found = regressions(report, baseline, args.threshold)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""End-to-end load test of the game and leaderboard commands, offline.
+
+Runs the real command handlers from bot.py with fake interactions that
+record when the bot responded instead of calling Discord. Each simulated
+player plays full games: /guessle, then guesses chosen from the answers
+still consistent with the feedback so far, with an occasional /status,
+/giveup or leaderboard. Stats go to an in-memory stand-in by default, or
+to a real Postgres with ``--stats postgres`` (DATABASE_URL).
+
+Reports throughput and p50/p95/p99 latency per command. With ``--max-p99``
+it exits non-zero when a command is slower than allowed, for use as a CI
+performance gate:
+
+    python benchmarks/loadtest.py --players 1000 --games 3 --max-p99 guess=0.005
+
+Usage: python benchmarks/loadtest.py [--players N] [--games N] [--think SECONDS]
+           [--stats memory|postgres] [--json] [--max-p99 COMMAND=SECONDS ...]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configure the bot for an offline run before importing it
+os.environ.setdefault('SESSION_STORE', 'memory')
+os.environ.setdefault('PRESENCE_UPDATE_INTERVAL', '3600')
+
+import bot  # noqa: E402
+from cache import TTLCache  # noqa: E402
+from feedback import score  # noqa: E402
+from rotation import merge_seen  # noqa: E402
+from stats import TIMEZONE  # noqa: E402
+from words import word_index  # noqa: E402
+
+COMMANDS = {
+    'guessle': bot.start_guessle,
+    'guess': bot.guess_word,
+    'status': bot.game_status,
+    'giveup': bot.give_up,
+    'leaderboard': bot.leaderboard,
+    'monthly': bot.monthly_leaderboard,
+}
+
+ERROR_REPLY = "An error occurred"
+
+
+class MemoryStats:
+    """In-memory stand-in for UserStats with the same interface the commands use."""
+
+    def __init__(self):
+        self.totals = {}  # (guild_id, user_id) -> [games_played, words_guessed]
+        self.monthly = {}  # (month, guild_id, user_id) -> [games_played, words_guessed]
+        self.seen_answers = {}  # user_id -> (answers_version, (cycle, bitset))
+        self.leaderboards = TTLCache()
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def record_game(self, user_id, won, guild_id=None):
+        month = datetime.datetime.now(TIMEZONE).date().replace(day=1)
+        # Every game counts globally (guild None) and for its guild
+        for guild in {None, guild_id}:
+            for counts in (self.totals.setdefault((guild, user_id), [0, 0]),
+                           self.monthly.setdefault((month, guild, user_id), [0, 0])):
+                counts[0] += 1
+                counts[1] += int(won)
+
+    @staticmethod
+    def _rows(items):
+        rows = [
+            {'user_id': user_id, 'games_played': played, 'words_guessed': guessed}
+            for user_id, (played, guessed) in items
+        ]
+        rows.sort(key=lambda row: row['words_guessed'], reverse=True)
+        return rows
+
+    async def get_overall_stats(self, guild_id=None):
+        return self._rows((user_id, counts) for (guild, user_id), counts in self.totals.items() if guild == guild_id)
+
+    async def get_monthly_stats(self, guild_id=None):
+        month = datetime.datetime.now(TIMEZONE).date().replace(day=1)
+        return self._rows(
+            (user_id, counts) for (m, guild, user_id), counts in self.monthly.items()
+            if m == month and guild == guild_id
+        )
+
+    async def get_seen_answers(self, user_id, version):
+        saved = self.seen_answers.get(user_id)
+        return saved[1] if saved and saved[0] == version else None
+
+    async def save_seen_answers(self, rows, version):
+        merged = []
+        for user_id, cycle, seen in rows:
+            state = (cycle, seen)
+            saved = self.seen_answers.get(user_id)
+            if saved and saved[0] == version:
+                state = merge_seen(saved[1], state)
+            self.seen_answers[user_id] = (version, state)
+            merged.append((user_id, *state))
+        return merged
+
+    def cache_stats(self):
+        return self.leaderboards.stats()
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send_message(self, content=None, **kwargs):
+        self.interaction.responded(content)
+
+    async def defer(self, **kwargs):
+        self.interaction.responded(None)
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self.interaction.messages.append(content)
+
+
+class FakeGuild:
+    """Guild whose member cache knows every player, so leaderboards never hit the API."""
+
+    id = 1
+
+    def get_member(self, user_id):
+        return types.SimpleNamespace(id=user_id, name=f"player{user_id}")
+
+
+class FakeInteraction:
+    """Stands in for discord.Interaction, recording when the bot answered."""
+
+    def __init__(self, user_id, guild):
+        self.user = types.SimpleNamespace(id=user_id, name=f"player{user_id}")
+        self.guild = guild
+        self.guild_id = guild.id
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.extras = {}
+        self.messages = []
+        self.started = time.perf_counter()
+        self.response_time = None
+
+    def responded(self, content):
+        if self.response_time is None:
+            self.response_time = time.perf_counter() - self.started
+        self.messages.append(content)
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.guild = FakeGuild()
+        self.latencies = {name: [] for name in COMMANDS}  # Time until the handler finished
+        self.errors = {name: 0 for name in COMMANDS}
+        self.games = 0
+
+    async def call(self, user_id, name, **kwargs):
+        interaction = FakeInteraction(user_id, self.guild)
+        try:
+            await COMMANDS[name].callback(interaction, **kwargs)
+        except Exception as e:
+            self.errors[name] += 1
+            print(f"/{name} failed: {e!r}")
+            return interaction
+        if interaction.response_time is None or any(ERROR_REPLY in str(content) for content in interaction.messages):
+            # No response is what Discord shows as "The application did not
+            # respond"; the leaderboards catch their own errors and say so.
+            self.errors[name] += 1
+        else:
+            self.latencies[name].append(time.perf_counter() - interaction.started)
+        return interaction
+
+    async def think(self):
+        if self.args.think:
+            await asyncio.sleep(random.uniform(0, 2 * self.args.think))
+        else:
+            # Still let other players in, as separate gateway events would
+            await asyncio.sleep(0)
+
+    async def play(self, user_id):
+        for _ in range(self.args.games):
+            await self.call(user_id, 'guessle')
+            candidates = word_index.answers
+            while True:
+                await self.think()
+                roll = random.random()
+                if roll < 0.05:
+                    await self.call(user_id, 'status')
+                    continue
+                if roll < 0.07:
+                    await self.call(user_id, random.choice(('leaderboard', 'monthly')))
+                    continue
+                if roll < 0.08:
+                    await self.call(user_id, 'giveup')
+                    break
+                guess = random.choice(candidates)
+                await self.call(user_id, 'guess', word=guess)
+                game = bot.user_games.get(user_id)
+                if game is None:
+                    break
+                # Keep only answers that would have produced the same feedback
+                pattern = game.patterns[-1]
+                candidates = [word for word in candidates if score(guess, word) == pattern] or word_index.answers
+            self.games += 1
+
+    async def run(self):
+        await bot.user_stats.start()
+        await bot.board_renderer.start()
+        bot.answer_rotation.start()
+        start = time.perf_counter()
+        await asyncio.gather(*(self.play(user_id) for user_id in range(1, self.args.players + 1)))
+        elapsed = time.perf_counter() - start
+        await bot.answer_rotation.stop()
+        await bot.user_stats.close()
+        bot.board_renderer.close()
+        return elapsed
+
+    def report(self, elapsed):
+        total = sum(len(samples) for samples in self.latencies.values())
+        commands = {}
+        for name, samples in self.latencies.items():
+            samples.sort()
+            commands[name] = {
+                'count': len(samples),
+                'errors': self.errors[name],
+                'p50': percentile(samples, 50),
+                'p95': percentile(samples, 95),
+                'p99': percentile(samples, 99),
+            }
+        return {
+            'players': self.args.players,
+            'games': self.games,
+            'seconds': round(elapsed, 3),
+            'commands_per_second': round(total / elapsed, 1) if elapsed else None,
+            'commands': commands,
+        }
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def print_report(report):
+    print(f"{report['players']} players, {report['games']} games in {report['seconds']:.2f}s, "
+          f"{report['commands_per_second']:,.0f} commands/s")
+    print(f"{'command':<12} {'count':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in report['commands'].items():
+        if not row['count'] and not row['errors']:
+            continue
+        p50, p95, p99 = (f"{row[key] * 1000:9.3f}" if row[key] is not None else f"{'-':>9}" for key in ('p50', 'p95', 'p99'))
+        print(f"{name:<12} {row['count']:>8} {row['errors']:>7} {p50} {p95} {p99}")
+
+
+def parse_limits(values):
+    limits = {}
+    for value in values:
+        name, _, seconds = value.partition('=')
+        if name not in COMMANDS or not seconds:
+            raise argparse.ArgumentTypeError(f"Expected COMMAND=SECONDS with a command from {', '.join(COMMANDS)}: {value!r}")
+        limits[name] = float(seconds)
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=500, help="concurrent players")
+    parser.add_argument('--games', type=int, default=3, help="games per player")
+    parser.add_argument('--think', type=float, default=0.0, help="mean seconds between a player's commands")
+    parser.add_argument('--stats', choices=('memory', 'postgres'), default='memory')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--max-p99', nargs='*', default=[], metavar='COMMAND=SECONDS',
+                        help="fail if a command's p99 latency is higher")
+    args = parser.parse_args()
+    try:
+        limits = parse_limits(args.max_p99)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    random.seed(args.seed)
+    if args.stats == 'memory':
+        bot.user_stats = bot.answer_rotation.stats = MemoryStats()
+
+    test = LoadTest(args)
+    elapsed = asyncio.run(test.run())
+    report = test.report(elapsed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    failed = False
+    for name, limit in limits.items():
+        p99 = report['commands'][name]['p99']
+        if p99 is not None and p99 > limit:
+            print(f"FAIL: /{name} p99 {p99 * 1000:.3f}ms is over {limit * 1000:.3f}ms")
+            failed = True
+    errors = sum(row['errors'] for row in report['commands'].values())
+    if errors:
+        print(f"FAIL: {errors} command(s) failed")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark the journal session store with many open games.
+
+Records N games (default 100k) with 0-5 guesses each, then measures how
+long recording a change takes, how long committing takes, and how long a
+restart needs to replay the games, both from the journal alone and from a
+snapshot.
+
+Usage: python benchmarks/session_recovery.py [--games N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sessions import JournalBackend, SessionStore  # noqa: E402
+from words import word_index  # noqa: E402
+
+
+async def fill(directory, games, snapshot_every):
+    store = SessionStore(JournalBackend(directory, snapshot_every=snapshot_every))
+    await store.start()
+    events = 0
+    record_time = 0.0
+    for user_id in range(games):
+        guesses = [random.choice(word_index.answers) for _ in range(random.randint(0, 5))]
+        start = time.perf_counter()
+        store.start_game(user_id, random.choice(word_index.answers))
+        for guess in guesses:
+            store.add_guess(user_id, guess)
+        record_time += time.perf_counter() - start
+        events += 1 + len(guesses)
+        # Commit in batches the size a busy 50ms window would produce
+        if user_id % 500 == 499:
+            await store.commit()
+    start = time.perf_counter()
+    await store.close()
+    return events, record_time, time.perf_counter() - start
+
+
+async def recover(directory):
+    store = SessionStore(JournalBackend(directory))
+    start = time.perf_counter()
+    games = await store.start()
+    elapsed = time.perf_counter() - start
+    await store.close()
+    return len(games), elapsed
+
+
+async def main(args):
+    for label, snapshot_every in (("journal only", 10 ** 9), ("snapshot + journal", 50000)):
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            events, record_time, close_time = await fill(directory, args.games, snapshot_every)
+            fill_time = time.perf_counter() - start
+            size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+            games, recover_time = await recover(directory)
+            print(f"{label}:")
+            print(f"  {events} events, {record_time / events * 1e9:.0f} ns per recorded event")
+            print(f"  {fill_time:.2f}s to record and commit, {size / 1e6:.1f} MB on disk")
+            print(f"  recovered {games} games in {recover_time * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=100000)
+    asyncio.run(main(parser.parse_args()))
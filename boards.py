@@ -0,0 +1,152 @@
+"""Game boards rendered as images instead of custom emoji text.
+
+The private board and letter tracker take up to 56 custom emoji tokens of
+about 30 characters each, which gets close to Discord's 2000 character
+limit. With ``BOARD_IMAGES=1`` they are sent as one PNG instead.
+
+The tile PNGs under ``emojis/`` are decoded, scaled and reduced to one
+shared palette once, on startup, into a single sprite atlas held as a
+NumPy array of palette indexes. Rendering a board only copies tiles of the
+atlas into a blank canvas array with slice assignments and encodes the
+result; palette PNGs are also about a quarter the size of RGBA ones. That
+runs in a small thread pool so it never blocks the event loop, and the
+PNGs are kept in an LRU keyed by the game's letter states and guesses.
+"""
+import asyncio
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from cache import TTLCache
+from emojis import EMOJI_DIR
+from feedback import KEYBOARD_ROWS, LETTERS, PATTERN_STATES, WORD_LENGTH
+
+BOARD_FILENAME = 'board.png'
+
+TILE_SIZE = 40
+GAP = 4
+# Space between the guesses and the keyboard
+SECTION_GAP = 16
+# The tiles only use a few shades of each color
+PALETTE_COLORS = 64
+
+# Atlas rows, indexed by the LETTER_* tracker states; guesses use the
+# GRAY/YELLOW/GREEN pattern states, which are these rows shifted by one
+ATLAS_COLORS = ('blue', 'gray', 'yellow', 'green')
+
+
+class BoardRenderer:
+    """Renders a game's guesses and letter tracker into one PNG."""
+
+    def __init__(self, enabled=None, workers=None, cache_size=None, tile_size=TILE_SIZE):
+        if enabled is None:
+            enabled = os.getenv('BOARD_IMAGES', '0') == '1'
+        self.enabled = enabled
+        self.workers = workers or int(os.getenv('BOARD_RENDER_WORKERS', 2))
+        self.tile_size = tile_size
+        self.atlas = None
+        self.tiles = None  # tiles[atlas row, letter code] -> size x size palette indexes
+        self.palette = None
+        self.background = 0  # Transparent palette index
+        self.cache = TTLCache(
+            maxsize=cache_size or int(os.getenv('BOARD_CACHE_SIZE', 1024)),
+            ttl=float(os.getenv('BOARD_CACHE_TTL', 900))
+        )
+        self._executor = None
+        self._renders = {}
+
+    def load_atlas(self):
+        """Decode every tile into one palette sprite sheet, a row per color."""
+        size = self.tile_size
+        sheet = Image.new('RGBA', (size * len(LETTERS), size * len(ATLAS_COLORS)))
+        for row, color in enumerate(ATLAS_COLORS):
+            for column, letter in enumerate(LETTERS):
+                path = os.path.join(EMOJI_DIR, color, f"{color}_{letter}.png")
+                with Image.open(path) as tile:
+                    tile = tile.convert('RGBA').resize((size, size), Image.LANCZOS)
+                sheet.paste(tile, (column * size, row * size))
+        atlas = sheet.quantize(PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+        # Tile corners are rounded, so the top-left pixel is transparent
+        self.background = atlas.getpixel((0, 0))
+        self.palette = atlas.getpalette('RGBA')
+        self.tiles = (
+            np.asarray(atlas)
+            .reshape(len(ATLAS_COLORS), size, len(LETTERS), size)
+            .transpose(0, 2, 1, 3)
+            .copy()
+        )
+        self.atlas = atlas
+
+    async def start(self):
+        """Build the atlas off the event loop, if image boards are enabled."""
+        if not self.enabled:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='boards')
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.load_atlas)
+        print("Board images enabled")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def render(self, letters, moves):
+        """PNG of the guess rows above a keyboard colored by ``letters``."""
+        size = self.tile_size
+        step = size + GAP
+        width = max(len(row) for row in KEYBOARD_ROWS) * step - GAP
+        board_height = len(moves) * step
+        keyboard_top = board_height + SECTION_GAP if moves else 0
+        height = keyboard_top + len(KEYBOARD_ROWS) * step - GAP
+        canvas = np.full((height, width), self.background, dtype=np.uint8)
+        tiles = self.tiles
+
+        # Guesses are centered over the keyboard
+        left = (width - (WORD_LENGTH * step - GAP)) // 2
+        for y, (guess, pattern) in enumerate(moves):
+            top = y * step
+            for x, (letter, state) in enumerate(zip(guess, PATTERN_STATES[pattern])):
+                x = left + x * step
+                canvas[top:top + size, x:x + size] = tiles[state + 1, ord(letter) - 97]
+
+        for y, row in enumerate(KEYBOARD_ROWS):
+            top = keyboard_top + y * step
+            left = (width - (len(row) * step - GAP)) // 2
+            for x, letter in enumerate(row):
+                code = ord(letter) - 97
+                x = left + x * step
+                canvas[top:top + size, x:x + size] = tiles[letters[code], code]
+
+        image = Image.frombuffer('P', (width, height), canvas, 'raw', 'P', 0, 1)
+        image.putpalette(self.palette, 'RGBA')
+        out = io.BytesIO()
+        # Fast zlib settings: the image is tiny and rendered per response
+        image.save(out, format='PNG', compress_level=1)
+        return out.getvalue()
+
+    async def board(self, game):
+        """PNG of a game's board, rendered in the pool and cached per game state.
+
+        Concurrent requests for the same state share one render.
+        """
+        key = game.data
+        png = self.cache.get(key)
+        if png is not None:
+            return png
+        task = self._renders.get(key)
+        if task is None:
+            loop = asyncio.get_running_loop()
+            task = asyncio.ensure_future(
+                loop.run_in_executor(self._executor, self.render, game.letters, list(game.moves()))
+            )
+            self._renders[key] = task
+            task.add_done_callback(lambda _: self._renders.pop(key, None))
+        png = await asyncio.shield(task)
+        self.cache.set(key, png)
+        return png
+
+
+board_renderer = BoardRenderer()
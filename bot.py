@@ -1,578 +1,336 @@
-import random
+from startup import startup_timer, command_tree_hash, read_command_hashes, write_command_hashes
 import discord
 from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
 import os
 import asyncio
+import time
 from aiohttp import web
-import threading
-from spellchecker import SpellChecker
-import json
 import datetime
-import psycopg2
-from psycopg2.extras import DictCursor
-import pytz
+import io
+from stats import UserStats, TIMEZONE
+from names import UserNameResolver
+from sessions import create_session_store
+from presence import PresenceScheduler
+from feedback import score
+from emojis import EmojiRegistry, DEFAULT_EMOJI_MAP_PATH, read_default_map
+from metrics import metrics
+from stalls import watchdog
+# Pulls in numpy and Pillow, which hints.py needs too, without loading any words
+from boards import BOARD_FILENAME, board_renderer
+startup_timer.mark('import')
+import wordlists
+from wordlists import WordLists
+from words import ANSWERS_PATH, GUESSES_PATH
+from hints import PATTERNS_PATH, hint_index
+from rotation import AnswerRotation
+from reloader import Reloader
+startup_timer.mark('dictionary')
+from game import GameState, MAX_ATTEMPTS
 
 # Load token from .env
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
 PORT = int(os.getenv("PORT", 8080))  # Get PORT from environment variable, default to 8080
 
-# Set timezone to GMT+8
-TIMEZONE = pytz.timezone('Asia/Singapore')
+# Set by shards.py when this process is one shard worker of several
+SHARD_IDS = [int(shard) for shard in os.getenv("SHARD_IDS", "").split(",") if shard]
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 1))
+
+# Sync commands on every start, even if the command tree looks unchanged
+FORCE_COMMAND_SYNC = os.getenv("FORCE_COMMAND_SYNC", "") not in ("", "0")
 
 # Intents and Bot Setup
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True  # Required for role management
 
-# Initialize spell checker
-spell = SpellChecker()
-
-# Emoji mapping
-EMOJI_MAP = {
-    # Blue emojis
-    'blue_a': '<:blue_a:1370027777562120212>',
-    'blue_b': '<:blue_b:1370027794930598008>',
-    'blue_c': '<:blue_c:1370027809514328156>',
-    'blue_d': '<:blue_d:1370027825662267393>',
-    'blue_e': '<:blue_e:1370027832440258560>',
-    'blue_f': '<:blue_f:1370027887071203471>',
-    'blue_g': '<:blue_g:1370027925243564103>',
-    'blue_h': '<:blue_h:1370027973197037661>',
-    'blue_i': '<:blue_i:1370027985024979065>',
-    'blue_j': '<:blue_j:1370027996639137862>',
-    'blue_k': '<:blue_k:1370028010266427433>',
-    'blue_l': '<:blue_l:1370028023205724251>',
-    'blue_m': '<:blue_m:1370028033691357304>',
-    'blue_n': '<:blue_n:1370028044076584990>',
-    'blue_o': '<:blue_o:1370028053035483187>',
-    'blue_p': '<:blue_p:1370028082270048316>',
-    'blue_q': '<:blue_q:1370028092122206248>',
-    'blue_r': '<:blue_r:1370028102389862430>',
-    'blue_s': '<:blue_s:1370028112775221289>',
-    'blue_t': '<:blue_t:1370028123508445225>',
-    'blue_u': '<:blue_u:1370028143204896830>',
-    'blue_v': '<:blue_v:1370028152864247939>',
-    'blue_w': '<:blue_w:1370028162485977139>',
-    'blue_x': '<:blue_x:1370028174368313394>',
-    'blue_y': '<:blue_y:1370028196824748042>',
-    'blue_z': '<:blue_z:1370028234778873986>',
-
-    # Yellow emojis
-    'yellow_a': '<:yellow_a:1369662416857858088>',
-    'yellow_b': '<:yellow_b:1369662427796476078>',
-    'yellow_c': '<:yellow_c:1369662439431471165>',
-    'yellow_d': '<:yellow_d:1369662450458300557>',
-    'yellow_e': '<:yellow_e:1369662461438988309>',
-    'yellow_f': '<:yellow_f:1369662473069920367>',
-    'yellow_g': '<:yellow_g:1369662483131793458>',
-    'yellow_h': '<:yellow_h:1369662495719165962>',
-    'yellow_i': '<:yellow_i:1369662505365803018>',
-    'yellow_j': '<:yellow_j:1369662515314950244>',
-    'yellow_k': '<:yellow_k:1369662525834268825>',
-    'yellow_l': '<:yellow_l:1369662537712271490>',
-    'yellow_m': '<:yellow_m:1369662556356087921>',
-    'yellow_n': '<:yellow_n:1369662566166691851>',
-    'yellow_o': '<:yellow_o:1369662576425697402>',
-    'yellow_p': '<:yellow_p:1369662585594577037>',
-    'yellow_q': '<:yellow_q:1369662595862102046>',
-    'yellow_r': '<:yellow_r:1369662608000417832>',
-    'yellow_s': '<:yellow_s:1369662618129928262>',
-    'yellow_t': '<:yellow_t:1369662627135098990>',
-    'yellow_u': '<:yellow_u:1369662637989826610>',
-    'yellow_v': '<:yellow_v:1369662647859019796>',
-    'yellow_w': '<:yellow_w:1369662659242491984>',
-    'yellow_x': '<:yellow_x:1369662682667548672>',
-    'yellow_y': '<:yellow_y:1369662697011937421>',
-    'yellow_z': '<:yellow_z:1369662708252676186>',
-
-    # Green emojis
-    'green_a': '<:green_a:1369661679494762637>',
-    'green_b': '<:green_b:1369661689363955833>',
-    'green_c': '<:green_c:1369661700952948766>',
-    'green_d': '<:green_d:1369661711719862343>',
-    'green_e': '<:green_e:1369661721274220584>',
-    'green_f': '<:green_f:1369661853478948915>',
-    'green_g': '<:green_g:1369661862655955035>',
-    'green_h': '<:green_h:1369661873452220456>',
-    'green_i': '<:green_i:1369661882998329444>',
-    'green_j': '<:green_j:1369661891625877605>',
-    'green_k': '<:green_k:1369661901004472391>',
-    'green_l': '<:green_l:1369661909967831101>',
-    'green_m': '<:green_m:1369661918822010892>',
-    'green_n': '<:green_n:1369661928703655946>',
-    'green_o': '<:green_o:1369661938493292665>',
-    'green_p': '<:green_p:1369661947380895844>',
-    'green_q': '<:green_q:1369661959196246036>',
-    'green_r': '<:green_r:1369661969669292163>',
-    'green_s': '<:green_s:1369661979840614471>',
-    'green_t': '<:green_t:1369661991358173215>',
-    'green_u': '<:green_u:1369662036790739065>',
-    'green_v': '<:green_v:1369662046844489758>',
-    'green_w': '<:green_w:1369662056416018462>',
-    'green_x': '<:green_x:1369662066767564932>',
-    'green_y': '<:green_y:1369662076041298111>',
-    'green_z': '<:green_z:1369662086283657236>',
-
-    # Gray emojis
-    'gray_a': '<:gray_a:1369661251235479552>',
-    'gray_b': '<:gray_b:1369661303068692490>',
-    'gray_c': '<:gray_c:1369661314355433594>',
-    'gray_d': '<:gray_d:1369661337965301760>',
-    'gray_e': '<:gray_e:1369661352221868236>',
-    'gray_f': '<:gray_f:1369661377265795082>',
-    'gray_g': '<:gray_g:1369661387940302949>',
-    'gray_h': '<:gray_h:1369661400955486300>',
-    'gray_i': '<:gray_i:1369661411734585364>',
-    'gray_j': '<:gray_j:1369661422681722973>',
-    'gray_k': '<:gray_k:1369661435780534343>',
-    'gray_l': '<:gray_l:1369661446488592475>',
-    'gray_m': '<:gray_m:1369661457217749082>',
-    'gray_n': '<:gray_n:1369661467909029919>',
-    'gray_o': '<:gray_o:1369661476834644009>',
-    'gray_p': '<:gray_p:1369661485785284649>',
-    'gray_q': '<:gray_q:1369661495528525905>',
-    'gray_r': '<:gray_r:1369661506517729371>',
-    'gray_s': '<:gray_s:1369661516076421240>',
-    'gray_t': '<:gray_t:1369661526230827164>',
-    'gray_u': '<:gray_u:1369661536171196466>',
-    'gray_v': '<:gray_v:1369661545432350921>',
-    'gray_w': '<:gray_w:1369661614873247775>',
-    'gray_x': '<:gray_x:1369661622658011146>',
-    'gray_y': '<:gray_y:1369661633667924068>',
-    'gray_z': '<:gray_z:1369661643298177097>'
-}
-
-async def load_emojis(guild):
-    """Load emoji IDs from a JSON file or create it if it doesn't exist."""
-    global EMOJI_MAP
-    print(f"Loading emojis for guild: {guild.name}")
-    try:
-        with open('emoji_map.json', 'r') as f:
-            EMOJI_MAP = json.load(f)
-            print(f"Loaded {len(EMOJI_MAP)} emojis from file")
-    except FileNotFoundError:
-        print("Emoji map not found, creating new one...")
-        # Create emoji map if it doesn't exist
-        EMOJI_MAP = {}
-        for color in ['green', 'yellow', 'gray']:
-            for letter in 'abcdefghijklmnopqrstuvwxyz':
-                emoji_path = f'emojis/{color}/{color}_{letter}.png'
-                if os.path.exists(emoji_path):
-                    print(f"Creating emoji for {emoji_path}")
-                    with open(emoji_path, 'rb') as f:
-                        emoji = await guild.create_custom_emoji(
-                            name=f'{color}_{letter}',
-                            image=f.read()
-                        )
-                        EMOJI_MAP[f'{color}_{letter}'] = str(emoji)
-                        print(f"Created emoji: {emoji}")
-
-        # Save the emoji map
-        print("Saving emoji map...")
-        with open('emoji_map.json', 'w') as f:
-            json.dump(EMOJI_MAP, f)
-        print("Emoji map saved!")
-
-# Common 5-letter words for random selection
-COMMON_WORDS = [
-    "apple", "beach", "cloud", "dance", "earth", "flame", "ghost", "heart",
-    "jelly", "knife", "light", "music", "night", "ocean", "piano", "queen",
-    "river", "smile", "tiger", "unity", "voice", "water", "xenon", "yield",
-    "zebra", "about", "above", "abuse", "actor", "acute", "admit", "adopt",
-    "adult", "after", "again", "agent", "agree", "ahead", "alarm", "album",
-    "alert", "alike", "alive", "allow", "alone", "along", "alter", "among",
-    "anger", "angle", "angry", "apart", "apple", "apply", "arena", "argue",
-    "arise", "array", "aside", "asset", "audio", "audit", "avoid", "award",
-    "aware", "badly", "baker", "bases", "basic", "basis", "beach", "began",
-    "begin", "begun", "being", "below", "bench", "billy", "birth", "black",
-    "blame", "blind", "block", "blood", "board", "boost", "booth", "bound",
-    "brain", "brand", "bread", "break", "breed", "brief", "bring", "broad",
-    "broke", "brown", "build", "built", "buyer", "cable", "calif", "carry",
-    "catch", "cause", "chain", "chair", "chart", "chase", "cheap", "check",
-    "chest", "chief", "child", "china", "chose", "civil", "claim", "class",
-    "clean", "clear", "click", "clock", "close", "coach", "coast", "could",
-    "count", "court", "cover", "craft", "crash", "cream", "crime", "cross",
-    "crowd", "crown", "curve", "cycle", "daily", "dance", "dated", "dealt",
-    "death", "debut", "delay", "depth", "doing", "doubt", "dozen", "draft",
-    "drama", "drawn", "dream", "dress", "drink", "drive", "drove", "dying",
-    "eager", "early", "earth", "eight", "elite", "empty", "enemy", "enjoy",
-    "enter", "entry", "equal", "error", "event", "every", "exact", "exist",
-    "extra", "faith", "false", "fault", "fiber", "field", "fifth", "fifty",
-    "fight", "final", "first", "fixed", "flash", "fleet", "floor", "fluid",
-    "focus", "force", "forth", "forty", "forum", "found", "frame", "frank",
-    "fraud", "fresh", "front", "fruit", "fully", "funny", "giant", "given",
-    "glass", "globe", "going", "grace", "grade", "grand", "grant", "grass",
-    "great", "green", "gross", "group", "grown", "guard", "guess", "guest",
-    "guide", "happy", "harry", "heart", "heavy", "hence", "henry", "horse",
-    "hotel", "house", "human", "ideal", "image", "index", "inner", "input",
-    "issue", "japan", "jimmy", "joint", "jones", "judge", "known", "label",
-    "large", "laser", "later", "laugh", "layer", "learn", "lease", "least",
-    "leave", "legal", "level", "lewis", "light", "limit", "links", "lives",
-    "local", "logic", "loose", "lower", "lucky", "lunch", "lying", "magic",
-    "major", "maker", "march", "maria", "match", "maybe", "mayor", "meant",
-    "media", "metal", "might", "minor", "minus", "mixed", "model", "money",
-    "month", "moral", "motor", "mount", "mouse", "mouth", "movie", "music",
-    "needs", "never", "newly", "night", "noise", "north", "noted", "novel",
-    "nurse", "occur", "ocean", "offer", "order", "other", "ought", "paint",
-    "panel", "paper", "party", "peace", "peter", "phase", "phone", "photo",
-    "piece", "pilot", "pitch", "place", "plain", "plane", "plant", "plate",
-    "point", "pound", "power", "press", "price", "pride", "prime", "print",
-    "prior", "prize", "proof", "proud", "prove", "queen", "quick", "quiet",
-    "quite", "radio", "raise", "range", "rapid", "ratio", "reach", "ready",
-    "refer", "right", "rival", "river", "robin", "roger", "roman", "rough",
-    "round", "route", "royal", "rural", "scale", "scene", "scope", "score",
-    "sense", "serve", "seven", "shall", "shape", "share", "sharp", "sheet",
-    "shelf", "shell", "shift", "shirt", "shock", "shoot", "short", "shown",
-    "sight", "since", "sixth", "sixty", "sized", "skill", "sleep", "slide",
-    "small", "smart", "smile", "smith", "smoke", "solid", "solve", "sorry",
-    "sound", "south", "space", "spare", "speak", "speed", "spend", "spent",
-    "split", "spoke", "sport", "staff", "stage", "stake", "stand", "start",
-    "state", "steam", "steel", "stick", "still", "stock", "stone", "stood",
-    "store", "storm", "story", "strip", "stuck", "study", "stuff", "style",
-    "sugar", "suite", "super", "sweet", "table", "taken", "taste", "taxes",
-    "teach", "teeth", "terry", "texas", "thank", "theft", "their", "theme",
-    "there", "these", "thick", "thing", "think", "third", "those", "three",
-    "threw", "throw", "tight", "times", "tired", "title", "today", "topic",
-    "total", "touch", "tough", "tower", "track", "trade", "train", "treat",
-    "trend", "trial", "tried", "tries", "truck", "truly", "trust", "truth",
-    "twice", "under", "undue", "union", "unity", "until", "upper", "upset",
-    "urban", "usage", "usual", "valid", "value", "video", "virus", "visit",
-    "voice", "waste", "watch", "water", "wheel", "where", "which", "while",
-    "white", "whole", "whose", "woman", "women", "world", "worse", "worst",
-    "would", "wound", "write", "wrong", "wrote", "yield", "young", "youth"
-]
-
-class UserStats:
-    def __init__(self):
-        print("Initializing UserStats...")
-        self.conn = None
-        self.get_db_connection()
-        self.create_tables()
+# Custom letter emojis per guild; data/emojis.json is used in DMs and as a fallback
+emoji_registry = EmojiRegistry(read_default_map())
 
-    def get_db_connection(self):
-        """Get database connection from Neon."""
-        try:
-            database_url = os.getenv('DATABASE_URL')
-            if not database_url:
-                print("DATABASE_URL not found in environment variables!")
-                raise ValueError("DATABASE_URL environment variable not set")
-
-            print("Attempting to connect to database...")
-            if self.conn is not None:
-                try:
-                    self.conn.close()
-                except:
-                    pass
-            self.conn = psycopg2.connect(database_url)
-            print("Successfully connected to database!")
-            return self.conn
-        except Exception as e:
-            print(f"Error connecting to database: {e}")
-            return None
-
-    def ensure_connection(self):
-        """Ensure database connection is active."""
-        try:
-            if self.conn is None or self.conn.closed:
-                self.get_db_connection()
-            return self.conn is not None
-        except Exception as e:
-            print(f"Error ensuring connection: {e}")
-            return False
-
-    def create_tables(self):
-        """Create necessary tables if they don't exist."""
-        try:
-            if not self.ensure_connection():
-                return
-
-            print("Creating tables if they don't exist...")
-            with self.conn.cursor() as cur:
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS games (
-                        id SERIAL PRIMARY KEY,
-                        user_id TEXT NOT NULL,
-                        timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
-                        won BOOLEAN NOT NULL
-                    )
-                """)
-            self.conn.commit()
-            print("Tables created successfully!")
-        except Exception as e:
-            print(f"Error creating tables: {e}")
+# Create a global instance of UserStats
+user_stats = UserStats()
 
-    def add_game(self, user_id: str, won: bool):
-        """Add a game result to the database."""
+# Durable copy of in-progress games, so restarts don't lose them
+sessions = create_session_store(user_stats)
+
+# Answers each player has already had, so they see every one before a repeat.
+# Shard workers share each player's rotation through the database.
+answer_rotation = AnswerRotation(user_stats, shared=bool(SHARD_IDS))
+
+def load_word_lists():
+    """Read the word files and their hint matrix; runs in a worker thread."""
+    lists = WordLists()
+    return lists, hint_index.open(lists.words)
+
+def use_word_lists(loaded):
+    """Start new games on reloaded word lists; games in progress keep their own."""
+    lists, table = loaded
+    wordlists.swap(lists)
+    answer_rotation.use(lists)
+    hint_index.use(table)
+
+# Rebuilt word files and emoji map edits take effect without a restart
+reloader = Reloader()
+reloader.watch('word lists', (GUESSES_PATH, ANSWERS_PATH, PATTERNS_PATH), load_word_lists, use_word_lists)
+reloader.watch('emoji map', (DEFAULT_EMOJI_MAP_PATH,), read_default_map, emoji_registry.set_default)
+
+class GuessleCommandTree(app_commands.CommandTree):
+    """Command tree that records how long each slash command takes."""
+
+    # _call is private, but it is where discord.py dispatches every slash
+    # command, checks and errors included, so timing it covers the whole
+    # command. The public hooks don't: on_app_command_completion only fires
+    # on success and neither hook knows when the command started. It has
+    # the same signature from 2.3 through 2.7.
+    async def _call(self, interaction):
+        start = time.perf_counter()
+        if interaction.command is not None:
+            watchdog.track_command(interaction.command.qualified_name)
         try:
-            if not self.ensure_connection():
-                return
-
-            print(f"Adding game for user {user_id}, won: {won}")
-            # Get current time in GMT+8
-            current_time = datetime.datetime.now(TIMEZONE)
-
-            with self.conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO games (user_id, timestamp, won) VALUES (%s, %s, %s)",
-                    (user_id, current_time, won)
+            await super()._call(interaction)
+        finally:
+            if interaction.command is not None:
+                metrics.observe_command(
+                    interaction.command.qualified_name,
+                    time.perf_counter() - start,
+                    interaction.command_failed
                 )
-            self.conn.commit()
-            print("Game added successfully!")
-        except Exception as e:
-            print(f"Error adding game: {e}")
-
-    def get_monthly_stats(self):
-        """Get stats for the current month in GMT+8."""
-        try:
-            if not self.ensure_connection():
-                return []
-
-            # Get current time in GMT+8
-            current_time = datetime.datetime.now(TIMEZONE)
-            current_month = current_time.strftime("%Y-%m")
-
-            with self.conn.cursor(cursor_factory=DictCursor) as cur:
-                cur.execute("""
-                    SELECT
-                        user_id,
-                        COUNT(*) as games_played,
-                        SUM(CASE WHEN won THEN 1 ELSE 0 END) as words_guessed
-                    FROM games
-                    WHERE to_char(timestamp AT TIME ZONE 'Asia/Singapore', 'YYYY-MM') = %s
-                    GROUP BY user_id
-                    HAVING COUNT(*) > 0
-                    ORDER BY words_guessed DESC
-                """, (current_month,))
-                return [dict(row) for row in cur.fetchall()]
-        except Exception as e:
-            print(f"Error getting monthly stats: {e}")
-            return []
-
-    def get_overall_stats(self):
-        """Get overall stats for all users."""
-        try:
-            if not self.ensure_connection():
-                return []
-
-            with self.conn.cursor(cursor_factory=DictCursor) as cur:
-                cur.execute("""
-                    SELECT
-                        user_id,
-                        COUNT(*) as games_played,
-                        SUM(CASE WHEN won THEN 1 ELSE 0 END) as words_guessed
-                    FROM games
-                    GROUP BY user_id
-                    HAVING COUNT(*) > 0
-                    ORDER BY words_guessed DESC
-                """)
-                return [dict(row) for row in cur.fetchall()]
-        except Exception as e:
-            print(f"Error getting overall stats: {e}")
-            return []
-
-    def __del__(self):
-        """Close database connection when object is destroyed."""
-        if hasattr(self, 'conn') and self.conn:
-            try:
-                self.conn.close()
-            except:
-                pass
-
-# Create a global instance of UserStats
-user_stats = UserStats()
 
-class GuessleBot(commands.Bot):
+class GuessleBot(commands.AutoShardedBot if SHARD_IDS else commands.Bot):
     def __init__(self):
-        super().__init__(command_prefix='/', intents=intents)
+        shard_options = {'shard_ids': SHARD_IDS, 'shard_count': SHARD_COUNT} if SHARD_IDS else {}
+        super().__init__(command_prefix='/', intents=intents, tree_cls=GuessleCommandTree, **shard_options)
         self.web_app = web.Application()
         self.setup_web_routes()
+        self.emoji_task = None
+        self.ready = False  # Set once the first gateway session is up
 
     def setup_web_routes(self):
         """Set up web routes for health checks."""
         self.web_app.router.add_get('/', self.handle_health_check)
         self.web_app.router.add_get('/health', self.handle_health_check)
+        self.web_app.router.add_get('/cache', self.handle_cache_stats)
+        self.web_app.router.add_get('/startup', self.handle_startup_report)
+        self.web_app.router.add_get('/metrics', self.handle_metrics)
+        self.web_app.router.add_get('/stalls', self.handle_stalls)
 
     async def handle_health_check(self, request):
-        """Handle health check requests."""
+        """Handle health check requests; unhealthy until startup has finished."""
+        if not self.ready:
+            return web.Response(text="Bot is starting", status=503)
         return web.Response(text="Bot is running!")
 
-    async def setup_hook(self):
-        # Start the web server
+    async def handle_startup_report(self, request):
+        """Report how long each startup phase took."""
+        return web.json_response(startup_timer.report())
+
+    async def handle_metrics(self, request):
+        """Serve metrics in the Prometheus text format."""
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+
+    async def handle_stalls(self, request):
+        """Top event loop stall sources since boot (with LOOP_WATCHDOG=1)."""
+        return web.json_response({'enabled': watchdog.enabled, 'stalls': watchdog.summary()})
+
+    async def handle_cache_stats(self, request):
+        """Report leaderboard cache hit/miss counters."""
+        return web.json_response(user_stats.cache_stats())
+
+    async def start_web_server(self):
+        """Serve the web routes on PORT; shard workers are each given their own."""
         runner = web.AppRunner(self.web_app)
         await runner.setup()
         site = web.TCPSite(runner, '0.0.0.0', PORT)
         await site.start()
         print(f"Web server started on port {PORT}")
 
-        # Sync commands with Discord
+    async def start_services(self):
+        """Start the stats writer and bring back saved games, concurrently."""
+        # Make sure the stats tables exist before any game can finish
+        _, saved_games = await asyncio.gather(
+            startup_timer.timed('database', user_stats.start()),
+            startup_timer.timed('sessions', sessions.start()),
+        )
+
+        # Bring back games that were in progress before the restart
+        for user_id, (word, guesses) in saved_games.items():
+            game = load_game(word, guesses)
+            if game is None:
+                sessions.end_game(user_id)
+                continue
+            user_games[user_id] = game
+            active_games.add(user_id)
+        print(f"Restored {len(user_games)} game(s) in progress")
+
+    async def sync_commands(self):
+        """Sync commands with Discord, but only if they changed since the last sync."""
+        # Once per deployment rather than per worker
+        if SHARD_IDS and 0 not in SHARD_IDS:
+            return
+        loop = asyncio.get_running_loop()
+        tree_hash = command_tree_hash(self.tree)
+        hashes = await loop.run_in_executor(None, read_command_hashes)
+        key = str(self.application_id)
+        if hashes.get(key) == tree_hash and not FORCE_COMMAND_SYNC:
+            print("Commands unchanged since the last sync, skipping it")
+            return
         try:
             synced = await self.tree.sync()
             print(f"Synced {len(synced)} command(s)")
         except Exception as e:
             print(f"Failed to sync commands: {e}")
+            return
+        hashes[key] = tree_hash
+        await loop.run_in_executor(None, write_command_hashes, hashes)
 
-        # Start the activity update loop
-        self.bg_task = self.loop.create_task(self.update_activity())
-
-        # Load emojis when the bot is ready
-        await self.load_emojis()
+    async def setup_hook(self):
+        startup_timer.mark('login')
+
+        # Start the web server first so health checks see the bot starting
+        await self.start_web_server()
+
+        # Independent of each other, so they run side by side. Saved emoji
+        # maps are read here; guilds are provisioned once they are known.
+        await asyncio.gather(
+            self.start_services(),
+            startup_timer.timed('sync', self.sync_commands()),
+            startup_timer.timed('emoji', emoji_registry.load()),
+            startup_timer.timed('boards', board_renderer.start()),
+        )
+        startup_timer.mark('setup')
 
-    async def update_activity(self):
-        await self.wait_until_ready()
-        while not self.is_closed():
-            # Update activity every 30 seconds
-            await self.change_presence(
-                activity=discord.Activity(
-                    type=discord.ActivityType.playing,
-                    name="Guessle | /help"
-                )
-            )
-            await asyncio.sleep(30)
+        # Start sending presence updates
+        presence.start()
+        metrics.start()
+        watchdog.start()
+        answer_rotation.start()
+        reloader.start()
 
     async def on_ready(self):
         print(f'✅ Logged in as {bot.user}')
-        # Set initial activity
-        await self.change_presence(
-            activity=discord.Activity(
-                type=discord.ActivityType.playing,
-                name="Guessle | /help"
+        # Guilds are only known once the gateway is ready; run in the
+        # background so commands aren't held up by emoji uploads.
+        if self.emoji_task is None:
+            self.emoji_task = asyncio.create_task(
+                startup_timer.timed('emoji provisioning', emoji_registry.provision_all(self.guilds))
             )
-        )
+        if not self.ready:
+            startup_timer.mark('gateway')
+            startup_timer.ready()
+            self.ready = True
+        # A new gateway session starts without our activity
+        presence.reset()
+
+    async def close(self):
+        presence.stop()
+        metrics.stop()
+        watchdog.stop()
+        await reloader.stop()
+        await super().close()
+        await sessions.close()
+        await answer_rotation.stop()
+        await user_stats.close()
+        board_renderer.close()
 
     async def on_guild_join(self, guild):
-        """Load emojis when joining a new guild."""
-        await load_emojis(guild)
+        """Set up emojis when joining a new guild."""
+        await emoji_registry.provision(guild)
 
-    async def load_emojis(self):
-        """Load emojis when the bot is ready."""
-        print("Loading emojis...")
-        for guild in self.guilds:
-            await load_emojis(guild)
-        print("Emojis loaded!")
+    async def on_guild_remove(self, guild):
+        emoji_registry.forget(guild.id)
 
 bot = GuessleBot()
 
+# Cached user ID -> name lookups for leaderboards
+user_names = UserNameResolver(bot)
+
 # Track active games for rich presence
 active_games = set()
+presence = PresenceScheduler(bot, active_games)
 
-def get_random_word():
-    """Generate a random 5-letter word."""
-    return random.choice(COMMON_WORDS)
+def new_game(user_id):
+    """A game whose answer the user hasn't had since their last full cycle through the list.
 
-user_games = {}
+    Call ``answer_rotation.load(user_id)`` first. Drawing doesn't await, so
+    the rotation and the game use the same word lists.
+    """
+    return GameState(answer_rotation.draw(user_id))
 
-# QWERTY keyboard layout for letter tracker
-QWERTY_LAYOUT = [
-    ['blue_q', 'blue_w', 'blue_e', 'blue_r', 'blue_t', 'blue_y', 'blue_u', 'blue_i', 'blue_o', 'blue_p'],
-    ['blue_a', 'blue_s', 'blue_d', 'blue_f', 'blue_g', 'blue_h', 'blue_j', 'blue_k', 'blue_l'],
-    ['blue_z', 'blue_x', 'blue_c', 'blue_v', 'blue_b', 'blue_n', 'blue_m']
-]
-
-def get_feedback(guess, correct, show_word=True, use_custom_emojis=False):
-    feedback = []
-    correct_list = list(correct)
-
-    # Initialize with empty squares
-    empty_squares = ["◻️"] * 5
-    feedback = empty_squares.copy()
-
-    # First pass: mark correct positions
-    for i in range(5):
-        if guess[i] == correct[i]:
-            if use_custom_emojis:
-                emoji_key = f"green_{guess[i]}"
-                feedback[i] = EMOJI_MAP.get(emoji_key, "🟩")
-            else:
-                feedback[i] = "🟩"
-            correct_list[i] = None
-
-    # Second pass: mark correct letters in wrong positions
-    for i in range(5):
-        if feedback[i] == "◻️":
-            if guess[i] in correct_list:
-                if use_custom_emojis:
-                    emoji_key = f"yellow_{guess[i]}"
-                    feedback[i] = EMOJI_MAP.get(emoji_key, "🟨")
-                else:
-                    feedback[i] = "🟨"
-                correct_list[correct_list.index(guess[i])] = None
-            else:
-                if use_custom_emojis:
-                    emoji_key = f"gray_{guess[i]}"
-                    feedback[i] = EMOJI_MAP.get(emoji_key, "⬛")
-                else:
-                    feedback[i] = "⬛"
-
-    # Join with single space
-    return " ".join(feedback)
+user_games = {}
 
-async def is_valid_word(word: str) -> bool:
-    """Check if a word exists using pyspellchecker."""
+def load_game(word, guesses, lists=None):
+    """Rebuild a saved game, or None if its answer is no longer in the answer list."""
     try:
-        # Check if the word is in the spell checker's dictionary
-        return len(spell.unknown([word.lower()])) == 0
-    except Exception:
-        return False
-
-def get_letter_tracker(guesses, correct_word):
-    """Generate a letter tracker based on previous guesses."""
-    # Initialize letter states: 0 = unused (blue), 1 = wrong position (yellow), 2 = correct position (green), -1 = not in word (gray)
-    letter_states = {letter: 0 for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'}
-
-    # Update letter states based on guesses
+        game = GameState.new(word, lists)
+    except KeyError:
+        print(f"Dropping saved game: {word!r} is no longer an answer")
+        return None
     for guess in guesses:
-        for i, letter in enumerate(guess.upper()):
-            if letter == correct_word[i].upper():
-                letter_states[letter] = 2  # Correct position
-            elif letter in correct_word.upper() and letter_states[letter] != 2:
-                letter_states[letter] = 1  # Wrong position
-            elif letter_states[letter] == 0:
-                letter_states[letter] = -1  # Not in word
-
-    # Generate tracker display
-    tracker_lines = []
-    for row in QWERTY_LAYOUT:
-        line = []
-        for emoji_key in row:
-            # Extract letter from emoji key (e.g., 'blue_a' -> 'A')
-            letter = emoji_key.split('_')[1].upper()
-            state = letter_states[letter]
-            if state == 2:  # Correct position
-                line.append(EMOJI_MAP[f'green_{letter.lower()}'])
-            elif state == 1:  # Wrong position
-                line.append(EMOJI_MAP[f'yellow_{letter.lower()}'])
-            elif state == -1:  # Not in word
-                line.append(EMOJI_MAP[f'gray_{letter.lower()}'])
-            else:  # Unused (blue)
-                line.append(EMOJI_MAP[emoji_key])
-        tracker_lines.append(" ".join(line))
-
-    return "\n".join(tracker_lines)
+        game.add_guess(guess)
+    return game
+
+async def get_game(user_id):
+    """Current game of a user, refreshed from the shared store when another shard may have changed it."""
+    if not sessions.shared:
+        return user_games.get(user_id)
+    saved = await sessions.get(user_id)
+    game = user_games.get(user_id)
+    if saved is None:
+        user_games.pop(user_id, None)
+        active_games.discard(user_id)
+        presence.update()
+        return None
+    word, guesses = saved
+    if game is None or game.word != word or game.guesses != guesses:
+        game = load_game(word, guesses, game.lists if game is not None else None)
+        if game is None:
+            return None
+        user_games[user_id] = game
+        active_games.add(user_id)
+        presence.update()
+    return game
+
+async def is_valid_word(word: str) -> bool:
+    """Check if a word is in the accepted guess list."""
+    return wordlists.current().words.is_valid(word.lower())
+
+def stats_guild(interaction):
+    """Guild a game counts towards in the stats; None in DMs, which go to the global board."""
+    return str(interaction.guild_id) if interaction.guild_id else None
+
+async def board_message(game, tiles, intro, outro="", tracker_title="Letter Tracker"):
+    """Message kwargs showing a game's board and letter tracker, as emoji text or one image."""
+    if board_renderer.enabled:
+        png = await board_renderer.board(game)
+        content = "\n".join(part.strip() for part in (intro, outro) if part.strip())
+        return {'content': content, 'file': discord.File(io.BytesIO(png), filename=BOARD_FILENAME)}
+    board = game.private_board(tiles)
+    return {'content': f"{intro}{board}{outro}\n{tracker_title}:\n{game.letter_tracker(tiles)}"}
+
+def answers_left_text(game):
+    count = game.answers_left
+    return f"🔎 {count} possible answer{'s' if count != 1 else ''} left."
 
 @bot.tree.command(name="guessle", description="Start a new Guessle game")
 async def start_guessle(interaction: discord.Interaction):
+    if await get_game(interaction.user.id) is not None:
+        await interaction.response.send_message("You already have an ongoing game! Use `/guess` to continue or `/giveup` to end it.")
+        return
+
+    await answer_rotation.load(interaction.user.id)
+    # Another /guessle may have started a game while this one waited
     if interaction.user.id in user_games:
         await interaction.response.send_message("You already have an ongoing game! Use `/guess` to continue or `/giveup` to end it.")
         return
 
-    word = get_random_word()
-    user_games[interaction.user.id] = {
-        "word": word,
-        "attempts": 0,
-        "guesses": []  # Store previous guesses and their feedback
-    }
+    game = user_games[interaction.user.id] = new_game(interaction.user.id)
+    sessions.start_game(interaction.user.id, game.word)
     active_games.add(interaction.user.id)
 
-    # Update activity to show active game
-    await bot.change_presence(
-        activity=discord.Activity(
-            type=discord.ActivityType.playing,
-            name=f"with {interaction.user.name}"
-        )
-    )
+    # Update activity to show active games
+    presence.update()
 
     await interaction.response.send_message(f"🎉 {interaction.user.name} has started Guessle! Guess a 5-letter word using `/guess`.")
 
@@ -590,149 +348,146 @@ async def guess_word(interaction: discord.Interaction, word: str):
         await interaction.response.send_message("❌ That's not a valid English word. Try another word!", ephemeral=True)
         return
 
-    game = user_games.get(interaction.user.id)
+    game = await get_game(interaction.user.id)
     if not game:
         await interaction.response.send_message("You haven't started a game yet. Use `/guessle` to start one.", ephemeral=True)
         return
 
-    game["attempts"] += 1
-    game["guesses"].append(guessed_word)
+    game.add_guess(guessed_word)
+    tiles = emoji_registry.tiles_for(interaction.guild_id)
+    sessions.add_guess(interaction.user.id, guessed_word, game.attempts - 1)
 
     # Send private feedback with custom emojis, previous guesses, and letter tracker
-    private_message = f"Attempt {game['attempts']} of 6:\n"
-    # Show all previous guesses with custom emojis
-    for guess in game["guesses"]:
-        private_message += f"{get_feedback(guess, game['word'], show_word=True, use_custom_emojis=True)}\n"
+    private_message = await board_message(game, tiles, f"Attempt {game.attempts} of {MAX_ATTEMPTS}:\n")
+    if not game.finished:
+        private_message['content'] += f"\n\n{answers_left_text(game)}"
 
-    # Add letter tracker
-    private_message += "\nLetter Tracker:\n"
-    private_message += get_letter_tracker(game["guesses"], game["word"])
+    await interaction.response.send_message(**private_message, ephemeral=True)
 
-    await interaction.response.send_message(private_message, ephemeral=True)
-
-    if guessed_word == game["word"]:
+    if game.won:
         print(f"User {interaction.user.id} won the game!")
         # Update database when user wins
-        user_stats.add_game(str(interaction.user.id), True)
+        user_stats.record_game(str(interaction.user.id), True, stats_guild(interaction))
 
         # Create public message with only colored boxes
         public_message = f"🎉 {interaction.user.name} has won Guessle!\n\n"
-        for guess in game["guesses"]:
-            public_message += f"{get_feedback(guess, game['word'], show_word=False)}\n"
-        public_message += f"\nGuessed the word in {game['attempts']} attempts!"
+        public_message += game.public_board()
+        public_message += f"\nGuessed the word in {game.attempts} attempts!"
 
         # Create private message with custom emojis and letter tracker
-        private_message = f"🎉 You won Guessle!\n\n"
-        for guess in game["guesses"]:
-            private_message += f"{get_feedback(guess, game['word'], show_word=True, use_custom_emojis=True)}\n"
-        private_message += f"\nThe word was `{game['word'].upper()}`\n\n"
-        private_message += "Final Letter Tracker:\n"
-        private_message += get_letter_tracker(game["guesses"], game["word"])
+        private_message = await board_message(
+            game, tiles, "🎉 You won Guessle!\n\n",
+            f"\nThe word was `{game.word.upper()}`\n", "Final Letter Tracker"
+        )
 
         await interaction.followup.send(public_message)
-        await interaction.followup.send(private_message, ephemeral=True)
+        await interaction.followup.send(**private_message, ephemeral=True)
 
         active_games.remove(interaction.user.id)
         del user_games[interaction.user.id]
+        sessions.end_game(interaction.user.id)
 
-        # Update activity if no more active games
-        if not active_games:
-            await bot.change_presence(
-                activity=discord.Activity(
-                    type=discord.ActivityType.playing,
-                    name="Guessle | /help"
-                )
-            )
-    elif game["attempts"] >= 6:
+        # Update activity to show active games
+        presence.update()
+    elif game.attempts >= MAX_ATTEMPTS:
         # Update database when user loses
         print(f"User {interaction.user.id} lost the game!")
-        user_stats.add_game(str(interaction.user.id), False)
+        user_stats.record_game(str(interaction.user.id), False, stats_guild(interaction))
 
         # Create public message with only colored boxes
         public_message = f"❌ {interaction.user.name} has lost Guessle!\n\n"
-        for guess in game["guesses"]:
-            public_message += f"{get_feedback(guess, game['word'], show_word=False)}\n"
+        public_message += game.public_board()
 
         # Create private message with custom emojis and letter tracker
-        private_message = f"❌ You lost Guessle!\n\n"
-        for guess in game["guesses"]:
-            private_message += f"{get_feedback(guess, game['word'], show_word=True, use_custom_emojis=True)}\n"
-        private_message += f"\nThe word was `{game['word'].upper()}`\n\n"
-        private_message += "Final Letter Tracker:\n"
-        private_message += get_letter_tracker(game["guesses"], game["word"])
+        private_message = await board_message(
+            game, tiles, "❌ You lost Guessle!\n\n",
+            f"\nThe word was `{game.word.upper()}`\n", "Final Letter Tracker"
+        )
 
         await interaction.followup.send(public_message)
-        await interaction.followup.send(private_message, ephemeral=True)
+        await interaction.followup.send(**private_message, ephemeral=True)
 
         active_games.remove(interaction.user.id)
         del user_games[interaction.user.id]
+        sessions.end_game(interaction.user.id)
 
-        # Update activity if no more active games
-        if not active_games:
-            await bot.change_presence(
-                activity=discord.Activity(
-                    type=discord.ActivityType.playing,
-                    name="Guessle | /help"
-                )
-            )
+        # Update activity to show active games
+        presence.update()
 
 @bot.tree.command(name="status", description="Check your current game status")
 async def game_status(interaction: discord.Interaction):
-    game = user_games.get(interaction.user.id)
+    game = await get_game(interaction.user.id)
     if not game:
         await interaction.response.send_message("You don't have an active game. Use `/guessle` to start one!", ephemeral=True)
         return
 
-    # Show all previous attempts privately
-    message = "Your current game status:\n\n"
-    for guess in game["guesses"]:
-        message += f"{get_feedback(guess, game['word'], show_word=False, use_custom_emojis=True)}\n"
-    message += f"\nYou're on attempt {game['attempts']} of 6.\n\n"
+    tiles = emoji_registry.tiles_for(interaction.guild_id)
 
-    # Add letter tracker
-    message += "Letter Tracker:\n"
-    message += get_letter_tracker(game["guesses"], game["word"])
+    # Show all previous attempts privately, with the letter tracker
+    message = await board_message(
+        game, tiles, "Your current game status:\n\n",
+        f"\nYou're on attempt {game.attempts} of {MAX_ATTEMPTS}.\n"
+    )
+    message['content'] += f"\n\n{answers_left_text(game)}"
 
-    await interaction.response.send_message(message, ephemeral=True)
+    await interaction.response.send_message(**message, ephemeral=True)
 
 @bot.tree.command(name="giveup", description="End your current game and reveal the word")
 async def give_up(interaction: discord.Interaction):
-    if interaction.user.id not in user_games:
+    game = await get_game(interaction.user.id)
+    if not game:
         await interaction.response.send_message("You don't have an active game!")
         return
 
-    game = user_games[interaction.user.id]
-    correct = game["word"]
-
     # Update database when user gives up
     print(f"User {interaction.user.id} gave up the game")
-    user_stats.add_game(str(interaction.user.id), False)
+    user_stats.record_game(str(interaction.user.id), False, stats_guild(interaction))
 
     # Create public message with only colored boxes
     public_message = f"❌ {interaction.user.name} has given up Guessle!\n\n"
-    for i, (guess, fb) in enumerate(game["guesses"], 1):
-        public_message += f"{get_feedback(guess, game['word'], show_word=False)}\n"
+    public_message += game.public_board()
 
     # Create private message with the word
     private_message = f"❌ You gave up Guessle!\n\n"
-    for i, (guess, fb) in enumerate(game["guesses"], 1):
-        private_message += f"{fb}\n"
-    private_message += f"\nThe word was `{game['word'].upper()}`"
+    private_message += game.private_board(emoji_registry.tiles_for(interaction.guild_id))
+    private_message += f"\nThe word was `{game.word.upper()}`"
 
     await interaction.response.send_message(public_message)
     await interaction.followup.send(private_message, ephemeral=True)
 
     active_games.remove(interaction.user.id)
     del user_games[interaction.user.id]
+    sessions.end_game(interaction.user.id)
 
-    # Update activity if no more active games
-    if not active_games:
-        await bot.change_presence(
-            activity=discord.Activity(
-                type=discord.ActivityType.playing,
-                name="Guessle | /help"
-            )
-        )
+    # Update activity to show active games
+    presence.update()
+
+@bot.tree.command(name="hint", description="Suggest the most informative next guess")
+async def hint(interaction: discord.Interaction):
+    game = await get_game(interaction.user.id)
+    if not game:
+        await interaction.response.send_message("You don't have an active game. Use `/guessle` to start one!", ephemeral=True)
+        return
+    # Hints only know the newest word lists, not ones a game started with
+    # before a reload. Taken before deferring, so a reload meanwhile can't
+    # swap it for a table of other word lists.
+    table = hint_index.table
+    if table is None or table.words.answers_version != game.lists.version:
+        await interaction.response.send_message("Hints aren't available right now, sorry!", ephemeral=True)
+        return
+
+    # The first hint of a history can take a moment; it runs off the event loop
+    await interaction.response.defer(ephemeral=True)
+    guess, remaining, _ = await hint_index.hint(table, game.moves())
+    if guess is None:
+        await interaction.followup.send("No answer in the word list fits your guesses!", ephemeral=True)
+        return
+
+    if remaining == 1:
+        message = f"💡 Only one answer is left: try `{guess.upper()}`!"
+    else:
+        message = f"💡 {remaining} possible answers left. Your most informative guess is `{guess.upper()}`."
+    await interaction.followup.send(message, ephemeral=True)
 
 @bot.tree.command(name="help", description="Shows all available commands and how to use them")
 async def help_command(interaction: discord.Interaction):
@@ -747,6 +502,7 @@ async def help_command(interaction: discord.Interaction):
         ("/guess <word>", "Make a guess in your current game"),
         ("/status", "Check your current game status"),
         ("/giveup", "End your current game and reveal the word"),
+        ("/hint", "Suggest the most informative next guess"),
         ("/help", "Shows this help message")
     ]
 
@@ -762,7 +518,7 @@ async def leaderboard(interaction: discord.Interaction):
         # Defer the response since this might take a while
         await interaction.response.defer()
 
-        overall_stats = user_stats.get_overall_stats()
+        overall_stats = await user_stats.get_overall_stats(stats_guild(interaction))
 
         if not overall_stats:
             await interaction.followup.send("No games have been played yet!")
@@ -775,13 +531,9 @@ async def leaderboard(interaction: discord.Interaction):
         )
 
         # Add top 10 users to the leaderboard
-        for i, stats in enumerate(overall_stats[:10], 1):
-            try:
-                user = await bot.fetch_user(int(stats['user_id']))
-                username = user.name
-            except:
-                username = "Unknown User"
-
+        top_stats = overall_stats[:10]
+        usernames = await user_names.resolve([int(stats['user_id']) for stats in top_stats], interaction.guild)
+        for i, (stats, username) in enumerate(zip(top_stats, usernames), 1):
             win_rate = (stats['words_guessed'] / stats['games_played'] * 100) if stats['games_played'] > 0 else 0
 
             embed.add_field(
@@ -801,7 +553,7 @@ async def monthly_leaderboard(interaction: discord.Interaction):
         # Defer the response since this might take a while
         await interaction.response.defer()
 
-        monthly_stats = user_stats.get_monthly_stats()
+        monthly_stats = await user_stats.get_monthly_stats(stats_guild(interaction))
 
         if not monthly_stats:
             await interaction.followup.send("No games have been played this month!")
@@ -817,13 +569,9 @@ async def monthly_leaderboard(interaction: discord.Interaction):
         )
 
         # Add top 10 users to the leaderboard
-        for i, stats in enumerate(monthly_stats[:10], 1):
-            try:
-                user = await bot.fetch_user(int(stats['user_id']))
-                username = user.name
-            except:
-                username = "Unknown User"
-
+        top_stats = monthly_stats[:10]
+        usernames = await user_names.resolve([int(stats['user_id']) for stats in top_stats], interaction.guild)
+        for i, (stats, username) in enumerate(zip(top_stats, usernames), 1):
             win_rate = (stats['words_guessed'] / stats['games_played'] * 100) if stats['games_played'] > 0 else 0
 
             embed.add_field(
@@ -842,9 +590,33 @@ async def on_command_error(ctx, error):
     if isinstance(error, commands.MissingRequiredArgument):
         await ctx.send("❌ Missing argument. Please provide all required arguments.")
     elif isinstance(error, commands.CommandNotFound):
-        await ctx.send("❌ Command not found. Available commands: `/guessle`, `/guess`, `/status`, `/giveup`, `/help`, `/leaderboard`, `/monthly`")
+        await ctx.send("❌ Command not found. Available commands: `/guessle`, `/guess`, `/status`, `/giveup`, `/hint`, `/help`, `/leaderboard`, `/monthly`")
     else:
         await ctx.send(f"❌ An error occurred: {str(error)}")
 
-# Start bot
-bot.run(TOKEN)
\ No newline at end of file
+def cache_hit_ratios():
+    score_info = score.cache_info()
+    score_lookups = score_info.hits + score_info.misses
+    return {
+        (('cache', 'leaderboards'),): user_stats.leaderboards.stats()['hit_ratio'],
+        (('cache', 'names'),): user_names.names.stats()['hit_ratio'],
+        (('cache', 'score'),): score_info.hits / score_lookups if score_lookups else 0.0,
+        (('cache', 'hints'),): hint_index.cache.stats()['hit_ratio'],
+        (('cache', 'boards'),): board_renderer.cache.stats()['hit_ratio'],
+    }
+
+metrics.add_commands(command.name for command in bot.tree.get_commands())
+metrics.gauge('guessle_active_games', "Games in progress.", lambda: len(active_games))
+metrics.gauge('guessle_gateway_latency_seconds', "Gateway heartbeat latency.", lambda: bot.latency)
+metrics.gauge('guessle_cache_hit_ratio', "Cache hits per lookup.", cache_hit_ratios)
+metrics.gauge('guessle_event_loop_lag_last_seconds', "Event loop lag at the last check.", lambda: metrics.last_loop_lag)
+
+# Start bot; importing this module (as the load test does) doesn't
+if __name__ == '__main__':
+    startup_timer.mark('init')
+    if os.getenv("FAKE_GATEWAY"):
+        # Local shard testing without Discord, see shards.py
+        from shards import run_fake_gateway
+        run_fake_gateway(bot, sessions)
+    else:
+        bot.run(TOKEN)
\ No newline at end of file
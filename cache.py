@@ -0,0 +1,76 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Small LRU cache whose entries also expire ``ttl`` seconds after being set.
+
+    Not thread-safe; it is only meant to be used from the event loop.
+    """
+
+    def __init__(self, maxsize=128, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        item = self._data.get(key)
+        return item is not None and item[0] > time.monotonic()
+
+    def get(self, key, default=None):
+        """Return a fresh cached value and mark it as recently used."""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        if item[0] <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def peek(self, key):
+        """Return a fresh cached value or None, without counting a lookup or touching LRU order."""
+        item = self._data.get(key)
+        if item is None or item[0] <= time.monotonic():
+            return None
+        return item[1]
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def replace(self, key, value):
+        """Swap the value of a cached entry without extending its lifetime."""
+        item = self._data.get(key)
+        if item is not None:
+            self._data[key] = (item[0], value)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def keys(self):
+        return list(self._data)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'size': len(self._data),
+        }
@@ -0,0 +1,93 @@
+"""Answers still possible after each guess, as bitsets.
+
+Every distinct answer gets one bit of a Python int. The index keeps, for
+each (position, letter), the answers with that letter there, and for each
+(letter, count), the answers with at least that many copies of the letter.
+The feedback for a guess then narrows the current set with a handful of
+ANDs, the same rules score() applies:
+
+- green: the letter is at that position
+- yellow or gray: the letter is not at that position
+- a letter marked n times green or yellow appears at least n times, and
+  exactly n times if one of its copies was also marked gray
+
+Since that is only ANDs, each (guess, pattern) boils down to one mask,
+which is cached, so narrowing a game's set on a guess is usually one AND.
+
+Building the index for the answer list takes a few milliseconds, so one
+is simply built along with each version of the word lists (see wordlists.py).
+"""
+from functools import lru_cache
+
+from feedback import GREEN, PATTERN_STATES, WORD_LENGTH
+
+
+def count_bits(bits):
+    return bin(bits).count("1")
+
+
+class CandidateIndex:
+    """Positional letter bitsets over a list of answers."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.all = 0
+        self.at = [{} for _ in range(WORD_LENGTH)]  # position -> letter -> bits
+        self.at_least = {}  # letter -> [bits with >= 1 copy, >= 2, ...]
+        seen = set()
+        for i, word in enumerate(answers):
+            # Repeated answers count once
+            if word in seen:
+                continue
+            seen.add(word)
+            bit = 1 << i
+            self.all |= bit
+            for position, letter in enumerate(word):
+                self.at[position][letter] = self.at[position].get(letter, 0) | bit
+            for letter in set(word):
+                levels = self.at_least.setdefault(letter, [0] * WORD_LENGTH)
+                for n in range(word.count(letter)):
+                    levels[n] |= bit
+        self.mask = lru_cache(maxsize=1 << 16)(self._mask)
+
+    def with_count(self, letter, n, exact):
+        """Answers with at least (or exactly) ``n`` copies of a letter."""
+        levels = self.at_least.get(letter)
+        if levels is None:
+            return self.all if n == 0 else 0
+        bits = levels[n - 1] if n else self.all
+        if exact and n < WORD_LENGTH:
+            bits &= ~levels[n]
+        return bits
+
+    def narrow(self, bits, guess, pattern):
+        """Answers in ``bits`` that would have given ``pattern`` for ``guess``."""
+        return bits & self.mask(guess, pattern)
+
+    def _mask(self, guess, pattern):
+        """All answers that would have given ``pattern`` for ``guess``."""
+        bits = self.all
+        marked = {}  # letter -> green and yellow marks
+        grayed = set()
+        for position, (letter, state) in enumerate(zip(guess, PATTERN_STATES[pattern])):
+            at = self.at[position].get(letter, 0)
+            if state == GREEN:
+                bits &= at
+            else:
+                bits &= ~at
+            if state:
+                marked[letter] = marked.get(letter, 0) + 1
+            else:
+                grayed.add(letter)
+        for letter in marked.keys() | grayed:
+            bits &= self.with_count(letter, marked.get(letter, 0), letter in grayed)
+        return bits
+
+    def words(self, bits):
+        """Answer words in a bitset."""
+        words = []
+        while bits:
+            low = bits & -bits
+            words.append(self.answers[low.bit_length() - 1])
+            bits ^= low
+        return words
@@ -0,0 +1,243 @@
+"""Per-guild custom letter emojis.
+
+Custom emoji IDs belong to the guild they were uploaded to, so every guild
+gets its own map of emoji name -> ``<:name:id>``. Maps are persisted in
+``emoji_map.json`` keyed by guild ID. The map used in DMs, and for anything
+a guild lacks, is read from ``data/emojis.json`` and can be swapped while
+the bot runs.
+
+On startup a guild whose saved emojis are all still present in
+``guild.emojis`` costs no API calls at all; otherwise emojis already in the
+guild are reused, matched by name or by image hash, and only what is still
+missing is uploaded.
+"""
+import asyncio
+import hashlib
+import json
+import os
+
+import discord
+
+from feedback import EmojiTiles, LETTERS
+
+EMOJI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'emojis')
+EMOJI_MAP_PATH = os.getenv('EMOJI_MAP_PATH', 'emoji_map.json')
+DEFAULT_EMOJI_MAP_PATH = os.path.join(os.path.dirname(EMOJI_DIR), 'data', 'emojis.json')
+
+# Colors uploaded to each guild; unused letters (blue) use the default map
+GUILD_COLORS = ('green', 'yellow', 'gray')
+EMOJI_NAMES = tuple(f"{color}_{letter}" for color in GUILD_COLORS for letter in LETTERS)
+
+
+def emoji_path(name):
+    color = name.split('_', 1)[0]
+    return os.path.join(EMOJI_DIR, color, f"{name}.png")
+
+
+def read_default_map(path=DEFAULT_EMOJI_MAP_PATH):
+    """Emoji name -> emoji string map used where a guild has no emojis of its own."""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class EmojiRegistry:
+    """Emoji maps and tile tables for every guild, with a default for DMs.
+
+    Uploads from all guilds share one semaphore of ``upload_concurrency``
+    slots; discord.py waits out the per-guild rate limit buckets itself, so
+    the semaphore only bounds how many requests are queued at once.
+    """
+
+    def __init__(self, default_map, path=EMOJI_MAP_PATH, upload_concurrency=None):
+        self.default_map = default_map
+        self.default = EmojiTiles(default_map)
+        self.path = path
+        self.upload_concurrency = upload_concurrency or int(os.getenv('EMOJI_UPLOAD_CONCURRENCY', 4))
+        self.maps = {}  # guild ID -> {emoji name: emoji string}
+        self.tiles = {}  # guild ID -> EmojiTiles, built on first use
+        self.uploads = 0
+        self._semaphore = None
+        self._hashes = None  # image hash -> emoji name, for the local PNGs
+        self._save_lock = None
+
+    def tiles_for(self, guild_id):
+        """Tile table for a guild, or the default one for DMs and unknown guilds."""
+        tiles = self.tiles.get(guild_id)
+        if tiles is None:
+            emoji_map = self.maps.get(guild_id)
+            if emoji_map is None:
+                return self.default
+            # Anything the guild lacks falls back to the default emojis
+            tiles = self.tiles[guild_id] = EmojiTiles({**self.default_map, **emoji_map})
+        return tiles
+
+    def _set_map(self, guild_id, emoji_map):
+        self.maps[guild_id] = emoji_map
+        self.tiles.pop(guild_id, None)
+
+    def set_default(self, default_map):
+        """Swap in a new default map; guild tables are rebuilt as they are next used."""
+        self.default_map = default_map
+        self.default = EmojiTiles(default_map)
+        self.tiles = {}
+
+    async def load(self):
+        """Read the saved maps without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        try:
+            saved = await loop.run_in_executor(None, self._read)
+        except FileNotFoundError:
+            return
+        if 'guilds' not in saved:
+            # Older files held a single flat map for whichever guild loaded last
+            print("Emoji map file is in the old single-guild format, ignoring it")
+            return
+        for guild_id, emoji_map in saved['guilds'].items():
+            self._set_map(int(guild_id), emoji_map)
+        print(f"Loaded emoji maps for {len(self.maps)} guild(s)")
+
+    def _read(self):
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    async def save(self):
+        if self._save_lock is None:
+            self._save_lock = asyncio.Lock()
+        async with self._save_lock:
+            data = {'guilds': {str(guild_id): emoji_map for guild_id, emoji_map in self.maps.items()}}
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write, data)
+
+    def _write(self, data):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    async def provision_all(self, guilds):
+        """Make sure every guild has its emojis; guilds are handled concurrently."""
+        changed = await asyncio.gather(*(self.provision(guild, save=False) for guild in guilds))
+        if any(changed):
+            await self.save()
+
+    async def provision(self, guild, save=True):
+        """Build a guild's emoji map, uploading only what it doesn't have yet.
+
+        Returns whether the map changed.
+        """
+        saved = self.maps.get(guild.id, {})
+        present = {str(emoji) for emoji in guild.emojis}
+        if len(saved) == len(EMOJI_NAMES) and all(value in present for value in saved.values()):
+            return False
+
+        emoji_map = {}
+        by_name = {emoji.name: emoji for emoji in guild.emojis}
+        for name in EMOJI_NAMES:
+            if name in by_name:
+                emoji_map[name] = str(by_name[name])
+
+        missing = [name for name in EMOJI_NAMES if name not in emoji_map]
+        # Without permission to upload, the name matches are all we can use;
+        # this also keeps such guilds from costing any requests at startup.
+        if missing and not guild.me.guild_permissions.manage_emojis:
+            missing = []
+        if missing:
+            emoji_map.update(await self._match_by_hash(guild, missing))
+            missing = [name for name in EMOJI_NAMES if name not in emoji_map]
+        if missing:
+            emoji_map.update(await self._upload(guild, missing))
+
+        print(f"Emojis for guild {guild.name}: {len(emoji_map)} of {len(EMOJI_NAMES)}")
+        changed = emoji_map != saved
+        self._set_map(guild.id, emoji_map)
+        if changed and save:
+            await self.save()
+        return changed
+
+    def forget(self, guild_id):
+        self.maps.pop(guild_id, None)
+        self.tiles.pop(guild_id, None)
+
+    async def _local_hashes(self):
+        if self._hashes is None:
+            loop = asyncio.get_running_loop()
+            self._hashes = await loop.run_in_executor(None, self._hash_files)
+        return self._hashes
+
+    @staticmethod
+    def _hash_files():
+        hashes = {}
+        for name in EMOJI_NAMES:
+            try:
+                with open(emoji_path(name), 'rb') as f:
+                    hashes[hashlib.sha256(f.read()).hexdigest()] = name
+            except FileNotFoundError:
+                pass
+        return hashes
+
+    async def _match_by_hash(self, guild, missing):
+        """Find our images among the guild's emojis that were renamed."""
+        hashes = await self._local_hashes()
+        wanted = set(missing)
+        candidates = [emoji for emoji in guild.emojis if emoji.name not in EMOJI_NAMES and not emoji.animated]
+        if not candidates:
+            return {}
+
+        async def fetch(emoji):
+            async with self._upload_slots():
+                try:
+                    return emoji, hashlib.sha256(await emoji.read()).hexdigest()
+                except discord.HTTPException:
+                    return emoji, None
+
+        found = {}
+        for emoji, digest in await asyncio.gather(*(fetch(emoji) for emoji in candidates)):
+            name = hashes.get(digest)
+            if name in wanted and name not in found:
+                found[name] = str(emoji)
+        return found
+
+    def _upload_slots(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.upload_concurrency)
+        return self._semaphore
+
+    async def _upload(self, guild, missing):
+        """Upload missing emojis, as far as the guild's emoji slots allow.
+
+        Discord rate limits emoji creation per guild, so each guild uploads
+        one emoji at a time and the speedup comes from guilds uploading in
+        parallel, each upload holding one of the shared slots.
+        """
+        free = guild.emoji_limit - sum(1 for emoji in guild.emojis if not emoji.animated)
+        if free < len(missing):
+            print(f"Guild {guild.name} has room for {max(free, 0)} of {len(missing)} missing emojis")
+            missing = missing[:max(free, 0)]
+        loop = asyncio.get_running_loop()
+        images = await loop.run_in_executor(None, self._read_images, missing)
+
+        uploaded = {}
+        for name, image in images.items():
+            async with self._upload_slots():
+                try:
+                    emoji = await guild.create_custom_emoji(name=name, image=image)
+                except discord.HTTPException as e:
+                    print(f"Failed to create emoji {name} in guild {guild.name}: {e}")
+                    # Out of slots or permissions; the rest would fail the same way
+                    if e.status in (400, 403):
+                        break
+                    continue
+            self.uploads += 1
+            uploaded[name] = str(emoji)
+        return uploaded
+
+    @staticmethod
+    def _read_images(names):
+        images = {}
+        for name in names:
+            try:
+                with open(emoji_path(name), 'rb') as f:
+                    images[name] = f.read()
+            except FileNotFoundError:
+                pass
+        return images
@@ -0,0 +1,166 @@
+"""Guess scoring and feedback rendering.
+
+Scoring is kept apart from rendering: score() turns a (guess, answer) pair
+into a base-3 pattern, one digit per position with the first letter most
+significant, and the render helpers map a pattern plus the guess to a row
+of tiles through lookup tables built once.
+"""
+from functools import lru_cache
+
+GRAY, YELLOW, GREEN = 0, 1, 2
+WORD_LENGTH = 5
+PATTERN_COUNT = 3 ** WORD_LENGTH
+ALL_GREEN = PATTERN_COUNT - 1
+
+# Place value of each position in a pattern
+POWERS = tuple(3 ** (WORD_LENGTH - 1 - i) for i in range(WORD_LENGTH))
+
+# Per-position tile colors of every pattern
+PATTERN_STATES = tuple(
+    tuple(pattern // power % 3 for power in POWERS)
+    for pattern in range(PATTERN_COUNT)
+)
+
+# Per-position offsets into EmojiTiles.board_tokens of every pattern; adding
+# a letter's ASCII code gives its token
+PATTERN_OFFSETS = tuple(
+    tuple(state * 26 - 97 for state in states)
+    for states in PATTERN_STATES
+)
+
+PLAIN_TILES = ("⬛", "🟨", "🟩")
+PLAIN_ROWS = tuple(
+    " ".join(PLAIN_TILES[state] for state in states)
+    for states in PATTERN_STATES
+)
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+EMOJI_COLORS = ('gray', 'yellow', 'green')
+
+# QWERTY keyboard layout for the letter tracker
+KEYBOARD_ROWS = ('qwertyuiop', 'asdfghjkl', 'zxcvbnm')
+
+# Letter tracker states, one byte per letter
+LETTER_UNUSED, LETTER_ABSENT, LETTER_PRESENT, LETTER_CORRECT = range(4)
+
+
+@lru_cache(maxsize=1 << 16)
+def score(guess, answer):
+    """Pattern (0-242) of a lowercase guess against a lowercase answer.
+
+    Greens are matched first; the remaining answer letters are then handed
+    out as yellows from left to right, so a letter is never marked more
+    often than it appears in the answer. Works on the strings directly:
+    at most five letters are unmatched, so a short list beats converting
+    both words to letter codes on a cache miss.
+    """
+    pattern = 0
+    unmatched = []
+    for g, a, power in zip(guess, answer, POWERS):
+        if g == a:
+            pattern += GREEN * power
+        else:
+            unmatched.append(a)
+    for g, a, power in zip(guess, answer, POWERS):
+        if g != a and g in unmatched:
+            pattern += YELLOW * power
+            unmatched.remove(g)
+    return pattern
+
+
+def update_letter_states(states, guess, answer):
+    """Fold one guess into a 26-slot letter state array.
+
+    A letter is marked correct once it has been guessed in the right spot,
+    present if it is in the answer elsewhere, and absent otherwise. The
+    states are ordered so that a letter only ever moves up. Returns
+    whether any state changed.
+    """
+    changed = False
+    for g, a in zip(guess, answer):
+        i = ord(g) - 97
+        if g == a:
+            new = LETTER_CORRECT
+        elif g in answer:
+            new = LETTER_PRESENT
+        else:
+            new = LETTER_ABSENT
+        if new > states[i]:
+            states[i] = new
+            changed = True
+    return changed
+
+
+def letter_states(guesses, answer):
+    """Letter state array after a list of guesses."""
+    states = bytearray(26)
+    for guess in guesses:
+        update_letter_states(states, guess, answer)
+    return states
+
+
+def render_plain(pattern):
+    """Row of colored squares for a pattern."""
+    return PLAIN_ROWS[pattern]
+
+
+class EmojiTiles:
+    """Lookup table of custom letter emojis built from an emoji map.
+
+    Falls back to the plain squares for any emoji missing from the map.
+    Boards and trackers are rendered on every command rather than kept per
+    game, so the emojis are also stored as tokens with the following space
+    or newline attached, ready to be joined in one go.
+    """
+
+    def __init__(self, emoji_map):
+        # tiles[state][letter] -> emoji
+        self.tiles = tuple(
+            {letter: emoji_map.get(f"{color}_{letter}", PLAIN_TILES[state]) for letter in LETTERS}
+            for state, color in enumerate(EMOJI_COLORS)
+        )
+        self.unused = {letter: emoji_map.get(f"blue_{letter}", "🟦") for letter in LETTERS}
+        # Indexed by the LETTER_* tracker states
+        self.keys = (self.unused,) + self.tiles
+        # board_tokens[position][state * 26 + letter code] -> emoji and separator
+        self.board_tokens = tuple(
+            tuple(
+                tiles[letter] + (" " if position < WORD_LENGTH - 1 else "\n")
+                for tiles in self.tiles for letter in LETTERS
+            )
+            for position in range(WORD_LENGTH)
+        )
+        # (letter code, emoji and separator by tracker state), in keyboard order
+        self.keyboard = tuple(
+            (ord(letter) - 97, tuple(
+                keys[letter] + (" " if column < len(row) - 1 else "\n" if line < len(KEYBOARD_ROWS) - 1 else "")
+                for keys in self.keys
+            ))
+            for line, row in enumerate(KEYBOARD_ROWS)
+            for column, letter in enumerate(row)
+        )
+
+    def row(self, pattern, guess):
+        """Row of letter emojis for a guess scored as ``pattern``."""
+        tiles = self.tiles
+        return " ".join([tiles[state][letter] for state, letter in zip(PATTERN_STATES[pattern], guess)])
+
+    def board(self, records):
+        """Rows of letter emojis, one per line, for packed guesses.
+
+        ``records`` holds six bytes per guess: the five ASCII letters, then
+        the pattern, as GameState stores them.
+        """
+        first, second, third, fourth, fifth = self.board_tokens
+        parts = []
+        for i in range(0, len(records), WORD_LENGTH + 1):
+            a, b, c, d, e = PATTERN_OFFSETS[records[i + 5]]
+            parts += (
+                first[a + records[i]], second[b + records[i + 1]], third[c + records[i + 2]],
+                fourth[d + records[i + 3]], fifth[e + records[i + 4]],
+            )
+        return "".join(parts)
+
+    def tracker(self, states):
+        """Keyboard of letter emojis colored by a letter state array."""
+        return "".join([choices[states[code]] for code, choices in self.keyboard])
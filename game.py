@@ -0,0 +1,104 @@
+"""Compact state of one Guessle game.
+
+A GameState is a slotted object holding the word lists it was started
+with, the answer as an index into their answer list and a single bytes
+object: 26 letter tracker states followed by six bytes per guess (the
+five ASCII letters, then the base-3 feedback pattern). The bytes are
+rebuilt on every guess, which keeps them exactly sized instead of carrying
+a bytearray's spare capacity. The answers still possible are kept as a
+bitset, narrowed on each guess.
+
+Boards and trackers are rendered from the bytes on each command instead of
+being kept per game: the strings are about 1 KB a game, while rendering
+them from EmojiTiles' token tables takes a few microseconds.
+"""
+import wordlists
+from candidates import count_bits
+from feedback import ALL_GREEN, render_plain, score, update_letter_states
+from words import WORD_LENGTH
+
+MAX_ATTEMPTS = 6
+
+LETTERS_SIZE = 26
+GUESS_SIZE = WORD_LENGTH + 1
+
+
+class GameState:
+    """One game in progress."""
+
+    __slots__ = ('lists', 'answer', 'data', 'remaining')
+
+    def __init__(self, answer, lists=None):
+        # Kept for the whole game, even if newer word lists are loaded meanwhile
+        self.lists = lists or wordlists.current()
+        self.answer = answer  # Index into self.lists.words.answers
+        self.data = bytes(LETTERS_SIZE)
+        self.remaining = self.lists.candidates.all  # Bitset of answers that fit the guesses
+
+    @classmethod
+    def new(cls, word, lists=None):
+        """Start a game for an answer word, by default with the current word lists."""
+        lists = lists or wordlists.current()
+        return cls(lists.words.answer_id(word), lists)
+
+    @property
+    def word(self):
+        return self.lists.words.answers[self.answer]
+
+    @property
+    def attempts(self):
+        return (len(self.data) - LETTERS_SIZE) // GUESS_SIZE
+
+    @property
+    def letters(self):
+        """Letter tracker state array."""
+        return self.data[:LETTERS_SIZE]
+
+    def moves(self):
+        """Yield ``(guess, pattern)`` for each guess so far."""
+        data = self.data
+        for i in range(LETTERS_SIZE, len(data), GUESS_SIZE):
+            yield data[i:i + WORD_LENGTH].decode('ascii'), data[i + WORD_LENGTH]
+
+    @property
+    def guesses(self):
+        return [guess for guess, _ in self.moves()]
+
+    @property
+    def patterns(self):
+        return list(self.data[LETTERS_SIZE + WORD_LENGTH::GUESS_SIZE])
+
+    @property
+    def won(self):
+        return len(self.data) > LETTERS_SIZE and self.data[-1] == ALL_GREEN
+
+    @property
+    def finished(self):
+        return self.won or self.attempts >= MAX_ATTEMPTS
+
+    @property
+    def answers_left(self):
+        """How many answers are still consistent with the guesses."""
+        return count_bits(self.remaining)
+
+    def add_guess(self, guess):
+        """Score a lowercase guess and store it."""
+        word = self.word
+        pattern = score(guess, word)
+        letters = bytearray(self.data[:LETTERS_SIZE])
+        update_letter_states(letters, guess, word)
+        self.data = b"".join((letters, self.data[LETTERS_SIZE:], guess.encode('ascii'), bytes((pattern,))))
+        self.remaining = self.lists.candidates.narrow(self.remaining, guess, pattern)
+        return pattern
+
+    def private_board(self, tiles):
+        """Custom emoji feedback rows, one per line."""
+        return tiles.board(self.data[LETTERS_SIZE:])
+
+    def public_board(self):
+        """Colored square feedback rows without letters, one per line."""
+        return "".join(f"{render_plain(pattern)}\n" for pattern in self.patterns)
+
+    def letter_tracker(self, tiles):
+        """Letter tracker of the custom letter emojis."""
+        return tiles.tracker(self.data)
@@ -0,0 +1,220 @@
+"""Entropy-based hints from a precomputed feedback pattern matrix.
+
+``data/patterns.bin`` holds score(guess, answer) for every accepted guess
+(rows, in ``guesses.bin`` order) against every answer (columns, in
+``answers.bin`` order) as uint8, after a header with a hash of the two word
+files it was built from. The matrix is memory-mapped, so processes share
+it through the page cache, and a hint is a few NumPy reductions over the
+columns of the answers still possible. Build it after the word files:
+
+    python hints.py build
+"""
+import asyncio
+import bisect
+import hashlib
+import os
+import random
+import sys
+
+import numpy as np
+
+from cache import TTLCache
+from feedback import GREEN, PATTERN_COUNT, POWERS, WORD_LENGTH, YELLOW, score
+from words import ANSWERS_PATH, DATA_DIR, GUESSES_PATH, decode, encode, word_index
+
+PATTERNS_PATH = os.path.join(DATA_DIR, 'patterns.bin')
+MAGIC = b'GSPAT1\0\0'
+HEADER_SIZE = len(MAGIC) + hashlib.sha256().digest_size
+
+# Guess rows scored per step, to bound the temporary arrays to a few MB
+CHUNK_ROWS = 1024
+
+
+def word_files_hash(paths=(GUESSES_PATH, ANSWERS_PATH)):
+    """Hash of the word files a pattern matrix is built from."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.digest()
+
+
+def letter_array(words):
+    """Letter codes (a=0 ... z=25) of each word, as a (words, 5) array."""
+    return np.frombuffer("".join(words).encode('ascii'), dtype=np.uint8).reshape(-1, WORD_LENGTH) - 97
+
+
+def pattern_row(guess, answers):
+    """score() of one guess (letter codes) against every answer, vectorized.
+
+    Follows score(): greens first, then each remaining guess letter
+    is yellow while the answer still has unmatched copies of it.
+    """
+    green = answers == guess
+    pattern = (green * np.array(POWERS) * GREEN).sum(axis=1)
+    yellows = []
+    for i in range(WORD_LENGTH):
+        letter = guess[i]
+        unmatched = ((answers == letter) & ~green).sum(axis=1)
+        used = sum((yellows[j] for j in range(i) if guess[j] == letter), np.zeros(len(answers), dtype=np.int64))
+        yellow = ~green[:, i] & (used < unmatched)
+        yellows.append(yellow)
+        pattern += yellow * (YELLOW * POWERS[i])
+    return pattern.astype(np.uint8)
+
+
+def build(path=PATTERNS_PATH):
+    """Write the guess x answer pattern matrix for the current word files."""
+    guesses = [decode(code) for code in word_index.guesses]
+    answers = letter_array(word_index.answers)
+    matrix = np.empty((len(guesses), len(answers)), dtype=np.uint8)
+    for row, guess in enumerate(letter_array(guesses)):
+        matrix[row] = pattern_row(guess, answers)
+
+    # Spot check against score() itself, so the two can't silently disagree
+    rng = random.Random(1)
+    for _ in range(20000):
+        row, column = rng.randrange(len(guesses)), rng.randrange(len(answers))
+        expected = score(guesses[row], word_index.answers[column])
+        if matrix[row, column] != expected:
+            raise AssertionError(f"Pattern of {guesses[row]!r} against {word_index.answers[column]!r} "
+                                 f"is {matrix[row, column]}, score() says {expected}")
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + word_files_hash())
+        matrix.tofile(f)
+    os.replace(tmp_path, path)
+    print(f"Wrote {len(guesses)}x{len(answers)} pattern matrix to {path}")
+
+
+class PatternTable:
+    """The pattern matrix of one version of the word lists."""
+
+    def __init__(self, words, matrix):
+        self.words = words
+        self.matrix = matrix
+        # One column per distinct answer; the answer list may repeat a word
+        self.columns = np.array(sorted(set(words.answer_ids.values())), dtype=np.intp)
+
+    @classmethod
+    def open(cls, words, path=PATTERNS_PATH):
+        """Map the matrix for ``words``, or None if it is missing or was built from other word files."""
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(HEADER_SIZE)
+        except FileNotFoundError:
+            print(f"{path} not found, /hint is disabled; run `python hints.py build`")
+            return None
+        if header != MAGIC + word_files_hash():
+            print(f"{path} is out of date with the word files, /hint is disabled; run `python hints.py build`")
+            return None
+        matrix = np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER_SIZE,
+                           shape=(len(words.guesses), len(words.answers)))
+        return cls(words, matrix)
+
+    def guess_row(self, guess):
+        codes = self.words.guesses
+        code = encode(guess)
+        i = bisect.bisect_left(codes, code)
+        if i == len(codes) or codes[i] != code:
+            raise KeyError(guess)
+        return i
+
+    def remaining(self, moves):
+        """Answer columns consistent with every ``(guess, pattern)`` so far."""
+        columns = self.columns
+        for guess, pattern in moves:
+            row = self.matrix[self.guess_row(guess)]
+            columns = columns[row[columns] == pattern]
+        return columns
+
+    def best_guess(self, moves):
+        """``(guess, answers left, expected bits)`` for a game's moves.
+
+        Runs in a worker thread; NumPy does the heavy lifting without
+        holding the GIL for most of it.
+        """
+        words = self.words
+        columns = self.remaining(moves)
+        count = len(columns)
+        if count == 0:
+            return None, 0, 0.0
+        possible = np.zeros(len(words.guesses), dtype=bool)
+        for column in columns:
+            possible[self.guess_row(words.answers[column])] = True
+
+        # Entropy of each guess's pattern distribution over the remaining
+        # answers: log2(n) - sum(c * log2(c)) / n over the pattern counts c
+        entropy = np.empty(len(words.guesses))
+        for start in range(0, len(entropy), CHUNK_ROWS):
+            block = self.matrix[start:start + CHUNK_ROWS][:, columns].astype(np.intp)
+            rows = len(block)
+            block += np.arange(rows)[:, None] * PATTERN_COUNT
+            counts = np.bincount(block.ravel(), minlength=rows * PATTERN_COUNT).reshape(rows, PATTERN_COUNT)
+            weighted = counts * np.log2(counts, out=np.zeros(counts.shape), where=counts > 0)
+            entropy[start:start + rows] = np.log2(count) - weighted.sum(axis=1) / count
+
+        # Among equally good guesses, prefer one that could win outright
+        best = np.flatnonzero(entropy >= entropy.max() - 1e-9)
+        winners = best[possible[best]]
+        row = winners[0] if len(winners) else best[0]
+        return decode(words.guesses[row]), count, float(entropy[row])
+
+
+class HintIndex:
+    """Suggests the guess that is expected to narrow down the answers the most.
+
+    The pattern table can be swapped for one of newer word lists while the
+    bot runs; hints in progress finish with the table they started with.
+    """
+
+    def __init__(self, path=PATTERNS_PATH, cache_size=None):
+        self.path = path
+        self.cache_size = cache_size or int(os.getenv('HINT_CACHE_SIZE', 4096))
+        self.table = None
+        self.cache = None
+        self._queries = {}
+        self.use(PatternTable.open(word_index, path))
+
+    def open(self, words):
+        """Map the matrix for other word lists; safe to call from a worker thread."""
+        return PatternTable.open(words, self.path)
+
+    def use(self, table):
+        """Switch to a table from open(); cached hints were for the old one."""
+        self.table = table
+        self.cache = TTLCache(maxsize=self.cache_size, ttl=float('inf'))
+        self._queries = {}
+
+    async def hint(self, table, moves):
+        """Best next guess for a game from ``table``, cached per distinct guess history.
+
+        Callers take ``self.table`` and check it fits the game before their
+        first await, so a reload can't change the table under them. If it
+        was replaced since, the hint is still computed from it, just not
+        cached. Concurrent requests for the same history share one computation.
+        """
+        key = tuple(moves)
+        loop = asyncio.get_running_loop()
+        if table is not self.table:
+            return await loop.run_in_executor(None, table.best_guess, key)
+        cache, queries = self.cache, self._queries
+        result = cache.get(key)
+        if result is not None:
+            return result
+        task = queries.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loop.run_in_executor(None, table.best_guess, key))
+            queries[key] = task
+            task.add_done_callback(lambda _: queries.pop(key, None))
+        result = await asyncio.shield(task)
+        cache.set(key, result)
+        return result
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['build']:
+        sys.exit("Usage: python hints.py build")
+    build()
+else:
+    hint_index = HintIndex()
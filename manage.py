@@ -0,0 +1,83 @@
+"""Maintenance commands for the Guessle stats database.
+
+Usage:
+    python manage.py backfill-counters
+    python manage.py partition-games
+    python manage.py rollup [--keep-months N]
+    python manage.py assign-guild GUILD_ID
+"""
+import argparse
+import asyncio
+
+from dotenv import load_dotenv
+
+from stats import UserStats
+
+
+async def backfill_counters(stats, args):
+    """Rebuild the leaderboard counter tables from the games table."""
+    await stats.create_tables()
+    print("Rebuilding leaderboard counters from games...")
+    users, months = await stats.backfill_counters()
+    print(f"Backfilled totals for {users} user(s) and {months} user-month row(s)")
+
+
+async def partition_games(stats, args):
+    """Convert the games table to monthly range partitions."""
+    await stats.create_tables()
+    print("Partitioning games by month...")
+    moved = await stats.partition_games()
+    if moved is None:
+        print("games is already partitioned")
+    else:
+        print(f"Moved {moved} game(s) into monthly partitions")
+
+
+async def rollup(stats, args):
+    """Fold games older than --keep-months into monthly totals and drop them."""
+    await stats.create_tables()
+    months = await stats.roll_up_games(args.keep_months)
+    print(f"Rolled up {len(months)} month(s)")
+
+
+async def assign_guild(stats, args):
+    """Count games recorded without a server towards one server's leaderboards."""
+    await stats.create_tables()
+    assigned = await stats.assign_guild(args.guild_id)
+    print(f"Assigned {assigned} game(s) to guild {args.guild_id}")
+
+
+COMMANDS = {
+    'backfill-counters': backfill_counters,
+    'partition-games': partition_games,
+    'rollup': rollup,
+    'assign-guild': assign_guild,
+}
+
+
+async def run(args):
+    stats = UserStats(pool_size=1, query_timeout=args.timeout)
+    try:
+        await COMMANDS[args.command](stats, args)
+    finally:
+        await stats.close()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Guessle database maintenance")
+    parser.add_argument('--timeout', type=float, default=600,
+                        help="seconds before a statement is abandoned (default: 600)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('backfill-counters', help=backfill_counters.__doc__)
+    subparsers.add_parser('partition-games', help=partition_games.__doc__)
+    rollup_parser = subparsers.add_parser('rollup', help=rollup.__doc__)
+    rollup_parser.add_argument('--keep-months', type=int, default=12,
+                               help="full months of raw games to keep before the current one (default: 12)")
+    assign_parser = subparsers.add_parser('assign-guild', help=assign_guild.__doc__)
+    assign_parser.add_argument('guild_id', type=int, help="ID of the Discord server")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
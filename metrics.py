@@ -0,0 +1,166 @@
+"""In-process metrics served in the Prometheus text format.
+
+Everything is updated from the event loop thread only, so recording is a
+couple of list and attribute updates with no locks. Histograms keep one
+slot per bucket, allocated up front; cumulative counts are only worked
+out when /metrics is scraped. Values that already live elsewhere (active
+games, cache counters, gateway latency) are read at scrape time through
+gauge callbacks instead of being copied on every change.
+"""
+import asyncio
+import bisect
+import math
+import time
+
+# Upper bounds in seconds, from 1ms to 10s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LOOP_LAG_INTERVAL = 0.5
+
+
+class Histogram:
+    """Latency histogram with fixed buckets."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == math.inf else repr(bound)
+            lines.append(f"{name}_bucket{_labels(labels, le=le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{_labels(labels)} {self.count}")
+        return lines
+
+
+def _number(value):
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    return value
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class Metrics:
+    """Registry of the bot's metrics."""
+
+    def __init__(self):
+        self.command_latency = {}  # command name -> Histogram
+        self.command_errors = {}  # command name -> count
+        self.query_latency = {}  # query name -> Histogram
+        self.query_errors = {}  # query name -> count
+        self.loop_lag = Histogram()
+        self.last_loop_lag = 0.0
+        self._gauges = []  # (name, help, callback returning {labels tuple: value})
+        self._lag_task = None
+
+    def add_commands(self, names):
+        """Allocate the per-command series up front, so /metrics lists every command."""
+        for name in names:
+            self.command_latency.setdefault(name, Histogram())
+            self.command_errors.setdefault(name, 0)
+
+    def observe_command(self, name, seconds, failed=False):
+        histogram = self.command_latency.get(name)
+        if histogram is None:
+            histogram = self.command_latency[name] = Histogram()
+            self.command_errors[name] = 0
+        histogram.observe(seconds)
+        if failed:
+            self.command_errors[name] += 1
+
+    def observe_query(self, name, seconds, failed=False):
+        histogram = self.query_latency.get(name)
+        if histogram is None:
+            histogram = self.query_latency[name] = Histogram()
+            self.query_errors[name] = 0
+        histogram.observe(seconds)
+        if failed:
+            self.query_errors[name] += 1
+
+    def gauge(self, name, help_text, callback):
+        """Register a gauge read at scrape time.
+
+        ``callback`` returns a number, or a dict of label tuples
+        (``(('cache', 'names'),)``) to numbers.
+        """
+        self._gauges.append((name, help_text, callback))
+
+    def start(self):
+        """Start measuring event loop lag."""
+        self._lag_task = asyncio.get_running_loop().create_task(self._measure_loop_lag())
+
+    def stop(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+
+    async def _measure_loop_lag(self):
+        # How late the loop wakes us up is how long other callbacks held it
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = max(0.0, time.perf_counter() - start - LOOP_LAG_INTERVAL)
+            self.last_loop_lag = lag
+            self.loop_lag.observe(lag)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def histograms(name, help_text, label, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in sorted(series.items()):
+                lines.extend(histogram.render(name, ((label, key),)))
+
+        def counters(name, help_text, label, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_labels(((label, key),))} {value}")
+
+        histograms("guessle_command_duration_seconds", "Slash command handling time.", "command", self.command_latency)
+        counters("guessle_command_errors_total", "Slash commands that raised an error.", "command", self.command_errors)
+        histograms("guessle_db_query_duration_seconds", "Stats database call time, including pool wait.", "query", self.query_latency)
+        counters("guessle_db_query_errors_total", "Stats database calls that failed or timed out.", "query", self.query_errors)
+
+        lines.append("# HELP guessle_event_loop_lag_seconds How late the event loop ran a timer.")
+        lines.append("# TYPE guessle_event_loop_lag_seconds histogram")
+        lines.extend(self.loop_lag.render("guessle_event_loop_lag_seconds", ()))
+
+        for name, help_text, callback in self._gauges:
+            try:
+                value = callback()
+            except Exception as e:
+                print(f"Error reading metric {name}: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, dict):
+                for labels, number in value.items():
+                    lines.append(f"{name}{_labels(labels)} {_number(number)}")
+            else:
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
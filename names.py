@@ -0,0 +1,61 @@
+import asyncio
+
+import discord
+
+from cache import TTLCache
+
+UNKNOWN_USER = "Unknown User"
+
+
+class UserNameResolver:
+    """Resolve user IDs to names for leaderboard embeds.
+
+    Names come from the guild member cache or the bot's user cache when
+    possible. The rest are fetched from the REST API concurrently, at most
+    ``max_concurrency`` at a time, and kept in a bounded TTL cache, so a
+    warm leaderboard renders without any REST calls.
+    """
+
+    def __init__(self, bot, max_concurrency=4, maxsize=2048, ttl=3600.0):
+        self.bot = bot
+        self.max_concurrency = max_concurrency
+        self.names = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.fetches = 0
+        self._fetch_slots = None
+
+    async def resolve(self, user_ids, guild=None):
+        """Return a name for every user ID, in the same order."""
+        names = {}
+        missing = []
+        for user_id in user_ids:
+            user = (guild.get_member(user_id) if guild else None) or self.bot.get_user(user_id)
+            if user is not None:
+                names[user_id] = user.name
+                continue
+            name = self.names.get(user_id)
+            if name is not None:
+                names[user_id] = name
+            elif user_id not in missing:
+                missing.append(user_id)
+
+        if missing:
+            fetched = await asyncio.gather(*(self._fetch(user_id) for user_id in missing))
+            names.update(zip(missing, fetched))
+        return [names[user_id] for user_id in user_ids]
+
+    async def _fetch(self, user_id):
+        if self._fetch_slots is None:
+            self._fetch_slots = asyncio.Semaphore(self.max_concurrency)
+        async with self._fetch_slots:
+            self.fetches += 1
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.NotFound:
+                # Deleted accounts stay unknown; don't ask again until expiry
+                self.names.set(user_id, UNKNOWN_USER)
+                return UNKNOWN_USER
+            except Exception as e:
+                print(f"Error fetching user {user_id}: {e}")
+                return UNKNOWN_USER
+        self.names.set(user_id, user.name)
+        return user.name
@@ -0,0 +1,73 @@
+import asyncio
+import os
+
+import discord
+
+IDLE_ACTIVITY = "Guessle | /help"
+
+
+class PresenceScheduler:
+    """Keeps the bot's presence in sync with the games in progress.
+
+    Callers only mark the presence as stale with update(). A background
+    task works out the activity from ``active_games`` and sends it when it
+    differs from what was last sent, at most once every ``interval``
+    seconds, so a burst of games starting and ending costs one update.
+    """
+
+    def __init__(self, bot, active_games, interval=None):
+        self.bot = bot
+        self.active_games = active_games
+        self.interval = interval or float(os.getenv('PRESENCE_UPDATE_INTERVAL', 15))
+        self.sent = None  # Activity name last sent to Discord
+        self.updates = 0
+        self._stale = None
+        self._task = None
+
+    def activity_name(self):
+        """Activity to show for the current games."""
+        count = len(self.active_games)
+        if not count:
+            return IDLE_ACTIVITY
+        return f"{count} game{'s' if count != 1 else ''} of Guessle | /help"
+
+    def update(self):
+        """Schedule a presence update; cheap enough to call on every change."""
+        # Before start() there is nothing to wake; start() sends the first update
+        if self._stale is not None:
+            self._stale.set()
+
+    def reset(self):
+        """Forget what was sent, e.g. after a fresh gateway session, and send again."""
+        self.sent = None
+        self.update()
+
+    def start(self):
+        # Created here so it belongs to the running loop (Python 3.9)
+        self._stale = asyncio.Event()
+        self._stale.set()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        while not self.bot.is_closed():
+            await self._stale.wait()
+            self._stale.clear()
+            name = self.activity_name()
+            if name != self.sent:
+                try:
+                    await self.bot.change_presence(
+                        activity=discord.Activity(type=discord.ActivityType.playing, name=name)
+                    )
+                    self.sent = name
+                    self.updates += 1
+                except Exception as e:
+                    print(f"Error updating presence: {e}")
+                    self._stale.set()
+            # Changes made meanwhile are picked up by the next pass
+            await asyncio.sleep(self.interval)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
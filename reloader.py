@@ -0,0 +1,98 @@
+"""Pick up changed data files while the bot runs.
+
+Each watched source is a group of files, a ``load`` function that reads
+them and an ``apply`` callback that swaps the result in. The files are
+polled with os.stat every DATA_RELOAD_INTERVAL seconds. Once a change has
+held still for one more poll (so both word files of a rebuild are in
+place), ``load`` runs in a worker thread and ``apply`` runs on the event
+loop, with no await in between that a command could slip into. If loading
+fails, the old version stays in use until the files change again.
+"""
+import asyncio
+import os
+import time
+
+DATA_RELOAD_INTERVAL = 2.0
+
+
+def file_signature(paths):
+    """What changes when any of the files is replaced or rewritten."""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            signature.append(None)
+        else:
+            signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+    return tuple(signature)
+
+
+class Source:
+    def __init__(self, name, paths, load, apply):
+        self.name = name
+        self.paths = paths
+        self.load = load
+        self.apply = apply
+        self.loaded = file_signature(paths)  # Files as of the version in use
+        self.pending = None  # A change seen on the last poll
+
+
+class Reloader:
+    """Polls data files and swaps in new versions of what is read from them."""
+
+    def __init__(self, interval=None):
+        self.interval = interval or float(os.getenv('DATA_RELOAD_INTERVAL', DATA_RELOAD_INTERVAL))
+        self.sources = []
+        self.reloads = 0
+        self._wakeup = None
+        self._stopping = False
+        self._task = None
+
+    def watch(self, name, paths, load, apply):
+        """Reload ``apply(load())`` whenever one of ``paths`` changes."""
+        self.sources.append(Source(name, tuple(paths), load, apply))
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    async def _poll_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            if not self._stopping:
+                await self.poll()
+
+    async def poll(self):
+        """Reload every source whose files changed and have since held still."""
+        for source in self.sources:
+            signature = file_signature(source.paths)
+            if signature == source.loaded:
+                source.pending = None
+            elif signature != source.pending:
+                source.pending = signature
+            else:
+                await self.reload(source, signature)
+
+    async def reload(self, source, signature):
+        source.loaded, source.pending = signature, None
+        start = time.perf_counter()
+        try:
+            loaded = await asyncio.get_running_loop().run_in_executor(None, source.load)
+            source.apply(loaded)
+        except Exception as e:
+            print(f"Error reloading {source.name}, keeping the old version: {e}")
+            return
+        self.reloads += 1
+        print(f"Reloaded {source.name} in {(time.perf_counter() - start) * 1000:.1f} ms")
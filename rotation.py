@@ -0,0 +1,197 @@
+"""Per-user answer rotation, so a player sees every answer before any repeats.
+
+Each player has a fixed-size bitset with one bit per answer (63 bytes for
+504 answers), set once that answer has been dealt to them. New answers are
+drawn uniformly from the unset bits: random picks are retried while they
+hit a seen answer, which takes two tries on average while at least half
+are unseen, and once fewer than 1/8 are left the unseen ones are listed
+and one is picked directly. When every bit is set the cycle starts over.
+
+Bitsets live in memory and are saved to Postgres in batches in the
+background; a player's bitset is read from the database the first time
+they start a game in this process. That read is given
+ROTATION_LOAD_TIMEOUT seconds, so a slow database can't hold up /guessle;
+a read that finishes later is merged into whatever was drawn meanwhile.
+
+Shard workers (see shards.py) deal answers to the same players, so with
+``shared`` the bitset is read again before every draw and saved right
+after it. Saves are merged rather than overwritten: within a cycle the
+bits are OR-ed, and a newer cycle (started when a worker dealt the last
+unseen answer) replaces an older one. Bitsets belong to one version of
+the answer list; when another version is loaded, everyone starts over
+on it.
+"""
+import asyncio
+import os
+import random
+
+import wordlists
+
+ROTATION_FLUSH_INTERVAL = 5.0
+ROTATION_LOAD_TIMEOUT = 0.5
+
+# Random picks to try before listing the unseen answers instead
+MAX_TRIES = 8
+
+
+def merge_seen(saved, drawn):
+    """Merge two ``(cycle, bitset)`` states of one player, as the database does on save."""
+    if saved[0] != drawn[0]:
+        return max(saved, drawn, key=lambda state: state[0])
+    return saved[0], bytes(a | b for a, b in zip(saved[1], drawn[1]))
+
+
+class AnswerRotation:
+    """Seen-answer bitsets per user, with batched write-back through ``stats``."""
+
+    def __init__(self, stats, answer_count=None, version=None, flush_interval=None, load_timeout=None,
+                 shared=False):
+        self.stats = stats
+        self.shared = shared  # Other processes deal answers to the same players
+        lists = wordlists.current()
+        self.answer_count = answer_count or len(lists.words.answers)
+        self.version = version or lists.version
+        self.size = (self.answer_count + 7) // 8
+        self.flush_interval = flush_interval or float(os.getenv('ROTATION_FLUSH_INTERVAL', ROTATION_FLUSH_INTERVAL))
+        self.load_timeout = load_timeout or float(os.getenv('ROTATION_LOAD_TIMEOUT', ROTATION_LOAD_TIMEOUT))
+        self.seen = {}  # user ID -> bytearray bitset
+        self.cycles = {}  # user ID -> how many times they went through every answer
+        self._dirty = set()
+        self._loading = {}
+        self._wakeup = None
+        self._stopping = False
+        self._task = None
+
+    async def load(self, user_id):
+        """Read a user's bitset from the database, waiting at most ``load_timeout``.
+
+        Read once per process, or before every draw when ``shared``.
+        """
+        if user_id in self.seen and not self.shared:
+            return
+        task = self._loading.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(user_id))
+            self._loading[user_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        try:
+            # The read carries on in the background if it takes longer
+            await asyncio.wait_for(asyncio.shield(task), self.load_timeout)
+        except asyncio.TimeoutError:
+            print(f"Seen answers for user {user_id} are slow to load, drawing without them")
+
+    async def _load(self, user_id):
+        version = self.version
+        try:
+            saved = await self.stats.get_seen_answers(str(user_id), version)
+        except Exception as e:
+            # Better a possible repeat than a game that won't start
+            print(f"Error loading seen answers for user {user_id}: {e}")
+            saved = None
+        if version != self.version or saved is None:
+            return
+        if self._merge(user_id, *saved):
+            # Drawn from while the read was still running: keep both, saved together
+            self._dirty.add(user_id)
+
+    def _merge(self, user_id, cycle, saved):
+        """Fold a saved state into the user's; returns whether theirs has draws the saved one lacks."""
+        if len(saved) != self.size:
+            return False
+        bits = self.seen.get(user_id)
+        if bits is None:
+            self.seen[user_id] = bytearray(saved)
+            self.cycles[user_id] = cycle
+            return False
+        drawn = (self.cycles.get(user_id, 0), bytes(bits))
+        merged = merge_seen((cycle, saved), drawn)
+        self.cycles[user_id], bits[:] = merged
+        return merged != (cycle, saved)
+
+    def draw(self, user_id):
+        """Index of an answer the user hasn't had this cycle, and mark it seen."""
+        bits = self.seen.get(user_id)
+        if bits is None:
+            bits = self.seen[user_id] = bytearray(self.size)
+        unseen_count = self.answer_count - bin(int.from_bytes(bits, 'little')).count("1")
+        if unseen_count <= 0:
+            # Seen them all: start the next cycle
+            bits[:] = bytes(self.size)
+            self.cycles[user_id] = self.cycles.get(user_id, 0) + 1
+            unseen_count = self.answer_count
+
+        index = None
+        if unseen_count * 8 >= self.answer_count:
+            for _ in range(MAX_TRIES):
+                candidate = random.randrange(self.answer_count)
+                if not bits[candidate >> 3] & (1 << (candidate & 7)):
+                    index = candidate
+                    break
+        if index is None:
+            unseen = [i for i in range(self.answer_count) if not bits[i >> 3] & (1 << (i & 7))]
+            index = random.choice(unseen)
+
+        bits[index >> 3] |= 1 << (index & 7)
+        self._dirty.add(user_id)
+        if self.shared and self._wakeup is not None:
+            # Save now, so the other workers see it on their next draw
+            self._wakeup.set()
+        return index
+
+    def use(self, lists):
+        """Switch to another version of the answer list, starting everyone over."""
+        if lists.version == self.version:
+            return
+        # Bitsets of the old list are never read again, so unsaved ones can go
+        self._dirty = set()
+        self.answer_count = len(lists.words.answers)
+        self.version = lists.version
+        self.size = (self.answer_count + 7) // 8
+        self.seen = {}
+        self.cycles = {}
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush loop and save whatever changed."""
+        if self._task is not None:
+            # Not cancelled, so a save in progress finishes (see GameWriter.stop)
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Save changed bitsets in one batch; failed ones are retried next time."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = [(str(user_id), self.cycles.get(user_id, 0), bytes(self.seen[user_id])) for user_id in dirty]
+        version = self.version
+        try:
+            merged = await self.stats.save_seen_answers(rows, version)
+        except Exception as e:
+            print(f"Error saving seen answers for {len(rows)} user(s): {e}")
+            # Bitsets of an old answer list are gone by now
+            if version == self.version:
+                self._dirty |= dirty
+            return
+        if version != self.version:
+            return
+        # Pick up what other workers drew for the same players
+        for user_id, cycle, saved in merged:
+            if self._merge(int(user_id), cycle, saved):
+                self._dirty.add(int(user_id))
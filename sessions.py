@@ -0,0 +1,357 @@
+"""Durable storage for in-progress games.
+
+SessionStore keeps a compact in-memory copy of every open game (an immutable
+``(answer, guesses)`` tuple keyed by user ID) and hands each change to a
+backend in batches.
+Recording a change only appends to a list; a background task commits
+everything queued every ``commit_interval`` seconds in one write, so
+persisting a guess adds microseconds to /guess, not a disk or network
+round-trip.
+
+Backends:
+- JournalBackend: append-only local journal plus periodic snapshots.
+- PostgresBackend: a game_sessions table in the stats database.
+- MemoryBackend: nothing is persisted.
+
+Shard workers (see shards.py) use SharedSessionClient instead, which reads
+and writes the games held by the supervisor's SessionStore.
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+
+from psycopg2.extras import execute_values
+
+
+class MemoryBackend:
+    """Keeps nothing; games are lost on restart."""
+
+    async def load(self):
+        return {}
+
+    async def write(self, events, games):
+        pass
+
+    async def close(self):
+        pass
+
+
+class JournalBackend:
+    """Append-only journal of game events with periodic snapshots.
+
+    Each commit appends JSON lines to ``journal.jsonl`` and fsyncs once.
+    After ``snapshot_every`` events the full game table is written to
+    ``snapshot.json`` (atomically, via rename) and the journal is emptied, so
+    replay on boot reads one snapshot plus a short journal.
+    """
+
+    def __init__(self, directory, snapshot_every=10000):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.journal_path = os.path.join(directory, 'journal.jsonl')
+        self.snapshot_path = os.path.join(directory, 'snapshot.json')
+        self._journal = None
+        self._events_since_snapshot = 0
+
+    async def load(self):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._load)
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        games = {}
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                for user_id, word, guesses in json.load(f):
+                    games[user_id] = (word, tuple(guesses))
+        except FileNotFoundError:
+            pass
+
+        try:
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash mid-append
+                        print(f"Skipping unreadable journal line: {line!r}")
+                        continue
+                    apply_event(games, event)
+                    self._events_since_snapshot += 1
+        except FileNotFoundError:
+            pass
+        self._journal = open(self.journal_path, 'a')
+        return games
+
+    async def write(self, events, games):
+        self._events_since_snapshot += len(events)
+        snapshot = None
+        if self._events_since_snapshot >= self.snapshot_every:
+            # Copied here, on the loop, so the snapshot matches the events
+            # written so far; later changes wait in the store's queue. Games
+            # are immutable tuples, so a shallow copy is enough (about 6ms
+            # for 100k games) and the rest happens in the worker thread.
+            snapshot = games.copy()
+            self._events_since_snapshot = 0
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write, events, snapshot)
+
+    def _write(self, events, snapshot):
+        self._journal.write("".join(json.dumps(event) + "\n" for event in events))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        if snapshot is not None:
+            tmp_path = self.snapshot_path + '.tmp'
+            rows = [[user_id, word, guesses] for user_id, (word, guesses) in snapshot.items()]
+            with open(tmp_path, 'w') as f:
+                json.dump(rows, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            # Everything in the journal is now covered by the snapshot
+            self._journal.truncate(0)
+
+    async def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+class PostgresBackend:
+    """Stores one row per open game in the stats database."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    async def load(self):
+        await self.stats.run(self._create_table)
+        rows = await self.stats.run(self._load)
+        return {int(user_id): (word, tuple(guesses)) for user_id, word, guesses in rows}
+
+    @staticmethod
+    def _create_table(conn):
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS game_sessions (
+                    user_id TEXT PRIMARY KEY,
+                    word TEXT NOT NULL,
+                    guesses TEXT[] NOT NULL,
+                    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+                )
+            """)
+
+    @staticmethod
+    def _load(conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT user_id, word, guesses FROM game_sessions")
+            return cur.fetchall()
+
+    async def write(self, events, games):
+        # Only the final state of each touched game matters
+        touched = {event[1] for event in events}
+        upserts = [
+            (str(user_id), games[user_id][0], list(games[user_id][1]))
+            for user_id in touched if user_id in games
+        ]
+        deletes = [str(user_id) for user_id in touched if user_id not in games]
+        await self.stats.run(self._write, upserts, deletes)
+
+    @staticmethod
+    def _write(conn, upserts, deletes):
+        with conn.cursor() as cur:
+            if deletes:
+                cur.execute("DELETE FROM game_sessions WHERE user_id = ANY(%s)", (deletes,))
+            if upserts:
+                execute_values(cur, """
+                    INSERT INTO game_sessions (user_id, word, guesses) VALUES %s
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        word = EXCLUDED.word,
+                        guesses = EXCLUDED.guesses,
+                        updated_at = now()
+                """, upserts)
+
+    async def close(self):
+        pass
+
+
+def apply_event(games, event):
+    """Apply one journal event to a ``{user_id: (word, guesses)}`` table.
+
+    Games are replaced rather than changed, so copies of the table taken
+    for a snapshot stay as they were.
+    """
+    kind, user_id = event[0], event[1]
+    if kind == 'start':
+        games[user_id] = (event[2], ())
+    elif kind == 'guess':
+        # Guess events carry their position so replaying a batch twice
+        # (after a failed commit) doesn't add the guess again.
+        game = games.get(user_id)
+        if game is not None and len(game[1]) == event[3]:
+            games[user_id] = (game[0], game[1] + (event[2],))
+    elif kind == 'end':
+        games.pop(user_id, None)
+
+
+class SessionStore:
+    """In-memory copy of open games, group-committed to a durable backend."""
+
+    # Whether other processes can change games behind this store's back
+    shared = False
+
+    def __init__(self, backend=None, commit_interval=0.05):
+        self.backend = backend or MemoryBackend()
+        self.commit_interval = commit_interval
+        self.games = {}
+        self._pending = []
+        self._wakeup = None
+        self._lock = None
+        self._task = None
+        self._stopping = False
+
+    async def start(self):
+        """Load saved games and start committing. Returns ``{user_id: (word, guesses)}``."""
+        self.games = await self.backend.load()
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._commit_loop())
+        return {user_id: (word, list(guesses)) for user_id, (word, guesses) in self.games.items()}
+
+    async def get(self, user_id):
+        """Current ``(word, guesses)`` of a user's game, or None."""
+        game = self.games.get(user_id)
+        return None if game is None else (game[0], list(game[1]))
+
+    def start_game(self, user_id, word):
+        self._record(['start', user_id, word])
+
+    def add_guess(self, user_id, guess, position=None):
+        """Record a guess; with ``position`` it only applies if that many guesses came before."""
+        game = self.games.get(user_id)
+        if game is not None:
+            self._record(['guess', user_id, guess, len(game[1]) if position is None else position])
+
+    def end_game(self, user_id):
+        self._record(['end', user_id])
+
+    def _record(self, event):
+        apply_event(self.games, event)
+        self._pending.append(event)
+
+    async def _commit_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.commit_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.commit()
+
+    async def commit(self):
+        """Write out everything recorded since the last commit."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # One write at a time, so events reach the backend in order
+        async with self._lock:
+            if not self._pending:
+                return
+            events, self._pending = self._pending, []
+            try:
+                await self.backend.write(events, self.games)
+            except Exception as e:
+                print(f"Error saving {len(events)} game event(s), will retry: {e}")
+                self._pending[:0] = events
+
+    async def close(self):
+        """Finish the commit in progress, write out the rest and close the backend."""
+        if self._task is not None:
+            # Asked to finish rather than cancelled, so a write running in a
+            # worker thread is awaited instead of abandoned
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.commit()
+        await self.backend.close()
+
+
+class SessionManager(BaseManager):
+    """Connection to the supervisor that holds the games of every shard."""
+
+
+SessionManager.register('sessions')
+
+
+class SharedSessionClient:
+    """Session store of a shard worker, backed by the supervisor's SessionStore.
+
+    Writes are sent in the background by a single thread, in order, so they
+    don't block the event loop; get() goes through the same thread and so
+    always sees this worker's own earlier writes.
+    """
+
+    shared = True
+
+    def __init__(self, address, authkey):
+        self.manager = SessionManager(address=address, authkey=authkey)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sessions')
+        self._proxy = None
+
+    async def start(self):
+        """Connect to the supervisor. Games are fetched on demand, so nothing is restored here."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._connect)
+        return {}
+
+    def _connect(self):
+        self.manager.connect()
+        self._proxy = self.manager.sessions()
+
+    async def get(self, user_id):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, 'get', user_id)
+
+    def start_game(self, user_id, word):
+        self._executor.submit(self._call, 'start_game', user_id, word)
+
+    def add_guess(self, user_id, guess, position=None):
+        self._executor.submit(self._call, 'add_guess', user_id, guess, position)
+
+    def end_game(self, user_id):
+        self._executor.submit(self._call, 'end_game', user_id)
+
+    async def flush(self):
+        """Wait until every write sent so far has reached the supervisor."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, lambda: None)
+
+    def _call(self, method, *args):
+        try:
+            return getattr(self._proxy, method)(*args)
+        except Exception as e:
+            print(f"Error calling session store {method}: {e}")
+            raise
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        # Let queued writes reach the supervisor before exiting
+        await loop.run_in_executor(None, self._executor.shutdown)
+
+
+def create_session_store(stats):
+    """Build the session store selected by the SESSION_STORE environment variable."""
+    kind = os.getenv('SESSION_STORE', 'journal')
+    if kind == 'shared':
+        host, port = os.getenv('SESSION_SERVER', '127.0.0.1:8765').rsplit(':', 1)
+        print("Using the supervisor's shared session store")
+        return SharedSessionClient((host, int(port)), os.getenv('SESSION_SERVER_KEY', '').encode())
+    if kind == 'postgres':
+        backend = PostgresBackend(stats)
+    elif kind == 'memory':
+        backend = MemoryBackend()
+    else:
+        backend = JournalBackend(os.getenv('SESSION_JOURNAL_DIR', 'sessions'))
+    print(f"Using {kind} session store")
+    return SessionStore(backend)
@@ -0,0 +1,423 @@
+"""Sharded runtime: one supervisor process running several bot workers.
+
+The supervisor splits SHARD_COUNT shards over SHARD_WORKERS processes, each
+running bot.py as an AutoShardedBot for its share of the shards. It also:
+
+- holds every open game in one SessionStore (persisted with SESSION_STORE
+  as usual) and serves it to the workers, so a user's game is reachable
+  from whichever shard their next command arrives on;
+- runs the health check web server on PORT, with worker status at /workers.
+  Worker N serves its own /metrics, /cache, /startup and /stalls on
+  PORT + 1 + N;
+- restarts a worker that dies. The games live in the supervisor, so no
+  games are lost, not even those of the dead worker's users.
+
+Run it with:
+
+    python shards.py [--workers N] [--shards N]
+
+For local testing without Discord, ``--fake-gateway`` starts the workers
+against a stand-in gateway fed by the supervisor, and ``--simulate USERS``
+plays that many games with every command sent to a random shard:
+
+    python shards.py --fake-gateway --simulate 200 --kill-worker
+"""
+import argparse
+import asyncio
+import os
+import queue
+import random
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+import time
+import types
+from multiprocessing.managers import BaseManager
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from sessions import SessionManager, create_session_store
+from stats import UserStats
+
+load_dotenv()
+PORT = int(os.getenv('PORT', 8080))
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', 4))
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', 2))
+SESSION_SERVER = os.getenv('SESSION_SERVER', '127.0.0.1:8765')
+
+BOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')
+
+# Wait before restarting a worker, doubled for each quick successive crash
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 60.0
+
+# Fake gateway: how long to wait for a reply before assuming it was lost
+COMMAND_TIMEOUT = 10.0
+
+
+class SharedSessions:
+    """Serves the supervisor's SessionStore to worker processes.
+
+    Workers call these methods from the manager's server threads; each call
+    is handed to the supervisor's event loop so the store is only ever
+    touched from one thread.
+    """
+
+    def __init__(self, store, loop):
+        self.store = store
+        self.loop = loop
+
+    def _call(self, method, *args):
+        async def call():
+            result = method(*args)
+            return await result if asyncio.iscoroutine(result) else result
+        return asyncio.run_coroutine_threadsafe(call(), self.loop).result()
+
+    def get(self, user_id):
+        return self._call(self.store.get, user_id)
+
+    def start_game(self, user_id, word):
+        self._call(self.store.start_game, user_id, word)
+
+    def add_guess(self, user_id, guess, position=None):
+        self._call(self.store.add_guess, user_id, guess, position)
+
+    def end_game(self, user_id):
+        self._call(self.store.end_game, user_id)
+
+
+class GatewayManager(SessionManager):
+    """Manager connection with the fake gateway queues as well as the games."""
+
+
+GatewayManager.register('commands')
+GatewayManager.register('replies')
+
+
+def worker_port(index):
+    """Port of a worker's own web server."""
+    return PORT + 1 + index
+
+
+class Worker:
+    """One bot process running a fixed group of shards."""
+
+    def __init__(self, index, shard_ids, env):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.env = dict(
+            env,
+            SHARD_IDS=",".join(str(shard) for shard in shard_ids),
+            WORKER_INDEX=str(index),
+            # The supervisor has PORT; each worker serves its own metrics
+            PORT=str(worker_port(index)),
+            # Each worker needs its own write-behind spool
+            GAMES_SPOOL_PATH=f"games_spool.{index}.jsonl",
+        )
+        self.process = None
+        self.restarts = 0
+        self.started_at = None
+        self.restart_delay = RESTART_DELAY
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.process = subprocess.Popen([sys.executable, BOT_PATH], env=self.env)
+        self.started_at = time.monotonic()
+        print(f"Started worker {self.index} (pid {self.process.pid}) for shards {self.shard_ids}")
+
+    def stop(self):
+        if self.alive:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def status(self):
+        return {
+            'worker': self.index,
+            'shards': self.shard_ids,
+            'pid': self.process.pid if self.process else None,
+            'port': worker_port(self.index),
+            'alive': self.alive,
+            'restarts': self.restarts,
+        }
+
+
+class Supervisor:
+    """Starts the workers, serves their shared state and restarts them when they die."""
+
+    def __init__(self, workers=SHARD_WORKERS, shards=SHARD_COUNT, fake_gateway=False):
+        self.shard_count = shards
+        self.fake_gateway = fake_gateway
+        # Only used by the postgres session backend
+        self.stats = UserStats(pool_size=1)
+        self.sessions = create_session_store(self.stats)
+        self.authkey = secrets.token_hex(16).encode()
+        host, port = SESSION_SERVER.rsplit(':', 1)
+        self.address = (host, int(port))
+
+        env = dict(
+            os.environ,
+            SHARD_COUNT=str(shards),
+            SESSION_STORE='shared',
+            SESSION_SERVER=SESSION_SERVER,
+            SESSION_SERVER_KEY=self.authkey.decode(),
+        )
+        if fake_gateway:
+            env['FAKE_GATEWAY'] = '1'
+        self.workers = [
+            Worker(index, list(range(index, shards, workers)), env)
+            for index in range(min(workers, shards))
+        ]
+        # Fake gateway: commands waiting for each worker, and their replies
+        self.command_queues = [queue.Queue() for _ in self.workers]
+        self.reply_queue = queue.Queue()
+        self._stopping = False
+
+    def worker_for_shard(self, shard):
+        return self.workers[shard % len(self.workers)]
+
+    def _serve_state(self, loop):
+        """Serve the shared games (and fake gateway queues) to the workers."""
+        shared = SharedSessions(self.sessions, loop)
+
+        class Manager(BaseManager):
+            pass
+
+        Manager.register('sessions', callable=lambda: shared)
+        Manager.register('commands', callable=lambda index: self.command_queues[index])
+        Manager.register('replies', callable=lambda: self.reply_queue)
+        server = Manager(address=self.address, authkey=self.authkey).get_server()
+        threading.Thread(target=server.serve_forever, daemon=True, name='session-server').start()
+        print(f"Serving shared sessions on {self.address[0]}:{self.address[1]}")
+
+    async def _start_web_server(self):
+        app = web.Application()
+        app.router.add_get('/', self.handle_health_check)
+        app.router.add_get('/health', self.handle_health_check)
+        app.router.add_get('/workers', self.handle_workers)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '0.0.0.0', PORT).start()
+        print(f"Web server started on port {PORT}")
+
+    async def handle_health_check(self, request):
+        """Healthy while every worker is running."""
+        if all(worker.alive for worker in self.workers):
+            return web.Response(text="Bot is running!")
+        return web.Response(text="Worker down, restarting", status=503)
+
+    async def handle_workers(self, request):
+        return web.json_response([worker.status() for worker in self.workers])
+
+    async def _monitor(self):
+        while not self._stopping:
+            for worker in self.workers:
+                if worker.alive or self._stopping:
+                    continue
+                if worker.process is not None:
+                    code = worker.process.returncode
+                    # A worker that ran for a while earns a fresh backoff
+                    if time.monotonic() - worker.started_at > MAX_RESTART_DELAY:
+                        worker.restart_delay = RESTART_DELAY
+                    print(f"Worker {worker.index} exited with code {code}, restarting in {worker.restart_delay:.0f}s")
+                    await asyncio.sleep(worker.restart_delay)
+                    worker.restart_delay = min(worker.restart_delay * 2, MAX_RESTART_DELAY)
+                    worker.restarts += 1
+                worker.start()
+            await asyncio.sleep(0.5)
+
+    async def run(self, simulate=0, kill_worker=False):
+        loop = asyncio.get_running_loop()
+        restored = await self.sessions.start()
+        print(f"Holding {len(restored)} game(s) in progress")
+        self._serve_state(loop)
+        await self._start_web_server()
+
+        stopped = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stopped.set)
+
+        monitor = loop.create_task(self._monitor())
+        try:
+            if simulate:
+                await simulate_games(self, simulate, kill_worker)
+            else:
+                await stopped.wait()
+        finally:
+            self._stopping = True
+            monitor.cancel()
+            for worker in self.workers:
+                await loop.run_in_executor(None, worker.stop)
+            await self.sessions.close()
+            await self.stats.close()
+
+
+class FakeResponse:
+    def __init__(self, sent):
+        self.sent = sent
+
+    async def send_message(self, content=None, **kwargs):
+        self.sent.append(content)
+
+    async def defer(self, **kwargs):
+        pass
+
+
+class FakeFollowup:
+    def __init__(self, sent):
+        self.sent = sent
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+
+def run_fake_gateway(bot, sessions):
+    """Run the bot's commands against the supervisor's queue instead of Discord.
+
+    Called by bot.py in place of ``bot.run`` when FAKE_GATEWAY is set. Each
+    command is ``(id, shard, user_id, name, args)``; the reply is
+    ``(id, worker, shard, messages)``.
+    """
+    index = int(os.environ['WORKER_INDEX'])
+    host, port = os.environ['SESSION_SERVER'].rsplit(':', 1)
+    manager = GatewayManager(address=(host, int(port)), authkey=os.environ['SESSION_SERVER_KEY'].encode())
+    manager.connect()
+    commands = manager.commands(index)
+    replies = manager.replies()
+
+    async def main():
+        await asyncio.gather(bot.start_web_server(), bot.start_services())
+        bot.ready = True
+        loop = asyncio.get_running_loop()
+        print(f"Worker {index} ready on fake gateway")
+        while True:
+            command_id, shard, user_id, name, args = await loop.run_in_executor(None, commands.get)
+            sent = []
+            interaction = types.SimpleNamespace(
+                user=types.SimpleNamespace(id=user_id, name=f"user{user_id}"),
+                guild=None,
+                guild_id=None,
+                response=FakeResponse(sent),
+                followup=FakeFollowup(sent),
+            )
+            try:
+                await bot.tree.get_command(name).callback(interaction, **args)
+            except Exception as e:
+                sent.append(f"error: {e!r}")
+            # A real reply goes over Discord's API, long after the session
+            # write has reached the supervisor; here it would race it.
+            await sessions.flush()
+            replies.put((command_id, index, shard, sent))
+
+    asyncio.run(main())
+
+
+async def simulate_games(supervisor, users, kill_worker=False):
+    """Play ``users`` games over the fake gateway, each command on a random shard."""
+    from words import word_index
+
+    loop = asyncio.get_running_loop()
+    # Give the workers time to connect
+    await asyncio.sleep(3)
+    ids = iter(range(1, 1 << 62))
+
+    async def send(user_id, name, **args):
+        """Send a command to a random shard; None if it was lost with a dead worker."""
+        command_id = next(ids)
+        shard = random.randrange(supervisor.shard_count)
+        worker = supervisor.worker_for_shard(shard)
+        pending[command_id] = loop.create_future()
+        supervisor.command_queues[worker.index].put((command_id, shard, user_id, name, args))
+        try:
+            return await asyncio.wait_for(pending[command_id], COMMAND_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            pending.pop(command_id, None)
+
+    pending = {}
+
+    def collect_replies():
+        while not supervisor._stopping:
+            try:
+                command_id, _, _, sent = supervisor.reply_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            future = pending.get(command_id)
+            if future is not None:
+                loop.call_soon_threadsafe(lambda f=future, r=sent: f.done() or f.set_result(r))
+
+    threading.Thread(target=collect_replies, daemon=True).start()
+
+    failures = []
+    guesses = 0
+    lost = 0
+
+    async def play(user_id):
+        nonlocal guesses, lost
+        while await send(user_id, 'guessle') is None:
+            lost += 1
+        attempt = 1
+        while True:
+            sent = await send(user_id, 'guess', word=random.choice(word_index.answers))
+            if sent is None:
+                # Lost with its worker, which may or may not have applied it
+                lost += 1
+                status = await send(user_id, 'status')
+                while status is None:
+                    status = await send(user_id, 'status')
+                if not status[0].startswith("Your current game status"):
+                    return
+                attempt = int(status[0].split("You're on attempt ")[1].split(" ")[0]) + 1
+                continue
+            guesses += 1
+            if not sent[0].startswith(f"Attempt {attempt} of 6"):
+                failures.append((user_id, attempt, sent))
+                return
+            if len(sent) > 1:
+                return
+            attempt += 1
+
+    start = time.perf_counter()
+    tasks = [loop.create_task(play(user_id)) for user_id in range(1, users + 1)]
+    if kill_worker:
+        await asyncio.sleep(1)
+        victim = random.choice(supervisor.workers)
+        print(f"Killing worker {victim.index} mid-run")
+        victim.process.kill()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    open_games = len(supervisor.sessions.games)
+    print(f"Played {users} games ({guesses} guesses on random shards) in {elapsed:.1f}s, {lost} command(s) lost")
+    print(f"Worker restarts: {sum(worker.restarts for worker in supervisor.workers)}, "
+          f"games left open: {open_games}, failures: {len(failures)}")
+    for failure in failures[:10]:
+        print(f"  {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Guessle as several shard worker processes.")
+    parser.add_argument('--workers', type=int, default=SHARD_WORKERS, help="number of worker processes")
+    parser.add_argument('--shards', type=int, default=SHARD_COUNT, help="total number of shards")
+    parser.add_argument('--fake-gateway', action='store_true', help="drive the workers locally instead of connecting to Discord")
+    parser.add_argument('--simulate', type=int, default=0, metavar='USERS', help="with --fake-gateway, play this many games and exit")
+    parser.add_argument('--kill-worker', action='store_true', help="with --simulate, kill a worker mid-run")
+    args = parser.parse_args()
+    if args.simulate and not args.fake_gateway:
+        parser.error("--simulate needs --fake-gateway")
+
+    supervisor = Supervisor(args.workers, args.shards, args.fake_gateway)
+    asyncio.run(supervisor.run(args.simulate, args.kill_worker))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Event loop stall detector.
+
+A heartbeat task stamps the time every ``interval`` seconds. A separate
+thread checks the stamp; once it is older than ``threshold`` the loop is
+stuck in some callback, and the thread grabs the loop thread's current
+stack, which is the code doing the blocking. When the loop recovers the
+stall is logged with the blocking function, the slash command whose task
+was running and how long it lasted, and added to a summary of the top
+stall sources since boot.
+
+All the logging happens on the watchdog thread, so a slow stdout can't
+stall the loop any further.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class LoopWatchdog:
+    """Detects event loop stalls and attributes them to the blocking code."""
+
+    def __init__(self, threshold=None, interval=0.05):
+        self.enabled = os.getenv('LOOP_WATCHDOG', '') not in ('', '0')
+        self.threshold = threshold or float(os.getenv('LOOP_STALL_THRESHOLD', 0.25))
+        self.interval = interval
+        self.stalls = {}  # (function, command) -> [count, total seconds, max seconds]
+        self._stalls_lock = threading.Lock()  # Written by the watchdog thread, read from the loop
+        self._commands = weakref.WeakKeyDictionary()  # task -> command name
+        self._beat = time.monotonic()
+        self._loop = None
+        self._loop_thread = None
+        self._task = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if not self.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = self._loop.create_task(self._heartbeat())
+        threading.Thread(target=self._watch, daemon=True, name='loop-watchdog').start()
+        print(f"Loop watchdog reporting stalls over {self.threshold * 1000:.0f}ms")
+
+    def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def track_command(self, name):
+        """Remember which command the current task is running."""
+        if self.enabled:
+            task = asyncio.current_task()
+            if task is not None:
+                self._commands[task] = name
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        captured = None  # (beat, function, stack, command) of the stall in progress
+        while not self._stopped.wait(self.interval):
+            beat = self._beat
+            if captured is not None and beat != captured[0]:
+                # The loop is running again
+                self._record(beat - captured[0] - self.interval, *captured[1:])
+                captured = None
+            if captured is None and time.monotonic() - beat >= self.threshold:
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is None:
+                    continue
+                function = blocking_function(frame)
+                stack = traceback.extract_stack(frame)
+                task = asyncio.current_task(self._loop)
+                captured = (beat, function, stack, self._commands.get(task) if task is not None else None)
+
+    def _record(self, seconds, function, stack, command):
+        with self._stalls_lock:
+            entry = self.stalls.setdefault((function, command), [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+        print(f"Event loop stalled for {seconds * 1000:.0f}ms in {function}"
+              f" (command: {'/' + command if command else 'none'})")
+        print("".join(traceback.format_list(stack[-8:])), end="")
+
+    def summary(self, limit=10):
+        """Top stall sources since boot, by total time stalled."""
+        with self._stalls_lock:
+            stalls = [(key, tuple(entry)) for key, entry in self.stalls.items()]
+        top = sorted(stalls, key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {
+                'function': function,
+                'command': command,
+                'count': count,
+                'total_seconds': round(total, 3),
+                'max_seconds': round(longest, 3),
+            }
+            for (function, command), (count, total, longest) in top
+        ]
+
+
+def blocking_function(frame):
+    """Name the innermost function of our own code on a stack, else the innermost one."""
+    innermost = None
+    for frame, lineno in traceback.walk_stack(frame):
+        code = frame.f_code
+        name = f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{lineno})"
+        if innermost is None:
+            innermost = name
+        filename = code.co_filename
+        if filename.startswith(PROJECT_DIR) and 'site-packages' not in filename and filename != __file__:
+            return name
+    return innermost
+
+
+watchdog = LoopWatchdog()
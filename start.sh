@@ -3,5 +3,8 @@
 # Install Python dependencies
 pip install -r requirements.txt
 
+# Precompute the /hint pattern matrix
+python hints.py build
+
 # Start the bot
 python bot.py
\ No newline at end of file
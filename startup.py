@@ -0,0 +1,84 @@
+"""Startup bookkeeping: phase timings and change-detected command sync."""
+import hashlib
+import json
+import os
+import time
+
+COMMAND_HASH_PATH = os.getenv('COMMAND_HASH_PATH', 'command_hashes.json')
+
+
+class StartupTimer:
+    """Records how long each startup phase took.
+
+    mark() closes a sequential phase that started at the previous mark;
+    timed() measures one coroutine, so phases that run concurrently each
+    get their own duration.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.ready_after = None
+        self._last = self.started
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases[name] = now - self._last
+        self._last = now
+
+    async def timed(self, name, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def ready(self):
+        """Note that the bot is serving and print the timings."""
+        self.ready_after = time.perf_counter() - self.started
+        print("Startup timing:")
+        for name, seconds in self.phases.items():
+            print(f"  {name:<20} {seconds:6.2f}s")
+        print(f"  {'ready after':<20} {self.ready_after:6.2f}s")
+
+    def report(self):
+        return {
+            'phases': {name: round(seconds, 3) for name, seconds in self.phases.items()},
+            'ready_after': None if self.ready_after is None else round(self.ready_after, 3),
+        }
+
+
+# Created on import, which bot.py does first, so it also times the imports
+startup_timer = StartupTimer()
+
+
+def command_payload(command, tree):
+    """A command as a sync would upload it."""
+    try:
+        return command.to_dict(tree)
+    except TypeError:
+        # discord.py before 2.4 takes no tree argument
+        return command.to_dict()
+
+
+def command_tree_hash(tree):
+    """Hash of the command definitions that a sync would upload."""
+    payload = [command_payload(command, tree) for command in tree.get_commands()]
+    payload.sort(key=lambda command: (command.get('type', 1), command['name']))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def read_command_hashes(path=COMMAND_HASH_PATH):
+    """Last synced tree hash per application ID."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def write_command_hashes(hashes, path=COMMAND_HASH_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(hashes, f)
+    os.replace(tmp_path, path)
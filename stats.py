@@ -0,0 +1,1022 @@
+import asyncio
+import datetime
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from psycopg2.extras import DictCursor, execute_values
+import pytz
+
+from cache import TTLCache
+from metrics import metrics
+
+# Set timezone to GMT+8
+TIMEZONE = pytz.timezone('Asia/Singapore')
+
+# games is partitioned by month; keep this many future partitions ready
+PARTITION_MONTHS_AHEAD = 2
+PARTITION_CHECK_INTERVAL = 12 * 60 * 60
+
+# Seconds a cached leaderboard is served; shorter with several shard workers
+LEADERBOARD_CACHE_TTL = 300
+SHARDED_LEADERBOARD_CACHE_TTL = 30
+
+
+def add_months(month, months):
+    """Shift a first-of-month date by a number of months."""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """Half-open ``[start, end)`` timestamps of a month in TIMEZONE."""
+    def midnight(day):
+        return TIMEZONE.localize(datetime.datetime(day.year, day.month, day.day))
+    return midnight(month), midnight(add_months(month, 1))
+
+
+def partition_name(month):
+    return f"games_y{month.year}m{month.month:02d}"
+
+
+def bit_string(bitset):
+    """A bitset as the text of a Postgres bit string, byte by byte."""
+    return "".join(f"{byte:08b}" for byte in bitset)
+
+
+def bit_string_bytes(bits):
+    """The bitset of a Postgres bit string read back by bit_string()."""
+    return int(bits, 2).to_bytes(len(bits) // 8, 'big') if bits else b""
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free in time."""
+
+
+class ConnectionPool:
+    """Bounded pool of database connections with health-checked checkout."""
+
+    def __init__(self, connect, max_size=5, health_check_interval=30.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self._idle = []  # (connection, last time it was returned)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def acquire(self, timeout=None):
+        """Check out a healthy connection, opening a new one if needed."""
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"No database connection free after {timeout}s")
+        try:
+            while True:
+                with self._lock:
+                    item = self._idle.pop() if self._idle else None
+                if item is None:
+                    return self._connect()
+                conn, last_used = item
+                if self._is_healthy(conn, last_used):
+                    return conn
+                print("Dropping dead database connection")
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, or close it if it is broken."""
+        try:
+            if discard or conn.closed:
+                self._discard(conn)
+            else:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        # Connections used recently are trusted; idle ones get pinged
+        # because Neon silently drops connections that sit around.
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class UserStats:
+    """Async game stats backend.
+
+    Queries run on a bounded pool of psycopg2 connections inside a worker
+    thread pool of the same size, so they never block the event loop. Pass
+    ``connect`` to use something other than ``DATABASE_URL``, e.g. a local
+    Postgres or an in-process stand-in.
+    """
+
+    def __init__(self, database_url=None, pool_size=None, query_timeout=None, connect=None):
+        self.database_url = database_url or os.getenv('DATABASE_URL')
+        self.pool_size = pool_size or int(os.getenv('DB_POOL_SIZE', 5))
+        self.query_timeout = query_timeout or float(os.getenv('DB_QUERY_TIMEOUT', 5))
+        self.pool = ConnectionPool(connect or self.get_db_connection, self.pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='user-stats')
+        self.writer = GameWriter(self)
+        # Two leaderboards per guild, plus the global ones. The cache is per
+        # process: a shard worker only applies the games it wrote itself,
+        # so games played on other workers show up once the board expires.
+        default_ttl = SHARDED_LEADERBOARD_CACHE_TTL if os.getenv('SHARD_IDS') else LEADERBOARD_CACHE_TTL
+        self.leaderboards = TTLCache(
+            maxsize=int(os.getenv('LEADERBOARD_CACHE_SIZE', 512)),
+            ttl=float(os.getenv('LEADERBOARD_CACHE_TTL', default_ttl))
+        )
+        self._leaderboard_queries = {}
+        self._leaderboard_generation = 0
+        self.coalesced_queries = 0
+        self._maintenance_task = None
+
+    def get_db_connection(self):
+        """Open a new database connection to Neon."""
+        if not self.database_url:
+            print("DATABASE_URL not found in environment variables!")
+            raise ValueError("DATABASE_URL environment variable not set")
+
+        print("Attempting to connect to database...")
+        # statement_timeout makes the server give up on a query we have
+        # already stopped waiting for.
+        conn = psycopg2.connect(
+            self.database_url,
+            connect_timeout=max(1, int(self.query_timeout)),
+            options=f"-c statement_timeout={int(self.query_timeout * 1000)}"
+        )
+        print("Successfully connected to database!")
+        return conn
+
+    async def run(self, query, *args):
+        """Run ``query(conn, *args)`` on a pooled connection off the event loop."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = await asyncio.wait_for(
+                loop.run_in_executor(self._executor, self._run_sync, query, args),
+                self.query_timeout
+            )
+            failed = False
+            return result
+        finally:
+            name = getattr(query, '__name__', 'query').lstrip('_')
+            metrics.observe_query(name, time.perf_counter() - start, failed)
+
+    def _run_sync(self, query, args):
+        conn = self.pool.acquire(timeout=self.query_timeout)
+        discard = False
+        try:
+            result = query(conn, *args)
+            conn.commit()
+            return result
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self.pool.release(conn, discard)
+
+    async def start(self):
+        """Create tables and start the write-behind queue."""
+        await self.create_tables()
+        await self.writer.start()
+        self._maintenance_task = asyncio.get_running_loop().create_task(self._maintenance_loop())
+
+    async def _maintenance_loop(self):
+        """Keep monthly partitions created ahead of time."""
+        while True:
+            await asyncio.sleep(PARTITION_CHECK_INTERVAL)
+            try:
+                await self.run(self._ensure_partitions)
+            except Exception as e:
+                print(f"Error creating games partitions: {e}")
+
+    async def create_tables(self):
+        """Create necessary tables if they don't exist."""
+        try:
+            print("Creating tables if they don't exist...")
+            await self.run(self._create_tables)
+            print("Tables created successfully!")
+        except Exception as e:
+            print(f"Error creating tables: {e}")
+
+    @classmethod
+    def _create_tables(cls, conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('games') IS NULL")
+            if cur.fetchone()[0]:
+                # New databases start out partitioned by month
+                cur.execute("CREATE SEQUENCE IF NOT EXISTS games_id_seq AS BIGINT")
+                cls._create_partitioned_games(cur)
+            # Client-generated key so replaying the spool never double counts
+            cur.execute("ALTER TABLE games ADD COLUMN IF NOT EXISTS game_key UUID")
+            # Guild the game was finished in; NULL for DMs and for games
+            # recorded before guilds were (see assign_guild)
+            cur.execute("ALTER TABLE games ADD COLUMN IF NOT EXISTS guild_id TEXT")
+            cls._create_games_indexes(cur)
+
+            # Leaderboard counters, kept in step with games by _add_games
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS user_totals (
+                    user_id TEXT PRIMARY KEY,
+                    games_played INTEGER NOT NULL DEFAULT 0,
+                    words_guessed INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS user_totals_rank_idx ON user_totals (words_guessed DESC)"
+            )
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS user_monthly_totals (
+                    month DATE NOT NULL,
+                    user_id TEXT NOT NULL,
+                    games_played INTEGER NOT NULL DEFAULT 0,
+                    words_guessed INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (month, user_id)
+                )
+            """)
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS user_monthly_totals_rank_idx "
+                "ON user_monthly_totals (month, words_guessed DESC)"
+            )
+            # The same counters per guild, for the server leaderboards
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS guild_user_totals (
+                    guild_id TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    games_played INTEGER NOT NULL DEFAULT 0,
+                    words_guessed INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, user_id)
+                )
+            """)
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS guild_user_totals_rank_idx "
+                "ON guild_user_totals (guild_id, words_guessed DESC)"
+            )
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS guild_user_monthly_totals (
+                    guild_id TEXT NOT NULL,
+                    month DATE NOT NULL,
+                    user_id TEXT NOT NULL,
+                    games_played INTEGER NOT NULL DEFAULT 0,
+                    words_guessed INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, month, user_id)
+                )
+            """)
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS guild_user_monthly_totals_rank_idx "
+                "ON guild_user_monthly_totals (guild_id, month, words_guessed DESC)"
+            )
+            # Answers each user has been dealt this cycle, one bit per answer
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS user_seen_answers (
+                    user_id TEXT PRIMARY KEY,
+                    answers_version TEXT NOT NULL,
+                    cycle INTEGER NOT NULL DEFAULT 0,
+                    seen BIT VARYING NOT NULL
+                )
+            """)
+            cur.execute("ALTER TABLE user_seen_answers ADD COLUMN IF NOT EXISTS cycle INTEGER NOT NULL DEFAULT 0")
+            # Saved as BYTEA before shard workers merged their draws; bit
+            # strings can be OR-ed in SQL
+            cur.execute("""
+                SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'user_seen_answers' AND column_name = 'seen'
+            """)
+            if cur.fetchone()[0] == 'bytea':
+                cur.execute("""
+                    ALTER TABLE user_seen_answers ALTER COLUMN seen TYPE BIT VARYING
+                    USING ('x' || encode(seen, 'hex'))::bit varying
+                """)
+            # Months whose raw games were dropped by the retention job
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS games_rollups (
+                    month DATE PRIMARY KEY,
+                    games INTEGER NOT NULL,
+                    rolled_up_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+                )
+            """)
+        cls._ensure_partitions(conn)
+
+    @staticmethod
+    def _create_partitioned_games(cur):
+        cur.execute("""
+            CREATE TABLE games (
+                id BIGINT NOT NULL DEFAULT nextval('games_id_seq'),
+                user_id TEXT NOT NULL,
+                timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+                won BOOLEAN NOT NULL,
+                game_key UUID,
+                guild_id TEXT,
+                PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        """)
+        cur.execute("ALTER SEQUENCE games_id_seq OWNED BY games.id")
+        cur.execute("CREATE TABLE games_default PARTITION OF games DEFAULT")
+
+    @staticmethod
+    def _create_games_indexes(cur):
+        # Unique indexes on a partitioned table must include the partition key
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS games_game_key_idx ON games (game_key, timestamp)")
+        cur.execute("CREATE INDEX IF NOT EXISTS games_timestamp_idx ON games (timestamp)")
+        cur.execute("CREATE INDEX IF NOT EXISTS games_user_timestamp_idx ON games (user_id, timestamp)")
+        cur.execute("CREATE INDEX IF NOT EXISTS games_guild_timestamp_idx ON games (guild_id, timestamp)")
+        cur.execute("CREATE INDEX IF NOT EXISTS games_guild_user_idx ON games (guild_id, user_id)")
+
+    @staticmethod
+    def _games_is_partitioned(cur):
+        cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = 'games'::regclass")
+        return cur.fetchone()[0]
+
+    @classmethod
+    def _ensure_partitions(cls, conn, first_month=None):
+        """Create monthly partitions from ``first_month`` until a few months ahead."""
+        with conn.cursor() as cur:
+            if not cls._games_is_partitioned(cur):
+                return
+            current_month = datetime.datetime.now(TIMEZONE).date().replace(day=1)
+            month = first_month or current_month
+            while month <= add_months(current_month, PARTITION_MONTHS_AHEAD):
+                name = partition_name(month)
+                cur.execute("SELECT to_regclass(%s) IS NULL", (name,))
+                # Checked first because CREATE ... PARTITION OF locks games
+                # even when the partition already exists.
+                if cur.fetchone()[0]:
+                    start, end = month_bounds(month)
+                    cur.execute(
+                        f"CREATE TABLE {name} PARTITION OF games FOR VALUES FROM (%s) TO (%s)",
+                        (start, end)
+                    )
+                    print(f"Created games partition {name}")
+                month = add_months(month, 1)
+
+    async def partition_games(self):
+        """Convert an existing unpartitioned games table to monthly partitions."""
+        return await self.run(self._partition_games)
+
+    @classmethod
+    def _partition_games(cls, conn):
+        with conn.cursor() as cur:
+            if cls._games_is_partitioned(cur):
+                return None
+            cur.execute("LOCK TABLE games IN ACCESS EXCLUSIVE MODE")
+            cur.execute("ALTER TABLE games RENAME TO games_unpartitioned")
+            cur.execute("ALTER TABLE games_unpartitioned RENAME CONSTRAINT games_pkey TO games_unpartitioned_pkey")
+            for index in ('games_game_key_idx', 'games_timestamp_idx', 'games_user_timestamp_idx',
+                          'games_guild_timestamp_idx', 'games_guild_user_idx'):
+                cur.execute(f"DROP INDEX IF EXISTS {index}")
+            # Keep the id sequence so existing ids stay unique
+            cur.execute("ALTER SEQUENCE games_id_seq OWNED BY NONE")
+            cur.execute("ALTER SEQUENCE games_id_seq AS BIGINT")
+            cls._create_partitioned_games(cur)
+            cls._create_games_indexes(cur)
+
+            cur.execute("SELECT min(timestamp) FROM games_unpartitioned")
+            oldest = cur.fetchone()[0]
+            first_month = oldest.astimezone(TIMEZONE).date().replace(day=1) if oldest else None
+        cls._ensure_partitions(conn, first_month)
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO games (id, user_id, timestamp, won, game_key, guild_id)
+                SELECT id, user_id, timestamp, won, game_key, guild_id FROM games_unpartitioned
+            """)
+            moved = cur.rowcount
+            cur.execute("DROP TABLE games_unpartitioned")
+            return moved
+
+    async def roll_up_games(self, keep_months):
+        """Drop raw games older than ``keep_months`` months, keeping monthly totals.
+
+        Returns the months that were rolled up.
+        """
+        current_month = datetime.datetime.now(TIMEZONE).date().replace(day=1)
+        cutoff = add_months(current_month, -keep_months)
+        months = await self.run(self._months_before, cutoff)
+        for month in months:
+            games = await self.run(self._roll_up_month, month)
+            print(f"Rolled up {games} game(s) from {month:%Y-%m}")
+        return months
+
+    @staticmethod
+    def _months_before(conn, cutoff):
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT DISTINCT date_trunc('month', timestamp AT TIME ZONE %s)::date
+                FROM games
+                WHERE timestamp < %s
+                ORDER BY 1
+            """, (TIMEZONE.zone, month_bounds(cutoff)[0]))
+            return [row[0] for row in cur.fetchall()]
+
+    @classmethod
+    def _roll_up_month(cls, conn, month):
+        start, end = month_bounds(month)
+        with conn.cursor() as cur:
+            cur.execute("LOCK TABLE games IN SHARE MODE")
+            cur.execute("SELECT 1 FROM games_rollups WHERE month = %s", (month,))
+            if cur.fetchone() is None:
+                # Rebuild the month's summary from the raw rows it replaces
+                cur.execute("DELETE FROM user_monthly_totals WHERE month = %s", (month,))
+                cur.execute("DELETE FROM guild_user_monthly_totals WHERE month = %s", (month,))
+            # Late rows for a month rolled up before are added on top
+            cur.execute("""
+                INSERT INTO user_monthly_totals AS t (month, user_id, games_played, words_guessed)
+                SELECT %s, user_id, COUNT(*), SUM(CASE WHEN won THEN 1 ELSE 0 END)
+                FROM games
+                WHERE timestamp >= %s AND timestamp < %s
+                GROUP BY user_id
+                ON CONFLICT (month, user_id) DO UPDATE SET
+                    games_played = t.games_played + EXCLUDED.games_played,
+                    words_guessed = t.words_guessed + EXCLUDED.words_guessed
+            """, (month, start, end))
+            cur.execute("""
+                INSERT INTO guild_user_monthly_totals AS t (guild_id, month, user_id, games_played, words_guessed)
+                SELECT guild_id, %s, user_id, COUNT(*), SUM(CASE WHEN won THEN 1 ELSE 0 END)
+                FROM games
+                WHERE timestamp >= %s AND timestamp < %s AND guild_id IS NOT NULL
+                GROUP BY guild_id, user_id
+                ON CONFLICT (guild_id, month, user_id) DO UPDATE SET
+                    games_played = t.games_played + EXCLUDED.games_played,
+                    words_guessed = t.words_guessed + EXCLUDED.words_guessed
+            """, (month, start, end))
+            cur.execute(
+                "SELECT COUNT(*) FROM games WHERE timestamp >= %s AND timestamp < %s",
+                (start, end)
+            )
+            games = cur.fetchone()[0]
+            cur.execute("""
+                INSERT INTO games_rollups (month, games) VALUES (%s, %s)
+                ON CONFLICT (month) DO UPDATE SET
+                    games = games_rollups.games + EXCLUDED.games,
+                    rolled_up_at = now()
+            """, (month, games))
+
+            name = partition_name(month)
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+            if cur.fetchone()[0]:
+                cur.execute(f"ALTER TABLE games DETACH PARTITION {name}")
+                cur.execute(f"DROP TABLE {name}")
+            # Rows outside the month's partition (or an unpartitioned table)
+            cur.execute("DELETE FROM games WHERE timestamp >= %s AND timestamp < %s", (start, end))
+            return games
+
+    async def add_game(self, user_id: str, won: bool, guild_id: str = None):
+        """Add a game result to the database."""
+        try:
+            print(f"Adding game for user {user_id}, won: {won}")
+            # Get current time in GMT+8
+            current_time = datetime.datetime.now(TIMEZONE)
+            await self.add_games([(str(uuid.uuid4()), user_id, current_time, won, guild_id)])
+            print("Game added successfully!")
+        except Exception as e:
+            print(f"Error adding game: {e}")
+
+    def record_game(self, user_id: str, won: bool, guild_id: str = None):
+        """Queue a game result for the next batched insert. Never blocks."""
+        self.writer.record(user_id, won, guild_id)
+
+    async def add_games(self, games):
+        """Insert ``(game_key, user_id, timestamp, won, guild_id)`` rows in one transaction.
+
+        Rows whose game_key is already stored are skipped. The leaderboard
+        counters are updated in the same transaction. Returns how many games
+        were new. Raises on failure so the caller can keep the rows.
+        """
+        try:
+            inserted = await self.run(self._add_games, games)
+        except Exception:
+            # After a timeout the insert may still commit, without the
+            # cached boards ever hearing of it
+            self._leaderboard_generation += 1
+            self.leaderboards.clear()
+            raise
+        self._update_cached_leaderboards(inserted)
+        return len(inserted)
+
+    @staticmethod
+    def _add_games(conn, games):
+        with conn.cursor() as cur:
+            inserted = execute_values(
+                cur,
+                "INSERT INTO games (game_key, user_id, timestamp, won, guild_id) VALUES %s "
+                "ON CONFLICT DO NOTHING RETURNING user_id, timestamp, won, guild_id",
+                games,
+                page_size=500,
+                fetch=True
+            )
+            if not inserted:
+                return inserted
+
+            # Only rows that were really inserted count towards the totals
+            totals = {}
+            monthly = {}
+            guild_totals = {}
+            guild_monthly = {}
+            for user_id, timestamp, won, guild_id in inserted:
+                month = timestamp.astimezone(TIMEZONE).date().replace(day=1)
+                keys = [(totals, (user_id,)), (monthly, (month, user_id))]
+                if guild_id is not None:
+                    keys += [(guild_totals, (guild_id, user_id)), (guild_monthly, (guild_id, month, user_id))]
+                for counts, key in keys:
+                    played, guessed = counts.get(key, (0, 0))
+                    counts[key] = (played + 1, guessed + int(won))
+
+            # Sorted keys keep lock order stable across concurrent flushes
+            execute_values(
+                cur,
+                """
+                INSERT INTO user_totals AS t (user_id, games_played, words_guessed) VALUES %s
+                ON CONFLICT (user_id) DO UPDATE SET
+                    games_played = t.games_played + EXCLUDED.games_played,
+                    words_guessed = t.words_guessed + EXCLUDED.words_guessed
+                """,
+                [key + counts for key, counts in sorted(totals.items())]
+            )
+            execute_values(
+                cur,
+                """
+                INSERT INTO user_monthly_totals AS t (month, user_id, games_played, words_guessed) VALUES %s
+                ON CONFLICT (month, user_id) DO UPDATE SET
+                    games_played = t.games_played + EXCLUDED.games_played,
+                    words_guessed = t.words_guessed + EXCLUDED.words_guessed
+                """,
+                [key + counts for key, counts in sorted(monthly.items())]
+            )
+            if guild_totals:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO guild_user_totals AS t (guild_id, user_id, games_played, words_guessed) VALUES %s
+                    ON CONFLICT (guild_id, user_id) DO UPDATE SET
+                        games_played = t.games_played + EXCLUDED.games_played,
+                        words_guessed = t.words_guessed + EXCLUDED.words_guessed
+                    """,
+                    [key + counts for key, counts in sorted(guild_totals.items())]
+                )
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO guild_user_monthly_totals AS t (guild_id, month, user_id, games_played, words_guessed)
+                    VALUES %s
+                    ON CONFLICT (guild_id, month, user_id) DO UPDATE SET
+                        games_played = t.games_played + EXCLUDED.games_played,
+                        words_guessed = t.words_guessed + EXCLUDED.words_guessed
+                    """,
+                    [key + counts for key, counts in sorted(guild_monthly.items())]
+                )
+            return inserted
+
+    async def _cached_leaderboard(self, key, query, *args):
+        """Serve a leaderboard from the cache, coalescing concurrent misses."""
+        rows = self.leaderboards.get(key)
+        if rows is not None:
+            return rows
+        task = self._leaderboard_queries.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._load_leaderboard(key, query, args))
+            self._leaderboard_queries[key] = task
+            task.add_done_callback(lambda _: self._leaderboard_queries.pop(key, None))
+        else:
+            self.coalesced_queries += 1
+        # Shielded so one cancelled caller doesn't fail the others
+        return await asyncio.shield(task)
+
+    async def _load_leaderboard(self, key, query, args):
+        generation = self._leaderboard_generation
+        rows = await self.run(query, *args)
+        # A write that landed while we were querying may be missing from
+        # rows; let the next caller query again instead of caching them.
+        if generation == self._leaderboard_generation:
+            self.leaderboards.set(key, rows)
+        return rows
+
+    def _update_cached_leaderboards(self, inserted):
+        """Apply newly inserted games to cached leaderboards in place."""
+        if not inserted:
+            return
+        self._leaderboard_generation += 1
+        deltas = {}
+        for user_id, timestamp, won, guild_id in inserted:
+            month = timestamp.astimezone(TIMEZONE).date().replace(day=1)
+            keys = [('overall', None), ('monthly', month, None)]
+            if guild_id is not None:
+                keys += [('overall', guild_id), ('monthly', month, guild_id)]
+            for key in keys:
+                user_deltas = deltas.setdefault(key, {})
+                played, guessed = user_deltas.get(user_id, (0, 0))
+                user_deltas[user_id] = (played + 1, guessed + int(won))
+
+        for key, user_deltas in deltas.items():
+            # Not counted as a cache hit; only reads by commands are
+            cached = self.leaderboards.peek(key)
+            if cached is None:
+                continue
+            # Build new rows so lists already handed out stay untouched
+            rows = []
+            for row in cached:
+                played, guessed = user_deltas.pop(row['user_id'], (0, 0))
+                rows.append({
+                    'user_id': row['user_id'],
+                    'games_played': row['games_played'] + played,
+                    'words_guessed': row['words_guessed'] + guessed,
+                })
+            for user_id, (played, guessed) in user_deltas.items():
+                rows.append({'user_id': user_id, 'games_played': played, 'words_guessed': guessed})
+            rows.sort(key=lambda row: row['words_guessed'], reverse=True)
+            self.leaderboards.replace(key, rows)
+
+    def cache_stats(self):
+        """Leaderboard cache counters, to check how much load it saves."""
+        stats = self.leaderboards.stats()
+        stats['coalesced'] = self.coalesced_queries
+        return stats
+
+    async def get_monthly_stats(self, guild_id=None):
+        """Get stats for the current month in GMT+8, for one guild or everyone."""
+        try:
+            # Get current time in GMT+8
+            current_time = datetime.datetime.now(TIMEZONE)
+            month = current_time.date().replace(day=1)
+            return await self._cached_leaderboard(('monthly', month, guild_id), self._get_monthly_stats, month, guild_id)
+        except Exception as e:
+            print(f"Error getting monthly stats: {e}")
+            return []
+
+    @staticmethod
+    def _get_monthly_stats(conn, month, guild_id):
+        with conn.cursor(cursor_factory=DictCursor) as cur:
+            if guild_id is None:
+                cur.execute("""
+                    SELECT user_id, games_played, words_guessed
+                    FROM user_monthly_totals
+                    WHERE month = %s AND games_played > 0
+                    ORDER BY words_guessed DESC
+                """, (month,))
+            else:
+                cur.execute("""
+                    SELECT user_id, games_played, words_guessed
+                    FROM guild_user_monthly_totals
+                    WHERE guild_id = %s AND month = %s AND games_played > 0
+                    ORDER BY words_guessed DESC
+                """, (guild_id, month))
+            return [dict(row) for row in cur.fetchall()]
+
+    async def get_overall_stats(self, guild_id=None):
+        """Get overall stats for one guild's users, or for everyone."""
+        try:
+            return await self._cached_leaderboard(('overall', guild_id), self._get_overall_stats, guild_id)
+        except Exception as e:
+            print(f"Error getting overall stats: {e}")
+            return []
+
+    @staticmethod
+    def _get_overall_stats(conn, guild_id):
+        with conn.cursor(cursor_factory=DictCursor) as cur:
+            if guild_id is None:
+                cur.execute("""
+                    SELECT user_id, games_played, words_guessed
+                    FROM user_totals
+                    WHERE games_played > 0
+                    ORDER BY words_guessed DESC
+                """)
+            else:
+                cur.execute("""
+                    SELECT user_id, games_played, words_guessed
+                    FROM guild_user_totals
+                    WHERE guild_id = %s AND games_played > 0
+                    ORDER BY words_guessed DESC
+                """, (guild_id,))
+            return [dict(row) for row in cur.fetchall()]
+
+    async def get_seen_answers(self, user_id, version):
+        """A user's ``(cycle, bitset)``, or None if there is none for this answer list."""
+        return await self.run(self._get_seen_answers, user_id, version)
+
+    @staticmethod
+    def _get_seen_answers(conn, user_id, version):
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT cycle, seen FROM user_seen_answers WHERE user_id = %s AND answers_version = %s",
+                (user_id, version)
+            )
+            row = cur.fetchone()
+            return (row[0], bit_string_bytes(row[1])) if row else None
+
+    async def save_seen_answers(self, rows, version):
+        """Merge ``(user_id, cycle, bitset)`` rows in one statement.
+
+        Merged as rotation.merge_seen() does, so workers dealing to the same
+        player don't overwrite each other's draws. Returns the merged rows.
+        """
+        return await self.run(self._save_seen_answers, rows, version)
+
+    @staticmethod
+    def _save_seen_answers(conn, rows, version):
+        with conn.cursor() as cur:
+            merged = execute_values(
+                cur,
+                """
+                INSERT INTO user_seen_answers AS saved (user_id, answers_version, cycle, seen) VALUES %s
+                ON CONFLICT (user_id) DO UPDATE SET
+                    seen = CASE
+                        WHEN saved.answers_version <> EXCLUDED.answers_version OR saved.cycle < EXCLUDED.cycle
+                            THEN EXCLUDED.seen
+                        WHEN saved.cycle = EXCLUDED.cycle THEN saved.seen | EXCLUDED.seen
+                        ELSE saved.seen
+                    END,
+                    cycle = CASE
+                        WHEN saved.answers_version <> EXCLUDED.answers_version THEN EXCLUDED.cycle
+                        ELSE GREATEST(saved.cycle, EXCLUDED.cycle)
+                    END,
+                    answers_version = EXCLUDED.answers_version
+                RETURNING user_id, cycle, seen
+                """,
+                [(user_id, version, cycle, bit_string(seen)) for user_id, cycle, seen in sorted(rows)],
+                template="(%s, %s, %s, %s::bit varying)",
+                fetch=True
+            )
+            return [(user_id, cycle, bit_string_bytes(seen)) for user_id, cycle, seen in merged]
+
+    async def backfill_counters(self):
+        """Rebuild the leaderboard counters from every row in games."""
+        return await self.run(self._backfill_counters)
+
+    @staticmethod
+    def _backfill_counters(conn):
+        with conn.cursor() as cur:
+            # Block new games until the counters are rebuilt so none are
+            # counted twice or missed.
+            cur.execute("LOCK TABLE games IN SHARE MODE")
+            # Rolled-up months no longer have raw games; keep their totals
+            cur.execute("""
+                DELETE FROM user_monthly_totals
+                WHERE month NOT IN (SELECT month FROM games_rollups)
+            """)
+            cur.execute("""
+                INSERT INTO user_monthly_totals (month, user_id, games_played, words_guessed)
+                SELECT month, user_id, COUNT(*), SUM(CASE WHEN won THEN 1 ELSE 0 END)
+                FROM (
+                    SELECT date_trunc('month', timestamp AT TIME ZONE %s)::date AS month, user_id, won
+                    FROM games
+                ) g
+                WHERE month NOT IN (SELECT month FROM games_rollups)
+                GROUP BY month, user_id
+            """, (TIMEZONE.zone,))
+            months = cur.rowcount
+            cur.execute("TRUNCATE user_totals")
+            cur.execute("""
+                INSERT INTO user_totals (user_id, games_played, words_guessed)
+                SELECT user_id, SUM(games_played), SUM(words_guessed)
+                FROM user_monthly_totals
+                GROUP BY user_id
+            """)
+            users = cur.rowcount
+            UserStats._rebuild_guild_counters(cur)
+            return users, months
+
+    @staticmethod
+    def _rebuild_guild_counters(cur, guild_id=None):
+        """Rebuild the per-guild counters of one guild, or of all, from games.
+
+        The caller must hold a lock that keeps games from changing.
+        """
+        only = "AND guild_id = %(guild_id)s" if guild_id is not None else ""
+        params = {'zone': TIMEZONE.zone, 'guild_id': guild_id}
+        cur.execute(f"""
+            DELETE FROM guild_user_monthly_totals
+            WHERE month NOT IN (SELECT month FROM games_rollups) {only}
+        """, params)
+        cur.execute(f"""
+            INSERT INTO guild_user_monthly_totals (guild_id, month, user_id, games_played, words_guessed)
+            SELECT guild_id, month, user_id, COUNT(*), SUM(CASE WHEN won THEN 1 ELSE 0 END)
+            FROM (
+                SELECT guild_id, date_trunc('month', timestamp AT TIME ZONE %(zone)s)::date AS month, user_id, won
+                FROM games
+                WHERE guild_id IS NOT NULL {only}
+            ) g
+            WHERE month NOT IN (SELECT month FROM games_rollups)
+            GROUP BY guild_id, month, user_id
+        """, params)
+        cur.execute(f"DELETE FROM guild_user_totals WHERE true {only}", params)
+        cur.execute(f"""
+            INSERT INTO guild_user_totals (guild_id, user_id, games_played, words_guessed)
+            SELECT guild_id, user_id, SUM(games_played), SUM(words_guessed)
+            FROM guild_user_monthly_totals
+            WHERE true {only}
+            GROUP BY guild_id, user_id
+        """, params)
+
+    async def assign_guild(self, guild_id):
+        """Count every game without a guild towards ``guild_id``.
+
+        For databases from before games recorded their guild, when the bot
+        was only in one server. Games played in DMs have no guild either,
+        so they are included. Returns how many games were assigned.
+        """
+        assigned = await self.run(self._assign_guild, str(guild_id))
+        self.leaderboards.clear()
+        return assigned
+
+    @classmethod
+    def _assign_guild(cls, conn, guild_id):
+        with conn.cursor() as cur:
+            cur.execute("LOCK TABLE games IN SHARE ROW EXCLUSIVE MODE")
+            # Rolled-up months have no raw games left: the part of each
+            # user's monthly total that no guild accounts for goes to this one
+            cur.execute("""
+                INSERT INTO guild_user_monthly_totals AS t (guild_id, month, user_id, games_played, words_guessed)
+                SELECT %s, u.month, u.user_id,
+                       u.games_played - COALESCE(g.games_played, 0),
+                       u.words_guessed - COALESCE(g.words_guessed, 0)
+                FROM user_monthly_totals u
+                LEFT JOIN (
+                    SELECT month, user_id, SUM(games_played) AS games_played, SUM(words_guessed) AS words_guessed
+                    FROM guild_user_monthly_totals
+                    GROUP BY month, user_id
+                ) g USING (month, user_id)
+                WHERE u.month IN (SELECT month FROM games_rollups)
+                    AND u.games_played > COALESCE(g.games_played, 0)
+                ON CONFLICT (guild_id, month, user_id) DO UPDATE SET
+                    games_played = t.games_played + EXCLUDED.games_played,
+                    words_guessed = t.words_guessed + EXCLUDED.words_guessed
+            """, (guild_id,))
+            cur.execute("UPDATE games SET guild_id = %s WHERE guild_id IS NULL", (guild_id,))
+            assigned = cur.rowcount
+            cls._rebuild_guild_counters(cur, guild_id)
+            return assigned
+
+    async def close(self):
+        """Flush queued games, then close all pooled connections."""
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+        await self.writer.stop()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        self.pool.close()
+
+
+class GameWriter:
+    """Write-behind queue for finished games.
+
+    Games are buffered in memory and flushed with one multi-row INSERT when
+    ``batch_size`` games are waiting or every ``flush_interval`` seconds.
+    If the database is unreachable the batch is appended to a local spool
+    file, which is replayed on the next start or the next successful flush.
+    Every game carries a unique key, so a replay interrupted by a crash can
+    simply be run again without counting any game twice.
+    """
+
+    def __init__(self, stats, spool_path=None, batch_size=None, flush_interval=None):
+        self.stats = stats
+        self.spool_path = spool_path or os.getenv('GAMES_SPOOL_PATH', 'games_spool.jsonl')
+        self.batch_size = batch_size or int(os.getenv('GAMES_BATCH_SIZE', 100))
+        self.flush_interval = flush_interval or float(os.getenv('GAMES_FLUSH_INTERVAL', 1.0))
+        self._pending = []
+        self._spooled = False
+        self._wakeup = None
+        self._lock = None
+        self._task = None
+        self._stopping = False
+
+    def record(self, user_id, won, guild_id=None):
+        """Queue a finished game."""
+        # Get current time in GMT+8
+        current_time = datetime.datetime.now(TIMEZONE)
+        self._pending.append((str(uuid.uuid4()), user_id, current_time, won, guild_id))
+        if self._wakeup is not None and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self):
+        """Replay any spooled games and start the background flush loop."""
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._spooled = os.path.exists(self.spool_path)
+        self._stopping = False
+        await self.flush()
+        self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still queued."""
+        if self._task is not None:
+            # Asked to finish rather than cancelled: wait_for() can swallow a
+            # cancel that lands just as the wakeup fires, leaving us waiting
+            # on a loop that never ends.
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Insert all queued games, spooling them if the database is down."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._pending and not self._spooled:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                # Anything spooled earlier goes first; a successful replay
+                # means the database is back.
+                if self._spooled:
+                    await self._replay_spool()
+                if batch:
+                    await self.stats.add_games(batch)
+                    print(f"Flushed {len(batch)} game(s) to the database")
+            except Exception as e:
+                if batch:
+                    print(f"Error flushing {len(batch)} game(s), spooling them: {e}")
+                    await self._spool(batch)
+                else:
+                    print(f"Error replaying games spool: {e}")
+
+    async def _spool(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._append_spool, batch)
+            self._spooled = True
+        except Exception as e:
+            print(f"Error writing games spool, {len(batch)} game(s) lost: {e}")
+
+    def _append_spool(self, batch):
+        lines = "".join(
+            json.dumps([key, user_id, timestamp.isoformat(), won, guild_id]) + "\n"
+            for key, user_id, timestamp, won, guild_id in batch
+        )
+        with open(self.spool_path, 'a') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read_spool(self):
+        games = []
+        try:
+            with open(self.spool_path, 'r') as f:
+                for line in f:
+                    try:
+                        game = tuple(json.loads(line))
+                    except ValueError:
+                        # Torn write from a crash mid-append
+                        print(f"Skipping unreadable spool line: {line!r}")
+                        continue
+                    # Lines spooled before games had a guild
+                    games.append(game if len(game) == 5 else game + (None,))
+        except FileNotFoundError:
+            return None
+        return games
+
+    async def _replay_spool(self):
+        """Insert spooled games, then delete the spool. Raises on failure."""
+        loop = asyncio.get_running_loop()
+        games = await loop.run_in_executor(None, self._read_spool)
+        if games is None:
+            self._spooled = False
+            return
+        if games:
+            print(f"Replaying {len(games)} spooled game(s)...")
+            inserted = await self.stats.add_games(games)
+            print(f"Replayed spool, {inserted} new game(s) inserted")
+        os.remove(self.spool_path)
+        self._spooled = False
@@ -0,0 +1,38 @@
+import itertools
+import random
+
+from candidates import CandidateIndex
+from feedback import score
+from words import decode, word_index
+
+
+def brute_force(answers, moves):
+    # Distinct answers that give every (guess, pattern) seen so far
+    return sorted({answer for answer in answers if all(score(guess, answer) == pattern for guess, pattern in moves)})
+
+
+def test_narrowing_matches_brute_force_over_random_games():
+    index = CandidateIndex(word_index.answers)
+    guesses = [decode(code) for code in word_index.guesses]
+    rng = random.Random(21)
+    for _ in range(300):
+        answer = rng.choice(word_index.answers)
+        bits = index.all
+        moves = []
+        for _ in range(rng.randint(1, 4)):
+            guess = rng.choice(guesses)
+            pattern = score(guess, answer)
+            bits = index.narrow(bits, guess, pattern)
+            moves.append((guess, pattern))
+            assert sorted(index.words(bits)) == brute_force(word_index.answers, moves), moves
+
+
+def test_every_mask_matches_brute_force_with_repeated_letters():
+    # A three letter alphabet, where repeats are the norm, plus a duplicate
+    words = ["".join(letters) for letters in itertools.product('abe', repeat=5)]
+    answers = words[::2] + [words[0]]
+    index = CandidateIndex(answers)
+    for guess in words:
+        for pattern in {score(guess, answer) for answer in words}:
+            assert sorted(index.words(index.mask(guess, pattern))) == brute_force(answers, [(guess, pattern)]), (
+                guess, pattern)
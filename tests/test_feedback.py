@@ -0,0 +1,105 @@
+import itertools
+import random
+
+import pytest
+
+from feedback import (
+    EMOJI_COLORS, KEYBOARD_ROWS, LETTER_ABSENT, LETTER_CORRECT, LETTER_PRESENT, LETTERS, PATTERN_STATES, PLAIN_TILES,
+    EmojiTiles, letter_states, render_plain, score,
+)
+from game import GameState
+from words import decode, word_index
+
+
+def old_feedback(guess, correct):
+    # get_feedback() from bot.py before scoring moved to feedback.py,
+    # in the plain-square style
+    feedback = ["◻️"] * 5
+    correct_list = list(correct)
+    for i in range(5):
+        if guess[i] == correct[i]:
+            feedback[i] = "🟩"
+            correct_list[i] = None
+    for i in range(5):
+        if feedback[i] == "◻️":
+            if guess[i] in correct_list:
+                feedback[i] = "🟨"
+                correct_list[correct_list.index(guess[i])] = None
+            else:
+                feedback[i] = "⬛"
+    return " ".join(feedback)
+
+
+GUESSES = [decode(code) for code in word_index.guesses]
+
+# The exhaustive check below runs in this many parts, about 3s each
+SLICES = 8
+
+
+@pytest.mark.parametrize('part', range(SLICES))
+def test_score_matches_old_feedback_for_every_pair(part):
+    # Every accepted guess against every answer. Uncached, so 4M pairs
+    # don't churn the shared score cache.
+    uncached_score = score.__wrapped__
+    for guess in GUESSES[part::SLICES]:
+        for answer in word_index.answers:
+            assert render_plain(uncached_score(guess, answer)) == old_feedback(guess, answer), (guess, answer)
+
+
+def test_score_matches_old_feedback_with_repeated_letters():
+    # Every pair over a three letter alphabet, where repeats are the norm
+    words = ["".join(letters) for letters in itertools.product('abe', repeat=5)]
+    for guess in words:
+        for answer in words:
+            assert render_plain(score(guess, answer)) == old_feedback(guess, answer), (guess, answer)
+
+
+def test_emoji_board_and_tracker_match_the_emoji_map():
+    emoji_map = {f"{color}_{letter}": f"<:{color}_{letter}:{i}>"
+                 for i, (color, letter) in enumerate(itertools.product(EMOJI_COLORS + ('blue',), LETTERS))}
+    # One emoji missing, so the plain square fallback is rendered too
+    del emoji_map['yellow_e']
+    tiles = EmojiTiles(emoji_map)
+    rng = random.Random(2)
+    for _ in range(200):
+        answer = rng.choice(word_index.answers)
+        game = GameState.new(answer)
+        expected = []
+        for guess in rng.sample(word_index.answers, 6):
+            pattern = game.add_guess(guess)
+            expected.append(" ".join(
+                emoji_map.get(f"{EMOJI_COLORS[state]}_{letter}", PLAIN_TILES[state])
+                for state, letter in zip(PATTERN_STATES[pattern], guess)
+            ))
+        assert game.private_board(tiles) == "".join(f"{row}\n" for row in expected)
+        states = letter_states(game.guesses, answer)
+        assert game.letter_tracker(tiles) == "\n".join(
+            " ".join(tiles.keys[states[ord(letter) - 97]][letter] for letter in row) for row in KEYBOARD_ROWS
+        )
+
+
+def recomputed_letter_states(guesses, answer):
+    # Each letter from scratch over the whole game: correct if ever guessed
+    # in its spot, present if guessed and in the answer, absent if guessed
+    states = bytearray(26)
+    for letter in set("".join(guesses)):
+        if any(guess[i] == letter == answer[i] for guess in guesses for i in range(5)):
+            state = LETTER_CORRECT
+        elif letter in answer:
+            state = LETTER_PRESENT
+        else:
+            state = LETTER_ABSENT
+        states[ord(letter) - 97] = state
+    return states
+
+
+def test_incremental_letter_tracker_matches_a_full_recompute():
+    rng = random.Random(9)
+    for _ in range(2000):
+        answer = rng.choice(word_index.answers)
+        game = GameState.new(answer)
+        # Other answers share more letters with the answer than random guesses
+        pool = GUESSES if rng.random() < 0.5 else word_index.answers
+        for _ in range(rng.randint(1, 6)):
+            game.add_guess(rng.choice(pool))
+            assert game.letters == recomputed_letter_states(game.guesses, answer), (game.guesses, answer)
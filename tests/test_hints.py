@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+from hints import HintIndex, build
+from words import word_index
+
+
+@pytest.fixture(scope='module')
+def patterns_path(tmp_path_factory):
+    # data/patterns.bin is a build product, so build a fresh one for the tests
+    path = str(tmp_path_factory.mktemp('hints') / 'patterns.bin')
+    build(path)
+    return path
+
+
+def test_hint_uses_the_table_taken_before_a_reload(patterns_path):
+    async def run():
+        index = HintIndex(patterns_path)
+        table = index.table
+        moves = [('crane', 0)]
+        expected = table.best_guess(tuple(moves))
+        assert await index.hint(table, moves) == expected
+        assert index.cache.stats()['size'] == 1
+
+        # A reload swaps the table while the command is deferring
+        index.use(index.open(word_index))
+        assert index.table is not table
+        assert await index.hint(table, moves) == expected
+        # Results of the replaced table stay out of the new table's cache
+        assert index.cache.stats()['size'] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,91 @@
+import asyncio
+
+from rotation import AnswerRotation, merge_seen
+
+
+class SlowStats:
+    """Seen-answer storage whose reads take ``delay`` seconds."""
+
+    def __init__(self, delay=0.0, saved=None):
+        self.delay = delay
+        self.saved = saved or {}  # user ID -> (cycle, bitset)
+
+    async def get_seen_answers(self, user_id, version):
+        await asyncio.sleep(self.delay)
+        return self.saved.get(user_id)
+
+    async def save_seen_answers(self, rows, version):
+        merged = []
+        for user_id, cycle, seen in rows:
+            state = (cycle, seen)
+            if user_id in self.saved:
+                state = merge_seen(self.saved[user_id], state)
+            self.saved[user_id] = state
+            merged.append((user_id, *state))
+        return merged
+
+
+def test_every_answer_once_per_cycle():
+    rotation = AnswerRotation(SlowStats(), answer_count=100, version='v')
+    drawn = [rotation.draw(1) for _ in range(100)]
+    assert sorted(drawn) == list(range(100))
+    # The next cycle starts over
+    assert 0 <= rotation.draw(1) < 100
+
+
+def test_slow_load_does_not_hold_up_draw():
+    async def run():
+        saved = bytearray(13)
+        saved[0] = 0b11111111
+        stats = SlowStats(delay=0.3, saved={'1': (0, bytes(saved))})
+        rotation = AnswerRotation(stats, answer_count=100, version='v', load_timeout=0.05)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await rotation.load(1)
+        assert loop.time() - start < 0.2
+        index = rotation.draw(1)
+
+        # The late read is merged with what was drawn meanwhile
+        await asyncio.sleep(0.4)
+        bits = rotation.seen[1]
+        assert bits[0] == 0b11111111
+        assert bits[index >> 3] & (1 << (index & 7))
+        assert 1 in rotation._dirty
+
+    asyncio.run(run())
+
+
+def test_saved_bits_are_used():
+    async def run():
+        saved = bytes([0xff] * 12 + [0x0f])  # all but answers 100-103 of 104 seen
+        rotation = AnswerRotation(SlowStats(saved={'1': (0, saved)}), answer_count=104, version='v')
+        await rotation.load(1)
+        assert sorted(rotation.draw(1) for _ in range(4)) == [100, 101, 102, 103]
+
+    asyncio.run(run())
+
+
+def test_shard_workers_share_one_rotation():
+    async def run():
+        stats = SlowStats()
+        workers = [AnswerRotation(stats, answer_count=50, version='v', shared=True) for _ in range(3)]
+        drawn = []
+        for i in range(50):
+            # Each /guessle lands on some worker, which reads before drawing
+            # and saves right after
+            worker = workers[i % 3]
+            await worker.load(1)
+            drawn.append(worker.draw(1))
+            await worker.flush()
+        assert sorted(drawn) == list(range(50))
+
+        # A worker that starts the next cycle wins over draws of the old one
+        await workers[1].load(1)
+        workers[1].draw(1)
+        await workers[1].flush()
+        workers[2].draw(1)
+        await workers[2].flush()
+        assert stats.saved['1'][0] == 1
+        assert bin(int.from_bytes(stats.saved['1'][1], 'little')).count("1") == 1
+
+    asyncio.run(run())
@@ -0,0 +1,51 @@
+import asyncio
+import json
+import os
+import time
+
+from sessions import JournalBackend, SessionStore
+
+
+def test_journal_and_snapshot_round_trip(tmp_path):
+    async def run():
+        store = SessionStore(JournalBackend(str(tmp_path), snapshot_every=5))
+        await store.start()
+        for user_id in range(3):
+            store.start_game(user_id, 'crane')
+            store.add_guess(user_id, 'slate')
+        await store.commit()
+        # Changed after the snapshot was taken; only in the journal
+        store.add_guess(1, 'pious')
+        store.end_game(2)
+        await store.close()
+
+        with open(os.path.join(tmp_path, 'snapshot.json')) as f:
+            assert sorted(json.load(f)) == [[0, 'crane', ['slate']], [1, 'crane', ['slate']], [2, 'crane', ['slate']]]
+
+        restored = await SessionStore(JournalBackend(str(tmp_path))).start()
+        assert restored == {0: ('crane', ['slate']), 1: ('crane', ['slate', 'pious'])}
+
+    asyncio.run(run())
+
+
+class SlowJournalBackend(JournalBackend):
+    def _write(self, events, snapshot):
+        time.sleep(0.2)
+        super()._write(events, snapshot)
+
+
+def test_close_during_a_commit_keeps_every_game(tmp_path):
+    async def run():
+        store = SessionStore(SlowJournalBackend(str(tmp_path)), commit_interval=0.01)
+        await store.start()
+        store.start_game(1, 'crane')
+        store.add_guess(1, 'slate')
+        # Let the commit loop pick the events up and start writing them
+        await asyncio.sleep(0.05)
+        assert not store._pending
+        await store.close()
+
+        restored = await SessionStore(JournalBackend(str(tmp_path))).start()
+        assert restored == {1: ('crane', ['slate'])}
+
+    asyncio.run(run())
@@ -0,0 +1,36 @@
+import discord
+from discord import app_commands
+
+from startup import command_payload, command_tree_hash
+
+
+def make_tree(description="Start a new Guessle game"):
+    tree = app_commands.CommandTree(discord.Client(intents=discord.Intents.none()))
+
+    @tree.command(name="guessle", description=description)
+    async def guessle(interaction: discord.Interaction):
+        pass
+
+    @tree.command(name="guess", description="Make a guess in your current game")
+    @app_commands.describe(word="Enter a 5-letter word")
+    async def guess(interaction: discord.Interaction, word: str):
+        pass
+
+    return tree
+
+
+def test_hash_of_real_tree_is_stable():
+    assert command_tree_hash(make_tree()) == command_tree_hash(make_tree())
+
+
+def test_hash_changes_with_commands():
+    assert command_tree_hash(make_tree()) != command_tree_hash(make_tree("Start a game"))
+
+
+def test_payload_without_tree_argument():
+    # discord.py 2.3 commands take no tree in to_dict()
+    class OldCommand:
+        def to_dict(self):
+            return {'name': 'guessle'}
+
+    assert command_payload(OldCommand(), object()) == {'name': 'guessle'}
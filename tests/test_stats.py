@@ -0,0 +1,128 @@
+import asyncio
+import datetime
+import os
+import uuid
+
+import psycopg2
+import pytest
+
+from stats import LEADERBOARD_CACHE_TTL, SHARDED_LEADERBOARD_CACHE_TTL, TIMEZONE, GameWriter, UserStats
+
+
+def test_inserted_games_update_cached_leaderboards_without_counting_hits():
+    stats = UserStats(connect=lambda: None)
+    stats.leaderboards.set(('overall', None), [{'user_id': '1', 'games_played': 2, 'words_guessed': 1}])
+    # Already expired by the time the games are applied
+    stats.leaderboards.ttl = -1
+    stats.leaderboards.set(('overall', 7), [{'user_id': '1', 'games_played': 1, 'words_guessed': 0}])
+
+    now = datetime.datetime.now(TIMEZONE)
+    stats._update_cached_leaderboards([('1', now, True, None), ('2', now, False, 7)])
+
+    assert stats.leaderboards.peek(('overall', None)) == [
+        {'user_id': '1', 'games_played': 3, 'words_guessed': 2},
+        {'user_id': '2', 'games_played': 1, 'words_guessed': 0},
+    ]
+    assert stats.leaderboards.peek(('overall', 7)) is None
+    assert stats.cache_stats()['hits'] == 0
+    assert stats.cache_stats()['misses'] == 0
+
+
+def test_failed_insert_drops_cached_leaderboards():
+    async def run():
+        stats = UserStats(connect=lambda: None)
+        stats.leaderboards.set(('overall', None), [])
+
+        async def timed_out(query, *args):
+            raise asyncio.TimeoutError()
+
+        stats.run = timed_out
+        with pytest.raises(asyncio.TimeoutError):
+            await stats.add_games([('key', '1', datetime.datetime.now(TIMEZONE), True, None)])
+        # The insert may still have committed, so the board is read again
+        assert stats.leaderboards.peek(('overall', None)) is None
+
+    asyncio.run(run())
+
+
+def test_shard_workers_cache_leaderboards_briefly(monkeypatch):
+    monkeypatch.delenv('LEADERBOARD_CACHE_TTL', raising=False)
+    assert UserStats(connect=lambda: None).leaderboards.ttl == LEADERBOARD_CACHE_TTL
+    monkeypatch.setenv('SHARD_IDS', '0,2')
+    assert UserStats(connect=lambda: None).leaderboards.ttl == SHARDED_LEADERBOARD_CACHE_TTL
+
+
+class KeyedStats:
+    """Stand-in for UserStats.add_games with the same game_key dedup."""
+
+    def __init__(self):
+        self.keys = set()
+        self.played = {}
+
+    async def add_games(self, games):
+        inserted = 0
+        for key, user_id, timestamp, won, guild_id in games:
+            if key not in self.keys:
+                self.keys.add(key)
+                self.played[user_id] = self.played.get(user_id, 0) + 1
+                inserted += 1
+        return inserted
+
+
+async def replay_twice(stats, spool_path):
+    # Spool a few games while the database is down
+    writer = GameWriter(stats, spool_path=spool_path)
+    for i in range(5):
+        writer.record(str(i % 2), i % 3 == 0)
+    await writer._spool(writer._pending)
+    with open(spool_path) as f:
+        spooled = f.read()
+
+    await writer.start()
+    await writer.stop()
+    assert not os.path.exists(spool_path)
+
+    # A crash after the insert but before the spool was removed leaves it
+    # behind, so the next start replays it again
+    with open(spool_path, 'w') as f:
+        f.write(spooled)
+    writer = GameWriter(stats, spool_path=spool_path)
+    await writer.start()
+    await writer.stop()
+    assert not os.path.exists(spool_path)
+
+
+def test_replaying_a_spool_twice_counts_each_game_once(tmp_path):
+    stats = KeyedStats()
+    asyncio.run(replay_twice(stats, str(tmp_path / 'spool.jsonl')))
+    assert stats.played == {'0': 3, '1': 2}
+
+
+@pytest.mark.skipif(not os.getenv('DATABASE_URL'), reason="needs a Postgres DATABASE_URL")
+def test_replaying_a_spool_twice_counts_each_game_once_in_postgres(tmp_path):
+    # A throwaway schema keeps the test's tables apart from real ones
+    schema = f"spool_test_{uuid.uuid4().hex}"
+    admin = psycopg2.connect(os.environ['DATABASE_URL'])
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}")
+
+    def connect():
+        return psycopg2.connect(os.environ['DATABASE_URL'], options=f"-c search_path={schema}")
+
+    async def run():
+        stats = UserStats(connect=connect)
+        await stats.create_tables()
+        try:
+            await replay_twice(stats, str(tmp_path / 'spool.jsonl'))
+            rows = await stats.run(stats._get_overall_stats, None)
+            return {row['user_id']: row['games_played'] for row in rows}
+        finally:
+            await stats.close()
+
+    try:
+        assert asyncio.run(run()) == {'0': 3, '1': 2}
+    finally:
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
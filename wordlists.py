@@ -0,0 +1,35 @@
+"""The word lists games are played with, swappable while the bot runs.
+
+A WordLists object is one version of the word files together with the
+answer bitset index built from it. Each game keeps the WordLists it was
+started with, so its answer and possible answers stay consistent when a
+new version is swapped in; only games started afterwards use the new one.
+"""
+from candidates import CandidateIndex
+from words import WordIndex, word_index
+
+
+class WordLists:
+    """One version of the word lists and the indexes built from it."""
+
+    def __init__(self, words=None):
+        self.words = words or WordIndex()
+        self.candidates = CandidateIndex(self.words.answers)
+
+    @property
+    def version(self):
+        return self.words.answers_version
+
+
+_current = WordLists(word_index)
+
+
+def current():
+    """The word lists new games are started with."""
+    return _current
+
+
+def swap(lists):
+    """Make ``lists`` the version new games use; games in progress keep theirs."""
+    global _current
+    _current = lists
@@ -0,0 +1,147 @@
+"""Word lists for Guessle.
+
+Accepted guesses live in ``data/guesses.bin`` as a sorted array of
+little-endian uint32 codes, one per word, with 5 bits per letter. The file
+is memory-mapped and searched with bisect, so checking a guess costs a few
+integer comparisons and the list is shared between processes by the OS.
+``data/answers.bin`` holds the answer list in the same encoding.
+
+Both files are generated from ``data/answers.txt`` and the pyspellchecker
+English dictionary (plus any extra word files given) by running:
+
+    pip install pyspellchecker
+    python words.py build [extra_words.txt ...]
+
+The /hint pattern matrix depends on both files, so rebuild it afterwards
+with ``python hints.py build``. A running bot picks up the rebuilt files
+on its own (see reloader.py), so they are replaced rather than rewritten:
+the old files stay mapped until the games using them are over.
+"""
+import array
+import bisect
+import hashlib
+import mmap
+import os
+import random
+import sys
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+GUESSES_PATH = os.path.join(DATA_DIR, 'guesses.bin')
+ANSWERS_PATH = os.path.join(DATA_DIR, 'answers.bin')
+# One answer per line; every answer is also an accepted guess
+ANSWERS_SOURCE_PATH = os.path.join(DATA_DIR, 'answers.txt')
+
+WORD_LENGTH = 5
+
+
+def encode(word):
+    """Pack a lowercase a-z word into an int, 5 bits per letter."""
+    code = 0
+    for letter in word:
+        value = ord(letter) - 97
+        if not 0 <= value < 26:
+            raise ValueError(f"Not a lowercase a-z word: {word!r}")
+        code = code << 5 | value
+    return code
+
+
+def decode(code, length=WORD_LENGTH):
+    """Unpack a word encoded by encode()."""
+    letters = []
+    for _ in range(length):
+        letters.append(chr(97 + (code & 31)))
+        code >>= 5
+    return "".join(reversed(letters))
+
+
+def load_codes(path):
+    """Map a word file into memory as a sequence of uint32 codes."""
+    with open(path, 'rb') as f:
+        if sys.byteorder == 'little' and os.fstat(f.fileno()).st_size:
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast('I')
+        codes = array.array('I', f.read())
+    if sys.byteorder != 'little':
+        codes.byteswap()
+    return codes
+
+
+def write_codes(path, codes):
+    codes = array.array('I', codes)
+    if sys.byteorder != 'little':
+        codes.byteswap()
+    # Truncating a file a running bot has mapped would crash it
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        codes.tofile(f)
+    os.replace(tmp_path, path)
+
+
+def read_words(path):
+    """Lowercase words of a text file, in order, each once."""
+    with open(path) as f:
+        return list(dict.fromkeys(f.read().lower().split()))
+
+
+class WordIndex:
+    """Accepted guesses and answers loaded from the precompiled word files."""
+
+    def __init__(self, guesses_path=GUESSES_PATH, answers_path=ANSWERS_PATH):
+        self.guesses = load_codes(guesses_path)
+        self.answers = [decode(code) for code in load_codes(answers_path)]
+        # Changes whenever the answer list does, e.g. to invalidate answer bitsets
+        self.answers_version = hashlib.sha256(" ".join(self.answers).encode()).hexdigest()[:16]
+        # First position of each answer, for storing answers as small ints
+        self.answer_ids = {}
+        for i, word in enumerate(self.answers):
+            self.answer_ids.setdefault(word, i)
+
+    def is_valid(self, word):
+        """Check if a lowercase word is an accepted guess."""
+        if len(word) != WORD_LENGTH:
+            return False
+        try:
+            code = encode(word)
+        except ValueError:
+            return False
+        i = bisect.bisect_left(self.guesses, code)
+        return i < len(self.guesses) and self.guesses[i] == code
+
+    def random_answer(self):
+        """Pick a random answer."""
+        return random.choice(self.answers)
+
+    def answer_id(self, word):
+        """Position of a word in the answer list; raises KeyError for other words."""
+        return self.answer_ids[word]
+
+
+def build(extra_paths=()):
+    """Regenerate the word files from the answer list and the guess dictionary."""
+    # Only needed at build time; the bot itself never loads the dictionary
+    from spellchecker import SpellChecker
+
+    def usable(word):
+        return len(word) == WORD_LENGTH and word.isascii() and word.isalpha() and word.islower()
+
+    guesses = {word for word in SpellChecker().word_frequency.keys() if usable(word)}
+    for path in extra_paths:
+        with open(path) as f:
+            guesses.update(word for word in f.read().lower().split() if usable(word))
+    # Each answer once, so none is drawn more often than the others
+    answers = read_words(ANSWERS_SOURCE_PATH)
+    guesses.update(answers)
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    write_codes(GUESSES_PATH, sorted(encode(word) for word in guesses))
+    write_codes(ANSWERS_PATH, [encode(word) for word in answers])
+    print(f"Wrote {len(guesses)} guesses to {GUESSES_PATH}")
+    print(f"Wrote {len(answers)} answers to {ANSWERS_PATH}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] != ['build']:
+        sys.exit("Usage: python words.py build [extra_words.txt ...]")
+    build(sys.argv[2:])
+else:
+    # Memory-mapped, so loading on import takes well under a millisecond
+    word_index = WordIndex()